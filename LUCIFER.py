@@ -7,20 +7,51 @@ import ctypes
 import logging
 import threading
 import re
+import heapq
+import queue
+import sqlite3
+import contextlib
+import hashlib
+import mmap
+import struct
+import wave
+import ast
+import abc
+import importlib.util
+import random
+import concurrent.futures
+import asyncio
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
 
-import keyboard
 import psutil
-import pyttsx3
 import speech_recognition as sr
 from speech_recognition import Recognizer, AudioFile
 import subprocess
 import webbrowser
 import urllib.parse
-import winreg
 import urllib.request
 import tempfile
+import shutil
+
+# Device and OS bindings; the platform layer below only needs the ones it uses
+try:
+    import keyboard
+except ImportError:
+    keyboard = None
+try:
+    import pyttsx3
+except ImportError:
+    pyttsx3 = None
+try:
+    import winreg
+except ImportError:
+    winreg = None
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
 
 # Attempt to import dateutil for robust time parsing
 try:
@@ -28,6 +59,12 @@ try:
 except ImportError:
     dateutil_parser = None
 
+# Attempt to import numpy for frame-level voice activity detection
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Initialize logging early so that COM initialization errors can be logged properly
 LOG_FILE = Path(os.path.dirname(os.path.abspath(__file__))) / "voice_assistant.log"
 logging.basicConfig(
@@ -58,7 +95,7 @@ import ctypes
 
 def release_audio_device():
     try:
-        ctypes.windll.winmm.waveOutReset(0)  # Reset the audio device
+        host_platform.release_audio_device()
         logger.info("Audio device released forcefully.")
     except Exception as e:
         logger.warning("Failed to reset audio device: %s", e)
@@ -193,6 +230,595 @@ if comtypes:
     
     CLSID_MMDeviceEnumerator = GUID("{BCDE0395-E52F-467C-8E3D-C4579291692E}")
 
+# Platform layer: everything that touches the OS, audio hardware or Windows APIs
+class Platform:
+    """Portable defaults, used as the POSIX backend.
+
+    WindowsPlatform talks to SAPI, COM, user32 and the registry;
+    FakePlatform replaces every device with an in-memory stand-in so the
+    assistant can run headless. Capabilities a backend lacks return a
+    neutral value, and callers check the has_* flags before using them.
+    """
+
+    name = "posix"
+    has_volume = False
+    has_apps = False
+    hears_own_output = True  # the microphone can pick up what the speakers play
+
+    # Audio devices
+    def create_tts_engine(self):
+        return self._init_tts()
+
+    def _init_tts(self, *driver):
+        """pyttsx3 engine for `driver`, or a NullTTSEngine when pyttsx3 is missing or can't start."""
+        if pyttsx3 is None:
+            logger.warning("pyttsx3 not installed; responses will only be printed")
+            return NullTTSEngine()
+        try:
+            engine = pyttsx3.init(*driver)
+        except Exception as e:
+            logger.warning("Text-to-speech unavailable (%s); responses will only be printed", e)
+            return NullTTSEngine()
+        engine.setProperty('volume', 1.0)
+        return engine
+
+    def release_audio_device(self):
+        pass
+
+    def microphone(self):
+        return sr.Microphone()
+
+    def input_device_name(self):
+        try:
+            pyaudio = sr.Microphone.get_pyaudio().PyAudio()
+            try:
+                return pyaudio.get_default_input_device_info().get("name") or "default"
+            finally:
+                pyaudio.terminate()
+        except Exception as e:
+            logger.warning("Could not read default input device name: %s", e)
+            return "default"
+
+    def input_format(self):
+        """(sample rate, sample width) microphone() captures at; sr.Microphone uses the device's default rate."""
+        try:
+            pyaudio = sr.Microphone.get_pyaudio().PyAudio()
+            try:
+                return int(pyaudio.get_default_input_device_info()["defaultSampleRate"]), 2
+            finally:
+                pyaudio.terminate()
+        except Exception as e:
+            logger.warning("Could not read default input format: %s", e)
+            return 16000, 2
+
+    def play_beep(self, path):
+        print('\a')
+
+    def open_output_stream(self, rate, frames_per_buffer, callback):
+        """Open a 16-bit mono output stream that pulls audio from `callback` (PyAudio callback mode)."""
+        pyaudio = sr.Microphone.get_pyaudio()
+        return pyaudio.PyAudio().open(format=pyaudio.paInt16, channels=1, rate=rate, output=True,
+                                      frames_per_buffer=frames_per_buffer, stream_callback=callback)
+
+    def recognition_backends(self):
+        return [GoogleBackend(), SphinxBackend()]
+
+    # Volume (has_volume is False, so these are never reached through the assistant)
+    def get_volume(self):
+        return 0
+
+    def set_volume(self, percent):
+        pass
+
+    def get_mute(self):
+        return False
+
+    def set_mute(self, muted):
+        pass
+
+    # Power actions
+    def lock(self):
+        if sys.platform == "darwin":
+            # Locks when "require password after sleep" is on, which is the macOS default
+            subprocess.run(["pmset", "displaysleepnow"], check=True)
+        else:
+            subprocess.run(["loginctl", "lock-session"], check=True)
+
+    def sleep(self):
+        os.system('systemctl suspend')
+
+    def shutdown(self):
+        os.system("shutdown -h +1")
+
+    def restart(self):
+        os.system("shutdown -r +1")
+
+    # Windows and apps
+    def find_windows(self, pids):
+        return {}
+
+    def close_window(self, hwnd):
+        pass
+
+    def start_apps(self):
+        return {}
+
+    def app_launcher(self):
+        return None  # has_apps is False
+
+    def launch_browser(self, args):
+        """Start a browser detached from the assistant; returns its Popen."""
+        return subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                close_fds=True, start_new_session=True)
+
+    def open_url(self, uri):
+        webbrowser.open(uri, new=2, autoraise=False)
+
+    # Session state
+    def session_locked(self):
+        return False
+
+    def user_idle_seconds(self):
+        return 0.0
+
+    # Registry, startup and process privileges
+    def default_browser_path(self):
+        return None
+
+    def browser_choice_stamp(self):
+        return None
+
+    def watch_browser_choice(self, on_change):
+        pass
+
+    def is_admin(self):
+        return True
+
+    def run_as_admin(self):
+        pass
+
+    def hide_console(self):
+        pass
+
+    def add_to_startup(self, command):
+        pass
+
+    def add_hotkey(self, combination, callback):
+        if keyboard is None:
+            raise NotImplementedError("keyboard module not installed")
+        keyboard.add_hotkey(combination, callback, suppress=True)
+
+    def clear_hotkeys(self):
+        if keyboard is not None:
+            keyboard.clear_all_hotkeys()
+
+class WindowsPlatform(Platform):
+    name = "windows"
+    has_volume = True
+    has_apps = True
+
+    def create_tts_engine(self):
+        return self._init_tts('sapi5')
+
+    def release_audio_device(self):
+        ctypes.windll.winmm.waveOutReset(0)  # Reset the audio device
+
+    def play_beep(self, path):
+        if not path:
+            return
+        winmm = ctypes.windll.winmm
+        winmm.mciSendStringW(f'open "{path}" alias wakebeep', None, 0, None)
+        winmm.mciSendStringW("play wakebeep from 0", None, 0, None)
+        action_executor.call_later(2, "beep", winmm.mciSendStringW, "close wakebeep", None, 0, None)
+
+    @contextlib.contextmanager
+    def _endpoint_volume(self):
+        if comtypes is None:
+            raise NotImplementedError("COM components for volume control not available")
+        from comtypes import CLSCTX_INPROC_SERVER
+        from ctypes import POINTER, cast
+        comtypes.CoInitialize()
+        try:
+            mmde = comtypes.CoCreateInstance(
+                CLSID_MMDeviceEnumerator,
+                IMMDeviceEnumerator,
+                CLSCTX_INPROC_SERVER
+            )
+            device = mmde.GetDefaultAudioEndpoint(0, 0)
+            endpoint_ptr = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_INPROC_SERVER, None)
+            yield cast(endpoint_ptr, POINTER(IAudioEndpointVolume))
+        finally:
+            try:
+                comtypes.CoUninitialize()
+            except Exception:
+                pass
+
+    def get_volume(self):
+        with self._endpoint_volume() as endpoint:
+            return round(endpoint.GetMasterVolumeLevelScalar() * 100)
+
+    def set_volume(self, percent):
+        with self._endpoint_volume() as endpoint:
+            endpoint.SetMasterVolumeLevelScalar(percent / 100.0, None)
+
+    def get_mute(self):
+        with self._endpoint_volume() as endpoint:
+            return endpoint.GetMute() == 1
+
+    def set_mute(self, muted):
+        with self._endpoint_volume() as endpoint:
+            endpoint.SetMute(1 if muted else 0, None)
+
+    def lock(self):
+        ctypes.windll.user32.LockWorkStation()
+
+    def sleep(self):
+        ctypes.windll.powrprof.SetSuspendState(0, 0, 0)
+        self.lock()
+
+    def shutdown(self):
+        os.system("shutdown /s /t 60")
+
+    def restart(self):
+        os.system("shutdown /r /t 60")
+
+    def find_windows(self, pids):
+        """Map each pid in `pids` to its top-level windows in one EnumWindows pass."""
+        import ctypes.wintypes
+        user32 = ctypes.windll.user32
+        wanted = set(pids)
+        found = {}
+
+        def enum_windows_proc(hwnd, lParam):
+            pid_buffer = ctypes.wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid_buffer))
+            if pid_buffer.value in wanted:
+                found.setdefault(pid_buffer.value, []).append(hwnd)
+            return True
+
+        EnumWindowsProc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)
+        user32.EnumWindows(EnumWindowsProc(enum_windows_proc), 0)
+        return found
+
+    def close_window(self, hwnd):
+        WM_CLOSE = 0x0010
+        ctypes.windll.user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+
+    def start_apps(self):
+        result = subprocess.check_output(
+            ["powershell", "-Command", "Get-StartApps | ConvertTo-Json"],
+            stderr=subprocess.DEVNULL
+        )
+        apps = json.loads(result)
+        if isinstance(apps, dict):
+            apps = [apps]
+        app_dict = {}
+        for app in apps:
+            name = app.get("Name", "").lower()
+            appid = app.get("AppID", "")
+            if name and appid:
+                app_dict[name] = appid
+        return app_dict
+
+    def app_launcher(self):
+        return ShellAppLauncher()
+
+    def launch_browser(self, args):
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        # Launch the browser as a fully independent process
+        return subprocess.Popen(
+            args,
+            creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW,
+            startupinfo=startupinfo,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True
+        )
+
+    def session_locked(self):
+        user32 = ctypes.windll.user32
+        desktop = user32.OpenInputDesktop(0, False, 0x0100)  # DESKTOP_SWITCHDESKTOP
+        if not desktop:
+            return True
+        user32.CloseDesktop(desktop)
+        return False
+
+    def user_idle_seconds(self):
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+        return 0.0
+
+    def default_browser_path(self):
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, BROWSER_CHOICE_KEY) as key:
+                prog_id = winreg.QueryValueEx(key, 'ProgId')[0]
+            logger.debug("Retrieved ProgID: %s", prog_id)
+        except Exception as e:
+            logger.warning("Failed to retrieve ProgID from registry: %s", str(e))
+            return None
+        try:
+            with winreg.OpenKey(winreg.HKEY_CLASSES_ROOT,
+                fr"{prog_id}\shell\open\command") as key:
+                browser_cmd, _ = winreg.QueryValueEx(key, '')
+            browser_path = browser_cmd.split('"')[1] if '"' in browser_cmd else browser_cmd.split()[0]
+            logger.info("Detected browser path: %s", browser_path)
+            return browser_path
+        except Exception as e:
+            logger.warning("Failed to get browser path from registry: %s", str(e))
+            return None
+
+    def browser_choice_stamp(self):
+        """Last-write time of the UserChoice key; a single cheap query."""
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, BROWSER_CHOICE_KEY) as key:
+                return winreg.QueryInfoKey(key)[2]
+        except Exception:
+            return None
+
+    def watch_browser_choice(self, on_change):
+        REG_NOTIFY_CHANGE_NAME = 0x1
+        REG_NOTIFY_CHANGE_LAST_SET = 0x4
+        while not exit_event.is_set():
+            try:
+                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, BROWSER_CHOICE_KEY.rsplit("\\", 1)[0]) as key:
+                    # Blocks until something under the key changes
+                    ctypes.windll.advapi32.RegNotifyChangeKeyValue(
+                        int(key), True, REG_NOTIFY_CHANGE_NAME | REG_NOTIFY_CHANGE_LAST_SET, None, False)
+                on_change()
+            except Exception as e:
+                logger.warning("Registry change watch unavailable (%s); relying on key timestamps", e)
+                return
+
+    def is_admin(self):
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+
+    def run_as_admin(self):
+        ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, " ".join(sys.argv), None, 1)
+
+    def hide_console(self):
+        whnd = ctypes.windll.kernel32.GetConsoleWindow()
+        if whnd:
+            ctypes.windll.user32.ShowWindow(whnd, 0)
+
+    def add_to_startup(self, command):
+        startup_key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Run"
+        try:
+            registry_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, startup_key_path, 0, winreg.KEY_WRITE)
+        except Exception:
+            registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, startup_key_path, 0, winreg.KEY_WRITE)
+        winreg.SetValueEx(registry_key, "LUCIFER", 0, winreg.REG_SZ, command)
+        winreg.CloseKey(registry_key)
+
+# Headless fake devices
+FAKE_SAMPLE_RATE = 16000
+FAKE_GAP_SECONDS = 2.0        # silence between scripted utterances
+FAKE_WORD_SECONDS = 0.3       # speech length per scripted word
+FAKE_DEFAULT_SCRIPT = [
+    "HEY LUCIFER WHAT TIME IS IT",
+    "HEY LUCIFER SET VOLUME TO 40",
+    "HEY LUCIFER SET A TIMER FOR 10 MINUTES",
+    "HEY LUCIFER WHAT DAY IS IT",
+    "HEY LUCIFER BATTERY STATUS",
+]
+
+class NullTTSEngine:
+    """Speaks nothing; used when no text-to-speech engine is available."""
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, message):
+        pass
+
+    def runAndWait(self):
+        pass
+
+class FakeTTSEngine:
+    def __init__(self, words_per_second=0.0):
+        self.words_per_second = words_per_second
+        self.spoken = []
+        self._pending = []
+
+    def setProperty(self, name, value):
+        pass
+
+    def say(self, message):
+        self._pending.append(message)
+
+    def runAndWait(self):
+        for message in self._pending:
+            self.spoken.append(message)
+            if self.words_per_second:
+                time.sleep(len(message.split()) / self.words_per_second)
+        self._pending = []
+
+class FakeAudioStream:
+    """Plays scripted utterances as synthetic voiced bursts separated by low noise.
+
+    When a burst starts, its transcript is queued for ScriptedBackend, so
+    capture, VAD, pre-processing and routing all run on real audio frames.
+    `speed` 1.0 paces reads in real time; 0 reads as fast as possible.
+    """
+
+    def __init__(self, fake_platform):
+        self.platform = fake_platform
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._rng = np.random.default_rng(0)
+        self._read = 0                # samples handed out so far
+        self._generated = 0           # samples generated so far
+        self._bursts = deque()        # (start sample, transcript) not yet reached
+
+    def _next_segment(self):
+        text = self.platform.next_utterance()
+        noise = self._rng.normal(0, 0.001, int(FAKE_GAP_SECONDS * FAKE_SAMPLE_RATE)).astype(np.float32)
+        if text is None:
+            return noise
+        seconds = max(0.5, FAKE_WORD_SECONDS * len(text.split()))
+        t = np.arange(int(seconds * FAKE_SAMPLE_RATE)) / float(FAKE_SAMPLE_RATE)
+        voiced = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+        burst = (0.15 * voiced * envelope).astype(np.float32)
+        self._bursts.append((self._generated + len(noise), text))
+        return np.concatenate([noise, burst])
+
+    def read(self, frames):
+        while len(self._buffer) < frames:
+            segment = self._next_segment()
+            self._generated += len(segment)
+            self._buffer = np.concatenate([self._buffer, segment])
+        out, self._buffer = self._buffer[:frames], self._buffer[frames:]
+        self._read += frames
+        while self._bursts and self._bursts[0][0] < self._read:
+            self.platform.heard.append(self._bursts.popleft()[1])
+        if self.platform.speed:
+            time.sleep(frames / float(FAKE_SAMPLE_RATE) / self.platform.speed)
+        return (np.clip(out, -1, 1) * 32767).astype('<i2').tobytes()
+
+class FakeOutputStream:
+    """Accepts cues without a sound card; nothing pulls the callback."""
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeMicrophone(sr.AudioSource):
+    """Stands in for sr.Microphone; recognizer calibration needs a real AudioSource."""
+
+    SAMPLE_RATE = FAKE_SAMPLE_RATE
+    SAMPLE_WIDTH = 2
+    CHUNK = 1024
+
+    def __init__(self, fake_platform):
+        # sr.AudioSource.__init__ only raises; it is an abstract base
+        self.platform = fake_platform
+        self.stream = None
+
+    def __enter__(self):
+        self.stream = self.platform.stream
+        return self
+
+    def __exit__(self, *exc):
+        self.stream = None
+        return False
+
+class FakePlatform(Platform):
+    """Every device in memory, for headless runs and profiling on any OS.
+
+    The microphone plays the utterances listed in LUCIFER_FAKE_SCRIPT (one
+    per line; a built-in script otherwise), looping when
+    LUCIFER_FAKE_LOOP is set; LUCIFER_FAKE_SPEED scales capture pacing.
+    """
+
+    name = "fake"
+    has_volume = True
+    has_apps = True
+    hears_own_output = False
+
+    def __init__(self, script=None, speed=None, loop=None):
+        if script is None:
+            script_path = os.environ.get("LUCIFER_FAKE_SCRIPT")
+            if script_path:
+                with open(script_path, encoding="utf-8") as f:
+                    script = [line.strip().upper() for line in f if line.strip()]
+        self.script = list(script or FAKE_DEFAULT_SCRIPT)
+        self.speed = float(os.environ.get("LUCIFER_FAKE_SPEED", 1.0)) if speed is None else speed
+        self.loop = bool(os.environ.get("LUCIFER_FAKE_LOOP")) if loop is None else loop
+        self.heard = deque(maxlen=1)  # only the utterance being captured can be recognized
+        self.volume = 50
+        self.muted = False
+        self.actions = []
+        self._position = 0
+        self._stream = None
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            self._stream = FakeAudioStream(self)
+        return self._stream
+
+    def next_utterance(self):
+        if self._position >= len(self.script):
+            if not self.loop:
+                return None
+            self._position = 0
+        text = self.script[self._position]
+        self._position += 1
+        return text
+
+    def create_tts_engine(self):
+        return FakeTTSEngine()
+
+    def microphone(self):
+        return FakeMicrophone(self)
+
+    def input_device_name(self):
+        return "fake microphone"
+
+    def input_format(self):
+        return FAKE_SAMPLE_RATE, 2
+
+    def play_beep(self, path):
+        self.actions.append("beep")
+
+    def open_output_stream(self, rate, frames_per_buffer, callback):
+        return FakeOutputStream()
+
+    def recognition_backends(self):
+        return [ScriptedBackend(self)]
+
+    def get_volume(self):
+        return self.volume
+
+    def set_volume(self, percent):
+        self.volume = percent
+
+    def get_mute(self):
+        return self.muted
+
+    def set_mute(self, muted):
+        self.muted = muted
+
+    def lock(self):
+        self.actions.append("lock")
+
+    def sleep(self):
+        self.actions.append("sleep")
+
+    def shutdown(self):
+        self.actions.append("shutdown")
+
+    def restart(self):
+        self.actions.append("restart")
+
+    def start_apps(self):
+        return {"notepad": "Microsoft.WindowsNotepad", "calculator": "Microsoft.WindowsCalculator"}
+
+    def app_launcher(self):
+        return FakeAppLauncher()
+
+    def launch_browser(self, args):
+        self.actions.append(("launch_browser", args[-1]))
+        return None
+
+    def open_url(self, uri):
+        self.actions.append(("open_url", uri))
+
+    def add_hotkey(self, combination, callback):
+        pass
+
+    def clear_hotkeys(self):
+        pass
+
+PLATFORMS = {"windows": WindowsPlatform, "posix": Platform, "fake": FakePlatform}
+
 CONFIG_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_config.json"
 
 def load_config():
@@ -213,85 +839,154 @@ def save_config(config):
         logger.exception("Failed to save config")
         print("Failed to save config:", e)
 
-if os.name == 'nt':
-    tts_engine = pyttsx3.init('sapi5')
-else:
-    tts_engine = pyttsx3.init()
-tts_engine.setProperty('volume', 1.0)
+config = load_config()
+
+# LUCIFER_PLATFORM=fake (or "platform" in the config) runs with fake devices
+PLATFORM_NAME = os.environ.get("LUCIFER_PLATFORM") or config.get("platform") or ("windows" if os.name == 'nt' else "posix")
+host_platform = PLATFORMS[PLATFORM_NAME]()
+logger.info("Using %s platform backend", host_platform.name)
+
+tts_engine = host_platform.create_tts_engine()
 tts_lock = threading.Lock()
+tts_engine_broken = False  # set when speaking failed even after a re-init
+tts_rebuild_requested = False  # set by repairs; the next vocalise() builds a fresh engine
+last_speech_end = 0.0  # monotonic time the last spoken response finished
 mic_lock = threading.Lock()  # Lock to prevent concurrent microphone access
 is_muted = False
 exit_event = threading.Event()  # Global event to signal program exit
 
-# Global list to track clock app processes (used for alarms/timers)
-clock_app_procs = []
+CLOCK_APP_LABEL = "clock app"
+CHILD_CLOSE_TIMEOUT = 5
 
-def gracefully_close_window(pid):
-    """Attempt to gracefully close the window associated with the given process id."""
+def find_windows_for_pids(pids):
+    """Map each pid in `pids` to its top-level windows."""
     try:
-        import ctypes
-        import ctypes.wintypes
-        user32 = ctypes.windll.user32
-        WM_CLOSE = 0x0010
-        found_hwnd = []
-
-        def enum_windows_proc(hwnd, lParam):
-            pid_buffer = ctypes.wintypes.DWORD()
-            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid_buffer))
-            if pid_buffer.value == lParam:
-                found_hwnd.append(hwnd)
-            return True
-
-        EnumWindows = user32.EnumWindows
-        EnumWindowsProc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)
-        EnumWindows(EnumWindowsProc(enum_windows_proc), pid)
-        if found_hwnd:
-            for hwnd in found_hwnd:
-                user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
-            return True
-        else:
-            return False
+        return host_platform.find_windows(pids)
     except Exception as e:
-        logger.exception("Error in gracefully_close_window")
-        return False
+        logger.exception("Error enumerating windows")
+        return {}
 
-def close_clock_app():
-    global clock_app_procs
-    logger.info("Attempting to close clock app processes: %s", [p.pid for p in clock_app_procs])
-    if clock_app_procs:
-        for proc in clock_app_procs:
+def gracefully_close_windows(pids):
+    """Ask every window of the given pids to close. Returns the pids that had a window."""
+    windows = find_windows_for_pids(pids)
+    for hwnds in windows.values():
+        for hwnd in hwnds:
             try:
-                logger.debug("Checking process PID %d: alive=%s", proc.pid, proc.poll() is None)
-                if proc.poll() is None:
-                    logger.info("Attempting to close PID %d", proc.pid)
-                    if gracefully_close_window(proc.pid):
-                        logger.info("Sent close signal to PID %d", proc.pid)
-                        timeout = 5
-                        start_time = time.time()
-                        while time.time() - start_time < timeout:
-                            if proc.poll() is not None:
-                                logger.info("PID %d closed successfully", proc.pid)
-                                break
-                            time.sleep(0.2)
-                        else:
-                            logger.warning("Timeout waiting for PID %d to close", proc.pid)
-                    else:
-                        logger.warning("No window found for PID %d", proc.pid)
+                host_platform.close_window(hwnd)
             except Exception as e:
-                logger.exception("Error closing process PID %d", proc.pid)
-        clock_app_procs = []
-    else:
-        logger.info("No clock app processes to close")
+                logger.exception("Error posting WM_CLOSE")
+    return set(windows)
+
+class ChildProcessManager:
+    """Tracks processes launched by the assistant (browsers, apps).
+
+    Dead entries are reaped whenever the table is touched, so it never grows
+    past the number of live children.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._children = {}  # pid -> (Popen, label, launch time)
+
+    def track(self, proc, label):
+        with self._lock:
+            self._reap_locked()
+            self._children[proc.pid] = (proc, label, time.time())
+        logger.info("Tracking child PID %d (%s)", proc.pid, label)
+
+    def _reap_locked(self):
+        dead = [pid for pid, (proc, _, _) in self._children.items() if proc.poll() is not None]
+        for pid in dead:
+            del self._children[pid]
+        if dead:
+            logger.debug("Reaped dead children: %s", dead)
+
+    def reap(self):
+        with self._lock:
+            self._reap_locked()
+
+    def list(self, label=None):
+        """Return (pid, label, launch time) for live children, optionally filtered by label."""
+        with self._lock:
+            self._reap_locked()
+            return [(pid, lbl, launched) for pid, (_, lbl, launched) in self._children.items()
+                    if label is None or lbl == label]
+
+    def close(self, label=None, timeout=CHILD_CLOSE_TIMEOUT):
+        """Close live children in parallel under a single deadline.
+
+        Windows are resolved for all pids in one enumeration pass, every one
+        is sent WM_CLOSE, then all processes are awaited together. Returns
+        the number of children that exited.
+        """
+        with self._lock:
+            self._reap_locked()
+            targets = {pid: proc for pid, (proc, lbl, _) in self._children.items()
+                       if label is None or lbl == label}
+        if not targets:
+            logger.info("No child processes to close (label=%s)", label)
+            return 0
+        logger.info("Closing child processes: %s", sorted(targets))
+        with_window = gracefully_close_windows(targets)
+        for pid in set(targets) - with_window:
+            logger.warning("No window found for PID %d", pid)
+        alive, windowless = [], []
+        for pid in targets:
+            try:
+                (alive if pid in with_window else windowless).append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                pass  # exited on its own before it was asked to close
+        # Wait in slices so an action timeout can cancel a long close
+        closed = 0
+        deadline = time.monotonic() + timeout
+        while alive and not action_cancelled():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            gone, alive = psutil.wait_procs(alive, timeout=min(0.5, remaining))
+            closed += len(gone)
+        for p in alive:
+            logger.warning("Timeout waiting for PID %d to close", p.pid)
+        if windowless:
+            # Not waited for, since nothing asked them to close, but they count if they went meanwhile
+            gone, _ = psutil.wait_procs(windowless, timeout=0)
+            closed += len(gone)
+        self.reap()
+        logger.info("Closed %d of %d child processes", closed, len(targets))
+        return closed
+
+process_manager = ChildProcessManager()
+
+def close_clock_app():
+    process_manager.close(label=CLOCK_APP_LABEL)
+
+# Actions run as routine steps have their speech collected into one summary
+_speech_capture = threading.local()
 
 def vocalise(message):
+    collected = getattr(_speech_capture, "messages", None)
+    if collected is not None:
+        logger.info(f"Response (collected): {message}")
+        collected.append(message)
+        return
+    room = current_room()
+    if room.remote:
+        logger.info(f"Response ({room.name}): {message}")
+        room.say(message)
+        return
     logger.info(f"Response: {message}")
+    global last_speech_end, tts_engine, tts_engine_broken, tts_rebuild_requested
     try:
         with tts_lock:
             logger.info("Acquired TTS lock")
             release_audio_device()  # Force release the audio device
             logger.info("Audio device released forcefully.")
             time.sleep(0.2)  # Small delay to ensure the device is released
-            global tts_engine
+            if tts_rebuild_requested:
+                # Speech drivers are thread-affine, so the engine is built by the thread that speaks with it
+                tts_rebuild_requested = False
+                tts_engine = host_platform.create_tts_engine()
+                logger.info("TTS engine rebuilt")
             try:
                 logger.info("Attempting to speak using TTS engine")
                 tts_engine.say(message)
@@ -299,16 +994,99 @@ def vocalise(message):
                 logger.info("TTS engine spoke successfully")
             except Exception as e:
                 logger.warning("TTS engine error, reinitializing...")
-                tts_engine = pyttsx3.init('sapi5' if os.name == 'nt' else None)
-                tts_engine.setProperty('volume', 1.0)
+                tts_engine = host_platform.create_tts_engine()
                 tts_engine.say(message)
                 tts_engine.runAndWait()
                 logger.info("TTS engine reinitialized and spoke successfully")
+            tts_engine_broken = False
     except Exception as e:
+        tts_engine_broken = True
         logger.exception("TTS failure")
+    finally:
+        last_speech_end = time.monotonic()
     print(f"[Voice]: {message}")
 
+def overlaps_own_speech(started):
+    """True if speech whose onset was heard at monotonic time `started` may be the assistant's own voice."""
+    if not host_platform.hears_own_output:
+        return False
+    return tts_lock.locked() or started < last_speech_end
+
+# Resolved environment: paths, registry lookups and URIs computed once and reused
+ENV_VALIDATE_INTERVAL = 10  # seconds between cheap validity checks of a cached entry
+ENV_NEGATIVE_TTL = 60       # seconds a "not found" (None) result is kept before looking again
+BROWSER_CHOICE_KEY = r"Software\Microsoft\Windows\Shell\Associations\UrlAssociations\http\UserChoice"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class EnvironmentResolver:
+    """Caches values that are expensive to look up but rarely change.
+
+    Each entry has a `compute()` and an optional cheap `stamp(value)` (a file
+    mtime, a registry key's last-write time). A cached value is returned
+    as-is until its stamp changes, checked at most every
+    ENV_VALIDATE_INTERVAL seconds, or until invalidate() is called, e.g. by
+    the registry change watcher. A None result has nothing to stamp, so it
+    is looked up again after ENV_NEGATIVE_TTL seconds instead, e.g. to find
+    a browser installed while the assistant was running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._cache = {}   # name -> (value, stamp, last checked)
+
+    def register(self, name, compute, stamp=None):
+        self._entries[name] = (compute, stamp)
+
+    def is_cached(self, name):
+        with self._lock:
+            return name in self._cache
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def get(self, name):
+        compute, stamp = self._entries[name]
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(name)
+        if cached is not None and cached[0] is None:
+            if now - cached[2] < ENV_NEGATIVE_TTL:
+                return None
+            cached = None
+        if cached is not None:
+            value, value_stamp, checked = cached
+            if stamp is None or now - checked < ENV_VALIDATE_INTERVAL:
+                return value
+            current = stamp(value)
+            if current == value_stamp:
+                with self._lock:
+                    self._cache[name] = (value, value_stamp, now)
+                return value
+            logger.info("Environment entry %s changed, resolving again", name)
+        value = compute()
+        value_stamp = stamp(value) if stamp else None
+        with self._lock:
+            self._cache[name] = (value, value_stamp, now)
+        return value
+
+def file_stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+def lookup_default_browser():
+    return host_platform.default_browser_path()
+
 def find_brave_path():
+    return environment.get("brave_path")
+
+def lookup_brave_path():
     possible_paths = [
         r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe",
         r"C:\Program Files (x86)\BraveSoftware\Brave-Browser\Application\brave.exe",
@@ -316,13 +1094,35 @@ def find_brave_path():
     ]
     return next((path for path in possible_paths if os.path.exists(path)), None)
 
-def lock_computer():
-    vocalise("Locking computer")
+def existing_file(name):
+    path = os.path.join(APP_DIR, name)
+    return path if os.path.exists(path) else None
+
+def clock_page_uri():
+    path = environment.get("clock_html")
+    if not path:
+        return None
+    return urllib.parse.urlunparse(('file', '', urllib.request.pathname2url(path), '', '', ''))
+
+def browser_choice_changed():
+    logger.info("Default browser registry key changed")
+    environment.invalidate("browser_path")
+
+def watch_browser_choice():
+    """Invalidate the cached browser whenever the platform reports a new default browser."""
+    host_platform.watch_browser_choice(browser_choice_changed)
+
+environment = EnvironmentResolver()
+environment.register("browser_path", lookup_default_browser, lambda value: host_platform.browser_choice_stamp())
+environment.register("brave_path", lookup_brave_path, lambda value: value and os.path.exists(value))
+environment.register("clock_html", lambda: existing_file("CLOCK APP.html"), lambda value: value and os.path.exists(value))
+environment.register("clock_uri", clock_page_uri, lambda value: environment.get("clock_html"))
+environment.register("beep_path", lambda: existing_file("WAKEBEEP.m4a"), file_stamp)
+
+def lock_computer():
+    vocalise("Locking computer")
     try:
-        if os.name == 'nt':
-            ctypes.windll.user32.LockWorkStation()
-        else:
-            keyboard.press_and_release('win+l')
+        host_platform.lock()
     except Exception as e:
         logger.exception("Error locking computer")
         print("Error locking computer:", e)
@@ -330,11 +1130,7 @@ def lock_computer():
 def sleep_computer():
     vocalise("Putting computer to sleep")
     try:
-        if os.name == 'nt':
-            ctypes.windll.powrprof.SetSuspendState(0, 0, 0)
-            lock_computer()
-        else:
-            os.system('systemctl suspend')
+        host_platform.sleep()
     except Exception as e:
         logger.exception("Error putting computer to sleep")
         print("Error putting computer to sleep:", e)
@@ -342,10 +1138,7 @@ def sleep_computer():
 def shutdown_computer():
     vocalise("Shutting down computer in 60 seconds")
     try:
-        if os.name == 'nt':
-            os.system("shutdown /s /t 60")
-        else:
-            os.system("shutdown -h +1")
+        host_platform.shutdown()
     except Exception as e:
         logger.exception("Error shutting down computer")
         print("Error shutting down computer:", e)
@@ -353,40 +1146,28 @@ def shutdown_computer():
 def restart_computer():
     vocalise("Restarting computer in 60 seconds")
     try:
-        if os.name == 'nt':
-            os.system("shutdown /r /t 60")
-        else:
-            os.system("shutdown -r +1")
+        host_platform.restart()
     except Exception as e:
         logger.exception("Error restarting computer")
         print("Error restarting computer:", e)
 
-def confirm_action(recognizer, action, action_text):
-    vocalise(f"{action_text} command received, awaiting confirmation.")
-    try:
-        with mic_lock:
-            with sr.Microphone() as source:
-                recognizer.adjust_for_ambient_noise(source, duration=2.0)
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=5)
-        confirmation = recognize_audio(recognizer, audio).upper().strip()
+def confirm_action(action, action_text):
+    def fill(confirmation):
         if "ACTIVATE" in confirmation:
+            current_room().cue("confirm")
             vocalise(f"Confirmation received. {action_text} in 60 seconds")
             action()
             exit_event.set()
-            return True
         else:
             vocalise(f"{action_text} cancelled.")
-            return False
-    except sr.WaitTimeoutError:
-        vocalise(f"{action_text} confirmation timed out. {action_text} cancelled.")
-        return False
-    except sr.UnknownValueError:
-        vocalise(f"Did not understand confirmation. {action_text} cancelled.")
-        return False
-    except Exception as e:
-        logger.exception(f"Error during {action_text} confirmation")
-        vocalise(f"{action_text} cancelled due to error.")
-        return False
+
+    return SlotRequest(
+        "confirmation",
+        f"{action_text} command received, awaiting confirmation.",
+        fill,
+        grammar=grammar_file("confirm", CONFIRM_GRAMMAR),
+        expired_message=f"{action_text} confirmation timed out. {action_text} cancelled."
+    )
 
 def battery_status():
     battery = psutil.sensors_battery()
@@ -409,6 +1190,13 @@ def check_battery_alert():
             vocalise(f"Battery level is {battery.percent}%. Charge the laptop before discharge.")
             last_battery_alert = time.time()
 
+def on_battery_power():
+    try:
+        battery = psutil.sensors_battery()
+    except Exception:
+        return False
+    return battery is not None and not battery.power_plugged
+
 def tell_current_time():
     current_time = datetime.now().strftime("%I:%M:%S %p")
     vocalise(f"The current time is {current_time}.")
@@ -430,73 +1218,32 @@ def tell_day_and_date(day_first=True):
         vocalise(f"Today's date is {date_str} and the day is {day}.")
 
 def set_volume(percent):
-    try:
-        import comtypes
-        from comtypes import CLSCTX_INPROC_SERVER
-        from ctypes import POINTER, cast
-        from comtypes.client import CreateObject
-    except Exception as e:
-        logger.exception("COM components for volume control not available")
+    if not host_platform.has_volume:
         vocalise("Volume control is not available on this system.")
         return
     try:
-        comtypes.CoInitialize()
-        mmde = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            CLSCTX_INPROC_SERVER
-        )
-        device = mmde.GetDefaultAudioEndpoint(0, 0)
-        endpoint_ptr = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_INPROC_SERVER, None)
-        endpoint = cast(endpoint_ptr, POINTER(IAudioEndpointVolume))
         percent = max(0, min(100, percent))
         logger.debug("Setting system volume to %d percent", percent)
-        endpoint.SetMasterVolumeLevelScalar(percent / 100.0, None)
+        host_platform.set_volume(percent)
         logger.info("Volume set to %d percent", percent)
         vocalise(f"Volume set to {percent} percent.")
     except Exception as e:
         logger.exception("Error setting system volume")
         vocalise("Failed to set volume.")
-    finally:
-        try:
-            comtypes.CoUninitialize()
-        except Exception:
-            pass
 
 def get_volume():
-    try:
-        import comtypes
-        from comtypes import CLSCTX_INPROC_SERVER
-        from ctypes import POINTER, cast
-        from comtypes.client import CreateObject
-    except Exception as e:
-        logger.exception("COM components for volume control not available")
+    if not host_platform.has_volume:
         return None
     try:
-        comtypes.CoInitialize()
-        mmde = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            CLSCTX_INPROC_SERVER
-        )
-        device = mmde.GetDefaultAudioEndpoint(0, 0)
-        endpoint_ptr = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_INPROC_SERVER, None)
-        endpoint = cast(endpoint_ptr, POINTER(IAudioEndpointVolume))
-        vol_scalar = endpoint.GetMasterVolumeLevelScalar()
-        vol_percentage = round(vol_scalar * 100)
+        vol_percentage = host_platform.get_volume()
         logger.info("Retrieved system volume: %d percent", vol_percentage)
         return vol_percentage
     except Exception as e:
         logger.exception("Error getting system volume")
         return None
-    finally:
-        try:
-            comtypes.CoUninitialize()
-        except Exception:
-            pass
 
 def volume_up():
-    if os.name != 'nt':
+    if not host_platform.has_volume:
         vocalise("Volume control not supported on this OS.")
         return
     try:
@@ -511,7 +1258,7 @@ def volume_up():
         vocalise("Failed to increase volume.")
 
 def volume_down():
-    if os.name != 'nt':
+    if not host_platform.has_volume:
         vocalise("Volume control not supported on this OS.")
         return
     try:
@@ -526,41 +1273,22 @@ def volume_down():
         vocalise("Failed to decrease volume.")
 
 def toggle_mute_volume():
-    if os.name != 'nt':
+    if not host_platform.has_volume:
         vocalise("Volume control not supported on this OS.")
         return
     try:
-        import comtypes
-        from comtypes import CLSCTX_INPROC_SERVER
-        from ctypes import POINTER, cast
-        from comtypes.client import CreateObject
-        comtypes.CoInitialize()
-        mmde = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator,
-            IMMDeviceEnumerator,
-            CLSCTX_INPROC_SERVER
-        )
-        device = mmde.GetDefaultAudioEndpoint(0, 0)
-        endpoint_ptr = device.Activate(IAudioEndpointVolume._iid_, CLSCTX_INPROC_SERVER, None)
-        endpoint = cast(endpoint_ptr, POINTER(IAudioEndpointVolume))
-        current_mute = endpoint.GetMute()
-        new_mute = 0 if current_mute == 1 else 1
-        endpoint.SetMute(new_mute, None)
-        logger.info("Toggled mute from %d to %d", current_mute, new_mute)
+        current_mute = host_platform.get_mute()
+        host_platform.set_mute(not current_mute)
+        logger.info("Toggled mute from %s to %s", current_mute, not current_mute)
         global is_muted
-        is_muted = bool(new_mute)
-        if new_mute:
+        is_muted = not current_mute
+        if is_muted:
             vocalise("Volume muted.")
         else:
             vocalise("Volume unmuted.")
     except Exception as e:
         logger.exception("Error toggling mute")
         vocalise("Failed to toggle mute.")
-    finally:
-        try:
-            comtypes.CoUninitialize()
-        except Exception:
-            pass
 
 # Updated exit_phrases: Removed commands that turn off speech recognition
 exit_phrases = {
@@ -614,6 +1342,14 @@ lock_phrases = [
     "LOCK THE COMPUTER", "LOCK THE LAPTOP", "LOCK THE PC", "INITIATE LOCK", "SYSTEM LOCK"
 ]
 
+list_children_phrases = [
+    "LIST OPEN APPS", "LIST RUNNING APPS", "WHAT APPS ARE OPEN", "WHAT DID YOU OPEN", "WHAT IS OPEN"
+]
+
+close_children_phrases = [
+    "CLOSE EVERYTHING", "CLOSE ALL APPS", "CLOSE ALL WINDOWS", "CLOSE ALL"
+]
+
 wake_words = ["HELLO LUCIFER", "HEY LUCIFER", "HEY LUCY", "LUCIFER", "LUCY"]
 
 def check_for_wake(text):
@@ -625,40 +1361,151 @@ def check_for_wake(text):
         return True, command_candidate
     return False, ""
 
-# New functionality: Properly close apps using PowerShell remains unchanged
+class AppLauncher(abc.ABC):
+    """Launches Start-menu apps and closes running ones.
+
+    ShellAppLauncher is the real implementation; FakeAppLauncher stands in
+    for it in tests.
+    """
+
+    @abc.abstractmethod
+    def launch(self, appid):
+        """Launch the AppsFolder entry `appid`. Returns a Popen to track, or None."""
+
+    @abc.abstractmethod
+    def close(self, process_names):
+        """Close every process whose name is in `process_names`. Returns the number closed."""
+
+class ShellAppLauncher(AppLauncher):
+    """Launches through ShellExecute and closes through psutil.
+
+    PowerShell is only used when the native path raises. ShellExecute hands
+    AppsFolder targets to Explorer, which starts the app, so a native launch
+    has no child PID to track: those apps are not in process_manager (and
+    "close everything" leaves them alone) but can still be closed by name.
+    """
+
+    CLOSE_TIMEOUT = 3
+
+    def launch(self, appid):
+        target = f'shell:AppsFolder\\{appid}'
+        try:
+            os.startfile(target)
+            return None
+        except Exception as e:
+            logger.warning("Native launch of %s failed (%s), falling back to PowerShell", appid, e)
+        return subprocess.Popen(["powershell", "-Command", f"Start-Process '{target}'"])
+
+    @staticmethod
+    def process_index():
+        """Map lower-case process names (without .exe) to psutil processes in one scan."""
+        index = {}
+        for proc in psutil.process_iter(['name']):
+            name = (proc.info.get('name') or "").lower()
+            if name.endswith(".exe"):
+                name = name[:-4]
+            if name:
+                index.setdefault(name, []).append(proc)
+        return index
+
+    def close(self, process_names):
+        try:
+            index = self.process_index()
+            procs = []
+            for proc in (proc for name in process_names for proc in index.get(name, [])):
+                try:
+                    proc.terminate()
+                    procs.append(proc)
+                except psutil.NoSuchProcess:
+                    pass
+                except psutil.Error as e:
+                    logger.warning("Can't terminate PID %d (%s)", proc.pid, e)
+            gone, alive = psutil.wait_procs(procs, timeout=self.CLOSE_TIMEOUT)
+            closed = len(gone)
+            for proc in alive:
+                try:
+                    proc.kill()
+                    closed += 1
+                except psutil.NoSuchProcess:
+                    closed += 1
+                except psutil.Error as e:
+                    logger.warning("Can't kill PID %d (%s)", proc.pid, e)
+            return closed
+        except Exception as e:
+            logger.exception("Native close failed, falling back to PowerShell")
+        closed = 0
+        for name in process_names:
+            # -PassThru echoes each process actually stopped, so the count is real
+            result = subprocess.run(
+                ["powershell", "-Command",
+                 f"@(Stop-Process -Name '{name}' -Force -PassThru -ErrorAction SilentlyContinue).Count"],
+                capture_output=True, text=True)
+            try:
+                closed += int(result.stdout.strip() or 0)
+            except ValueError:
+                logger.warning("Unexpected Stop-Process output for %s: %r", name, result.stdout)
+        return closed
+
+class FakeAppLauncher(AppLauncher):
+    """In-memory launcher for tests: records launches and closes against a fake process table."""
+
+    def __init__(self, running=None):
+        self.running = dict(running or {})  # process name -> instance count
+        self.launched = []
+        self.closed = []
+
+    def launch(self, appid):
+        self.launched.append(appid)
+        return None
+
+    def close(self, process_names):
+        self.closed.extend(process_names)
+        return sum(self.running.pop(name, 0) for name in process_names)
+
+app_launcher = host_platform.app_launcher()
+
+def process_names_for_app(app_name):
+    """Guess the process names a spoken app name may run as."""
+    name = app_name.lower().strip()
+    names = {name, name.replace(" ", "")}
+    if app_list_cache is None:
+        load_app_list()
+    appid = app_list_cache.get(name) if app_list_cache else None
+    # Desktop apps are listed by executable path, e.g. "{GUID}\\notepad.exe"
+    if appid and appid.lower().endswith(".exe"):
+        names.add(os.path.splitext(os.path.basename(appid.replace("\\", "/")))[0].lower())
+    return sorted(names)
+
 def close_app_by_name(app_name):
-    # Use PowerShell to close the app
-    subprocess.run(["powershell", "-Command", f"Stop-Process -Name {app_name} -Force"], shell=True)
-    # Example usage (do not call here): close_app_by_name("notepad")
+    if not host_platform.has_apps:
+        vocalise("Close app functionality is not supported on this OS.")
+        return
+    try:
+        closed = app_launcher.close(process_names_for_app(app_name))
+    except Exception as e:
+        logger.exception(f"Failed to close app {app_name}")
+        vocalise(f"Failed to close {app_name}.")
+        return
+    if closed:
+        vocalise(f"Closed {app_name}.")
+    else:
+        vocalise(f"{app_name} is not running.")
 
 app_list_cache = None
 
 def load_app_list():
     global app_list_cache
-    if os.name != 'nt':
+    if not host_platform.has_apps:
         return {}
     try:
-        result = subprocess.check_output(
-            ["powershell", "-Command", "Get-StartApps | ConvertTo-Json"],
-            stderr=subprocess.DEVNULL
-        )
-        apps = json.loads(result)
-        if isinstance(apps, dict):
-            apps = [apps]
-        app_dict = {}
-        for app in apps:
-            name = app.get("Name", "").lower()
-            appid = app.get("AppID", "")
-            if name and appid:
-                app_dict[name] = appid
-        app_list_cache = app_dict
-        return app_dict
+        app_list_cache = host_platform.start_apps()
+        return app_list_cache
     except Exception as e:
         logger.exception("Failed to load app list using Get-StartApps")
         return {}
 
-def open_app(app_name, recognizer=None):
-    if os.name != 'nt':
+def open_app(app_name, allow_retry=True):
+    if not host_platform.has_apps:
         vocalise("Open app functionality is not supported on this OS.")
         return
     global app_list_cache
@@ -678,36 +1525,40 @@ def open_app(app_name, recognizer=None):
         return
     if app_list_cache is None:
         load_app_list()
+    else:
+        prewarmer.used("app_index")
     appid = app_list_cache.get(app_name_lower) if app_list_cache else None
     if not appid:
-        vocalise(f"App {app_name} not found. Please say the app name again.")
-        if recognizer:
-            try:
-                with mic_lock:
-                    with sr.Microphone() as source:
-                        audio = recognizer.listen(source, timeout=6, phrase_time_limit=6)
-                extra_app = recognize_audio(recognizer, audio).upper().strip()
-                if extra_app.startswith("OPEN "):
-                    extra_app = extra_app[5:].strip()
-                app_name_lower = extra_app.lower()
-                if app_list_cache is None:
-                    load_app_list()
-                appid = app_list_cache.get(app_name_lower) if app_list_cache else None
-                if not appid:
-                    vocalise(f"App {extra_app} not found.")
-                    return
-            except Exception as e:
-                logger.exception("Additional app input error")
-                vocalise("Failed to receive valid app input.")
-                return
+        if not allow_retry:
+            vocalise(f"App {app_name} not found.")
+            return None
+        return SlotRequest(
+            "app_name",
+            f"App {app_name} not found. Please say the app name again.",
+            lambda answer: open_app(answer, allow_retry=False),
+            grammar=app_name_grammar(app_list_cache or {}),
+            expired_message="Failed to receive valid app input."
+        )
     try:
-        command = f'shell:AppsFolder\\{appid}'
-        subprocess.Popen(["powershell", "-Command", f"Start-Process '{command}'"])
+        proc = app_launcher.launch(appid)
+        if proc is not None:
+            process_manager.track(proc, app_name.lower())
         vocalise(f"Opening {app_name}.")
     except Exception as e:
         logger.exception(f"Failed to open app {app_name}")
         vocalise(f"Failed to open {app_name}.")
 
+def list_child_processes():
+    children = process_manager.list()
+    if not children:
+        vocalise("Nothing I opened is still running.")
+        return
+    counts = {}
+    for _, label, _ in children:
+        counts[label] = counts.get(label, 0) + 1
+    parts = [f"{count} {label}" if count > 1 else label for label, count in counts.items()]
+    vocalise("Currently open: " + ", ".join(parts) + ".")
+
 def parse_duration(text):
     pattern = r'(\d+)\s*(HOUR|HOURS|MINUTE|MINUTES|SECOND|SECONDS)'
     matches = re.findall(pattern, text, re.IGNORECASE)
@@ -771,14 +1622,468 @@ def parse_time(text):
         ring_time = candidate
     return ring_time, ring_time.strftime("%I:%M %p")
 
+TIMER_JOURNAL_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_timers.journal"
+TIMER_JOURNAL_COMPACT_AFTER = 200  # records appended before the journal is rewritten
+
+class TimerJournal:
+    """Append-only journal of timer/alarm creations, cancellations and firings.
+
+    Every record is one JSON line, fsync'd before the call returns, so a
+    pending timer survives the assistant being killed or the machine
+    rebooting. The file is periodically rewritten to hold only live entries.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}  # id -> create record, live entries only
+        self._records = 0
+        self._next_id = 1
+
+    def replay(self):
+        """Load the journal and return the live (not cancelled or fired) entries."""
+        with self._lock:
+            self._entries = {}
+            self._records = 0
+            corrupt = False
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # A torn final write from a crash; everything before it is intact
+                            logger.warning("Skipping corrupt timer journal record")
+                            corrupt = True
+                            continue
+                        self._apply(record)
+                        self._records += 1
+            except FileNotFoundError:
+                pass
+            if corrupt:
+                # Rewrite so new records are not appended onto the torn line
+                self._compact()
+            if self._entries:
+                self._next_id = max(self._next_id, max(self._entries) + 1)
+            return [dict(entry) for entry in self._entries.values()]
+
+    def _apply(self, record):
+        entry_id = record.get("id")
+        op = record.get("op")
+        if op == "create":
+            self._entries[entry_id] = dict(record)
+            self._next_id = max(self._next_id, entry_id + 1)
+        elif op == "page" and entry_id in self._entries:
+            self._entries[entry_id]["pid"] = record.get("pid")
+            self._entries[entry_id]["pid_started"] = record.get("pid_started")
+        elif op in ("cancel", "fire"):
+            self._entries.pop(entry_id, None)
+
+    def _append(self, record):
+        record["t"] = time.time()
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+            self._records += 1
+            if self._records > TIMER_JOURNAL_COMPACT_AFTER and self._records > 4 * len(self._entries):
+                self._compact()
+
+    def _compact(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        records = []
+        for entry in self._entries.values():
+            records.append({key: value for key, value in entry.items() if key not in ("pid", "pid_started")})
+            if entry.get("pid"):
+                records.append({"op": "page", "id": entry["id"], "pid": entry["pid"],
+                                "pid_started": entry.get("pid_started"), "t": entry["t"]})
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._records = len(records)
+        logger.info("Compacted timer journal to %d records", self._records)
+
+    def create(self, mode, deadline, label=""):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+        self._append({"op": "create", "id": entry_id, "mode": mode, "deadline": deadline, "label": label})
+        return entry_id
+
+    def page_opened(self, entry_id, pid, pid_started):
+        self._append({"op": "page", "id": entry_id, "pid": pid, "pid_started": pid_started})
+
+    def cancel(self, entry_id):
+        self._append({"op": "cancel", "id": entry_id})
+
+    def fire(self, entry_id, missed=False):
+        self._append({"op": "fire", "id": entry_id, "missed": missed})
+
+    def live_entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+class DeadlineScheduler:
+    """Runs `callback(key)` at absolute wall-clock deadlines from one thread."""
+
+    MAX_WAIT = 30  # seconds; re-check the wall clock at least this often to notice sleep/resume
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._cond = threading.Condition()
+        self._heap = []
+        self._deadlines = {}
+        self._thread = None
+        self._stopped = False
+
+    def add(self, key, deadline):
+        with self._cond:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            self._deadlines.pop(key, None)
+            self._cond.notify()
+
+    def stop(self):
+        """Drop every deadline and let the thread exit; later add() calls never fire."""
+        with self._cond:
+            self._stopped = True
+            self._deadlines.clear()
+            self._heap.clear()
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        while not exit_event.is_set():
+            with self._cond:
+                if self._stopped:
+                    return
+                # Drop heap items superseded by cancel() or a later add()
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait(self.MAX_WAIT)
+                    continue
+                deadline, key = self._heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._cond.wait(min(delay, self.MAX_WAIT))
+                    continue
+                heapq.heappop(self._heap)
+                del self._deadlines[key]
+            try:
+                self._callback(key)
+            except Exception as e:
+                logger.exception("Deadline callback failed for %s", key)
+
+# Bounded executor for side effects so the capture loop never waits on an action
+ACTION_WORKERS = 4
+ACTION_QUEUE_LIMIT = 16
+ACTION_TIMEOUT = 30  # seconds before a task's cancellation token is set
+ACTION_STATS_WINDOW = 100
+
+# Tasks are grouped by name; each group has its own concurrency limit
+ACTION_GROUPS = {
+    "set_volume": "volume", "max_volume": "volume", "volume_up": "volume", "volume_down": "volume",
+    "toggle_mute": "volume", "mute": "volume", "volume": "volume",
+    "timer": "clock", "alarm": "clock", "clock": "clock", "cancel_timer": "clock", "close_clock_app": "clock",
+    "open_app": "apps", "close_app": "apps", "open": "apps", "close": "apps",
+    "close_children": "apps", "list_children": "apps",
+    "shutdown": "power", "restart": "power", "sleep": "power", "lock": "power",
+}
+ACTION_LIMITS = {"volume": 1, "clock": 2, "apps": 2, "power": 1}
+ACTION_DEFAULT_LIMIT = 2
+
+_action_local = threading.local()
+
+def current_task():
+    """The ActionTask running on this thread, or None outside the executor."""
+    return getattr(_action_local, "task", None)
+
+def action_cancelled():
+    task = current_task()
+    return task is not None and task.cancel.is_set()
+
+class ActionTask:
+    def __init__(self, name, fn, args, timeout, interaction=None, on_done=None):
+        self.name = name
+        self.group = ACTION_GROUPS.get(name, name)
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.interaction = interaction
+        self.on_done = on_done
+        self.cancel = threading.Event()   # cooperative cancellation token
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+class ActionExecutor:
+    """Runs side effects on a fixed pool of workers with a bounded queue.
+
+    Each group of tasks (see ACTION_GROUPS) has a concurrency limit; a worker
+    takes the oldest queued task whose group has room. When a task outlives
+    its timeout its cancellation token is set, which long-running actions
+    poll through action_cancelled().
+    """
+
+    def __init__(self, workers=ACTION_WORKERS, max_queue=ACTION_QUEUE_LIMIT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = {}
+        self._threads = []
+        self._timeouts = DeadlineScheduler(self._on_deadline)
+        self._tasks = {}
+        self._stats = {}
+
+    def submit(self, name, fn, *args, timeout=ACTION_TIMEOUT, interaction=None, on_done=None):
+        """Queue `fn(*args)`; returns the ActionTask, or None when the queue is full."""
+        task = ActionTask(name, fn, args, timeout, interaction, on_done)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                logger.warning("Action queue full (%d), rejecting %s", len(self._queue), name)
+                self._stat(name)["rejected"] += 1
+                return None
+            self._queue.append(task)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, name=f"action-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return task
+
+    def call_later(self, delay, name, fn, *args):
+        """Submit `fn(*args)` after `delay` seconds without holding a thread meanwhile."""
+        task = ActionTask(name, fn, args, ACTION_TIMEOUT)
+        key = ("later", id(task))
+        with self._cond:
+            self._tasks[key] = task
+        self._timeouts.add(key, time.time() + delay)
+
+    def _on_deadline(self, key):
+        with self._cond:
+            task = self._tasks.pop(key, None)
+        if task is None:
+            return
+        if key[0] == "later":
+            self.submit(task.name, task.fn, *task.args)
+            return
+        if not task.done.is_set():
+            task.cancel.set()
+            with self._cond:
+                self._stat(task.name)["timeouts"] += 1
+            logger.warning("Action %s exceeded %d s, cancellation requested", task.name, task.timeout)
+
+    def _stat(self, name):
+        if name not in self._stats:
+            self._stats[name] = {"runs": 0, "errors": 0, "timeouts": 0, "rejected": 0,
+                                 "wait_ms": deque(maxlen=ACTION_STATS_WINDOW), "run_ms": deque(maxlen=ACTION_STATS_WINDOW)}
+        return self._stats[name]
+
+    def _next_task(self):
+        for index, task in enumerate(self._queue):
+            if self._running.get(task.group, 0) < ACTION_LIMITS.get(task.group, ACTION_DEFAULT_LIMIT):
+                return self._queue.pop(index)
+        return None
+
+    def _worker(self):
+        while not exit_event.is_set():
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait(5)
+                    if exit_event.is_set():
+                        return
+                    task = self._next_task()
+                self._running[task.group] = self._running.get(task.group, 0) + 1
+            self._run(task)
+            with self._cond:
+                self._running[task.group] -= 1
+                self._cond.notify_all()
+
+    def _run(self, task):
+        task.started = time.perf_counter()
+        key = ("timeout", id(task))
+        if task.timeout:
+            with self._cond:
+                self._tasks[key] = task
+            self._timeouts.add(key, time.time() + task.timeout)
+        _action_local.task = task
+        if task.interaction is not None:
+            begin_interaction(task.interaction)
+        try:
+            task.result = task.fn(*task.args)
+        except Exception as e:
+            task.error = e
+            logger.exception(f"Action {task.name} failed")
+        finally:
+            _action_local.task = None
+            if task.interaction is not None:
+                end_interaction()
+            task.finished = time.perf_counter()
+            task.done.set()
+            self._timeouts.cancel(key)
+            with self._cond:
+                self._tasks.pop(key, None)
+                stat = self._stat(task.name)
+                stat["runs"] += 1
+                stat["errors"] += task.error is not None
+                stat["wait_ms"].append((task.started - task.submitted) * 1000)
+                stat["run_ms"].append((task.finished - task.started) * 1000)
+        if task.on_done:
+            try:
+                task.on_done(task)
+            except Exception as e:
+                logger.exception(f"Completion callback for {task.name} failed")
+
+    def stats(self):
+        """Queue depth, running tasks per group and per-task-name latency metrics."""
+        with self._cond:
+            per_action = {}
+            for name, stat in self._stats.items():
+                waits, runs = list(stat["wait_ms"]), list(stat["run_ms"])
+                per_action[name] = {
+                    "runs": stat["runs"], "errors": stat["errors"], "timeouts": stat["timeouts"], "rejected": stat["rejected"],
+                    "avg_wait_ms": round(sum(waits) / len(waits), 1) if waits else None,
+                    "avg_run_ms": round(sum(runs) / len(runs), 1) if runs else None,
+                    "max_run_ms": round(max(runs), 1) if runs else None,
+                }
+            return {"queued": len(self._queue), "running": {g: n for g, n in self._running.items() if n},
+                    "actions": per_action}
+
+action_executor = ActionExecutor()
+
+timer_journal = TimerJournal(TIMER_JOURNAL_FILE)
+
+def on_clock_entry_due(entry_id):
+    # The clock page does the ringing; the assistant only records that it happened
+    timer_journal.fire(entry_id)
+    logger.info("Clock entry %s fired", entry_id)
+    play_cue("alarm")
+
+clock_scheduler = DeadlineScheduler(on_clock_entry_due)
+
+def open_clock_page(entries):
+    """Open the clock page for `entries`, a list of (journal id, mode, ring time).
+
+    A clock page that is already open adopts the entries and the new one
+    closes itself (see CLOCK APP.html), so one page shows every entry.
+    """
+    proc = open_clock_app(mode=entries[0][1].lower(), entries=entries, keep_open=True)
+    if proc and proc is not True:
+        try:
+            pid_started = psutil.Process(proc.pid).create_time()
+            for entry_id, _, _ in entries:
+                timer_journal.page_opened(entry_id, proc.pid, pid_started)
+        except Exception as e:
+            logger.warning("Could not record clock page PID %d: %s", proc.pid, e)
+    return proc
+
+def browser_running(browser_path):
+    """True if any process runs the `browser_path` executable."""
+    target = os.path.normcase(os.path.normpath(browser_path))
+    for proc in psutil.process_iter(['exe']):
+        exe = proc.info.get('exe')
+        if exe and os.path.normcase(os.path.normpath(exe)) == target:
+            return True
+    return False
+
+def clock_page_alive(entry):
+    """Best guess whether the page opened for `entry` is still showing.
+
+    The launcher PID is weak evidence: a browser that is already running
+    hands the URL to its main process and the launcher exits at once. So a
+    dead launcher only means the page is gone when the browser is not
+    running at all; an entry with no recorded page has never been shown.
+    """
+    pid = entry.get("pid")
+    if not pid:
+        return False
+    try:
+        if abs(psutil.Process(pid).create_time() - (entry.get("pid_started") or 0)) < 1:
+            return True
+    except Exception:
+        pass
+    try:
+        browser_path = resolve_browser_path()
+        return bool(browser_path) and browser_running(browser_path)
+    except Exception as e:
+        logger.warning("Could not check for a running browser: %s", e)
+        return True
+
+def reopen_clock_entries(entry_ids):
+    """Open one clock page for the entries in `entry_ids` that are still pending."""
+    # Runs on the executor, so entries may have fired or been cancelled since they were picked
+    pending = [entry for entry in timer_journal.live_entries()
+               if entry["id"] in entry_ids and entry["deadline"] > time.time()]
+    if not pending:
+        return None
+    pending.sort(key=lambda e: e["deadline"])
+    return open_clock_page([(entry["id"], entry["mode"], datetime.fromtimestamp(entry["deadline"])) for entry in pending])
+
+def restore_clock_entries():
+    """Replay the timer journal: re-arm future entries and announce missed ones."""
+    started = time.perf_counter()
+    entries = timer_journal.replay()
+    now = time.time()
+    missed = []
+    to_reopen = []
+    for entry in sorted(entries, key=lambda e: e["deadline"]):
+        if entry["deadline"] <= now:
+            timer_journal.fire(entry["id"], missed=True)
+            missed.append(entry)
+        else:
+            clock_scheduler.add(entry["id"], entry["deadline"])
+            if not clock_page_alive(entry):
+                to_reopen.append(entry)
+    logger.info("Replayed timer journal in %.1f ms: %d pending, %d missed",
+                (time.perf_counter() - started) * 1000.0, len(entries) - len(missed), len(missed))
+    if to_reopen:
+        action_executor.submit("clock", reopen_clock_entries, {entry["id"] for entry in to_reopen})
+    if missed:
+        descriptions = [f"{entry['mode'].lower()} for {datetime.fromtimestamp(entry['deadline']).strftime('%I:%M %p')}"
+                        for entry in missed]
+        vocalise("While I was offline I missed: " + ", ".join(descriptions) + ".")
+
+def cancel_clock_page(entry_ids):
+    """Tell the clock page to drop `entry_ids`; other entries keep ringing."""
+    # The page holding them may share a browser with the user's own tabs, so it
+    # is told through a short-lived page (see CLOCK APP.html) rather than closed
+    return open_clock_app(cancel=entry_ids)
+
+def cancel_clock_entries(mode):
+    """Cancel every pending entry of `mode` ("TIMER" or "ALARM") and remove it from the page."""
+    entries = [entry for entry in timer_journal.live_entries() if entry["mode"] == mode]
+    for entry in entries:
+        clock_scheduler.cancel(entry["id"])
+        timer_journal.cancel(entry["id"])
+    if entries:
+        action_executor.submit("clock", cancel_clock_page, [entry["id"] for entry in entries])
+    return len(entries)
+
 def timer_thread(ring_time, mode, duration_value, time_str, duration_description):
     try:
-        success = open_clock_app(
-            mode=mode.lower(),
-            duration=int(duration_value.total_seconds()) if isinstance(duration_value, timedelta) else duration_value,
-            ring_time=ring_time.strftime("%I:%M:%S %p"),
-            keep_open=True
-        )
+        # Journal first so the entry survives a crash while the page is opening
+        entry_id = timer_journal.create(mode, ring_time.timestamp())
+        clock_scheduler.add(entry_id, ring_time.timestamp())
+        success = open_clock_page([(entry_id, mode, ring_time)])
         if success:
             if duration_description:
                 vocalise(f"{mode.capitalize()} set for {duration_description} and it will ring at {time_str}.")
@@ -789,153 +2094,65 @@ def timer_thread(ring_time, mode, duration_value, time_str, duration_description
         logger.exception("Timer thread error")
         vocalise("Failed to set " + mode.lower())
 
-def set_timer(command, recognizer):
+def clock_entry_args(mode, command):
+    """Return timer_thread arguments for a spoken duration or time, or None if neither was found."""
     now = datetime.now()
     duration_val = parse_duration(command)
     if duration_val:
         ring_time = now + duration_val
-        time_str = ring_time.strftime("%I:%M %p")
-        try:
-            threading.Thread(
-                target=timer_thread,
-                args=(ring_time, "TIMER", duration_val, time_str, str(duration_val)),
-                daemon=True
-            ).start()
-        except Exception as e:
-            logger.exception("Failed to start timer thread for TIMER")
-            vocalise("Error setting timer.")
-        return
+        return (ring_time, mode, duration_val, ring_time.strftime("%I:%M %p"), str(duration_val))
     ring_time, time_str = parse_time(command)
-    if ring_time:
-        diff = ring_time - now
-        duration_str = str(diff).split('.')[0]
-        try:
-            threading.Thread(
-                target=timer_thread,
-                args=(ring_time, "TIMER", diff, time_str, duration_str),
-                daemon=True
-            ).start()
-        except Exception as e:
-            logger.exception("Failed to start timer thread for TIMER (parse_time branch)")
-            vocalise("Error setting timer.")
-        return
-    vocalise("Timer command not recognized. Please specify a duration or a time.")
-    try:
-        with mic_lock:
-            with sr.Microphone() as source:
-                audio = recognizer.listen(source, timeout=6, phrase_time_limit=6)
-        extra_command = recognize_audio(recognizer, audio).upper().strip()
-        if extra_command:
-            duration_val = parse_duration(extra_command)
-            if duration_val:
-                ring_time = now + duration_val
-                time_str = ring_time.strftime("%I:%M %p")
-                try:
-                    threading.Thread(
-                        target=timer_thread,
-                        args=(ring_time, "TIMER", duration_val, time_str, str(duration_val)),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    logger.exception("Failed to start timer thread for TIMER (extra duration branch)")
-                    vocalise("Error setting timer.")
-                return
-            ring_time, time_str = parse_time(extra_command)
-            if ring_time:
-                diff = ring_time - now
-                duration_str = str(diff).split('.')[0]
-                try:
-                    threading.Thread(
-                        target=timer_thread,
-                        args=(ring_time, "TIMER", diff, time_str, duration_str),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    logger.exception("Failed to start timer thread for TIMER (extra time branch)")
-                    vocalise("Error setting timer.")
-                return
-        vocalise("Timer command cancelled. Switching back to wake word mode.")
-    except Exception as e:
-        logger.exception("Additional timer input error")
-        vocalise("Error processing timer command. Switching back to wake word mode.")
+    if not ring_time:
+        return None
+    diff = ring_time - now
+    return (ring_time, mode, diff, time_str, str(diff).split('.')[0])
 
-def set_alarm(command, recognizer):
-    now = datetime.now()
-    duration_val = parse_duration(command)
-    if duration_val:
-        ring_time = now + duration_val
-        time_str = ring_time.strftime("%I:%M %p")
-        try:
-            threading.Thread(
-                target=timer_thread,
-                args=(ring_time, "ALARM", duration_val, time_str, str(duration_val)),
-                daemon=True
-            ).start()
-        except Exception as e:
-            logger.exception("Failed to start alarm thread for ALARM")
-            vocalise("Error setting alarm.")
-        return
-    ring_time, time_str = parse_time(command)
-    if ring_time:
-        diff = ring_time - now
-        duration_str = str(diff).split('.')[0]
-        try:
-            threading.Thread(
-                target=timer_thread,
-                args=(ring_time, "ALARM", diff, time_str, duration_str),
-                daemon=True
-            ).start()
-        except Exception as e:
-            logger.exception("Failed to start alarm thread for ALARM (parse_time branch)")
-            vocalise("Error setting alarm.")
-        return
-    vocalise("Alarm command not recognized. Please specify a duration or a time.")
-    try:
-        with mic_lock:
-            with sr.Microphone() as source:
-                audio = recognizer.listen(source, timeout=6, phrase_time_limit=6)
-        extra_command = recognize_audio(recognizer, audio).upper().strip()
-        if extra_command:
-            duration_val = parse_duration(extra_command)
-            if duration_val:
-                ring_time = now + duration_val
-                time_str = ring_time.strftime("%I:%M %p")
-                try:
-                    threading.Thread(
-                        target=timer_thread,
-                        args=(ring_time, "ALARM", duration_val, time_str, str(duration_val)),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    logger.exception("Failed to start alarm thread for ALARM (extra duration branch)")
-                    vocalise("Error setting alarm.")
-                return
-            ring_time, time_str = parse_time(extra_command)
-            if ring_time:
-                diff = ring_time - now
-                duration_str = str(diff).split('.')[0]
-                try:
-                    threading.Thread(
-                        target=timer_thread,
-                        args=(ring_time, "ALARM", diff, time_str, duration_str),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    logger.exception("Failed to start alarm thread for ALARM (extra time branch)")
-                    vocalise("Error setting alarm.")
-                return
-        vocalise("Alarm command cancelled. Switching back to wake word mode.")
-    except Exception as e:
-        logger.exception("Additional alarm input error")
-        vocalise("Error processing alarm command. Switching back to wake word mode.")
+def start_clock_entry(mode, command):
+    """Start a TIMER or ALARM from a spoken duration or time. Returns False if neither was found."""
+    args = clock_entry_args(mode, command)
+    if args is None:
+        return False
+    if current_task() is not None:
+        # Already on an action worker; no need to queue behind ourselves
+        timer_thread(*args)
+    elif action_executor.submit("clock", timer_thread, *args) is None:
+        vocalise(f"Error setting {mode.lower()}.")
+    return True
+
+def set_clock_entry(mode, command):
+    if start_clock_entry(mode, command):
+        return None
+    label = mode.capitalize()
+
+    def fill(answer):
+        if not start_clock_entry(mode, answer):
+            vocalise(f"{label} command cancelled. Switching back to wake word mode.")
+
+    return SlotRequest(
+        "clock_spec",
+        f"{label} command not recognized. Please specify a duration or a time.",
+        fill,
+        expired_message=f"{label} command cancelled. Switching back to wake word mode."
+    )
+
+def set_timer(command):
+    return set_clock_entry("TIMER", command)
 
-def open_clock_app(mode=None, duration=None, ring_time=None, keep_open=False):
+def set_alarm(command):
+    return set_clock_entry("ALARM", command)
+
+def resolve_browser_path():
+    """Return the default browser's executable, resolved once through the environment cache."""
+    if environment.is_cached("browser_path"):
+        prewarmer.used("browser")
+    return environment.get("browser_path")
+
+def open_clock_app(mode=None, duration=None, ring_time=None, keep_open=False, deadline=None, entries=None, cancel=None):
     try:
         logger.info(f"Attempting to open clock app with params: mode={mode}, duration={duration}, ring_time={ring_time}")
-        html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CLOCK APP.html")
-        
-        if not os.path.exists(html_path):
-            logger.error("Clock app HTML file not found at path: %s", html_path)
+        base_uri = environment.get("clock_uri")
+        if not base_uri:
+            logger.error("Clock app HTML file not found in %s", APP_DIR)
             raise FileNotFoundError("Clock app HTML file not found")
     
         params = {}
@@ -945,322 +2162,3134 @@ def open_clock_app(mode=None, duration=None, ring_time=None, keep_open=False):
             params["duration"] = duration if isinstance(duration, str) else str(duration)
         if ring_time:
             params["time"] = ring_time
+        if deadline:
+            # Absolute epoch milliseconds; the page fires from this rather than counting ticks
+            params["deadline"] = str(int(deadline.timestamp() * 1000))
+        if entries:
+            # "id:mode:deadline,...", so one page can take several entries and skip ones it already has
+            params["entries"] = ",".join(f"{entry_id}:{entry_mode.lower()}:{int(when.timestamp() * 1000)}"
+                                         for entry_id, entry_mode, when in entries)
+        if cancel:
+            # Journal ids the open page should drop
+            params["cancel"] = ",".join(str(entry_id) for entry_id in cancel)
             
         encoded_params = urllib.parse.urlencode(params, quote_via=urllib.parse.quote)
-        file_uri = urllib.parse.urlunparse((
-            'file',
-            '',
-            urllib.request.pathname2url(html_path),
-            '',
-            encoded_params,
-            ''
-        )).replace('file:///', 'file:///')
+        file_uri = f"{base_uri}?{encoded_params}" if encoded_params else base_uri
         
         logger.debug("Final file URI: %s", file_uri)
     
-        try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\Shell\Associations\UrlAssociations\http\UserChoice") as key:
-                prog_id = winreg.QueryValueEx(key, 'ProgId')[0]
-            logger.debug("Retrieved ProgID: %s", prog_id)
-        except Exception as e:
-            logger.warning("Failed to retrieve ProgID from registry: %s", str(e))
-            prog_id = None
-    
-        browser_path = None
-        if prog_id:
-            try:
-                with winreg.OpenKey(winreg.HKEY_CLASSES_ROOT,
-                    fr"{prog_id}\shell\open\command") as key:
-                    browser_cmd, _ = winreg.QueryValueEx(key, '')
-                    browser_path = browser_cmd.split('"')[1] if '"' in browser_cmd else browser_cmd.split()[0]
-                logger.info("Detected browser path: %s", browser_path)
-            except Exception as e:
-                logger.warning("Failed to get browser path from registry: %s", str(e))
+        browser_path = resolve_browser_path()
     
         if browser_path:
             args = [browser_path, file_uri]
             logger.info("Launching browser with command: %s", " ".join(args))
-            
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = subprocess.SW_HIDE
-            
-            # Launch the browser as a fully independent process
-            proc = subprocess.Popen(
-                args,
-                creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW,
-                startupinfo=startupinfo,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                close_fds=True
-            )
+            proc = host_platform.launch_browser(args)
+            if proc is None:
+                return True
             logger.info("Launched browser process PID: %d", proc.pid)
-            global clock_app_procs
-            clock_app_procs.append(proc)
-            logger.debug("Current clock app processes: %s", [p.pid for p in clock_app_procs])
+            process_manager.track(proc, CLOCK_APP_LABEL)
+            # Callers that need the page's process (e.g. the timer journal) use the Popen
+            return proc
         else:
             logger.warning("Using fallback webbrowser.open")
-            webbrowser.open(file_uri, new=2, autoraise=False)
+            host_platform.open_url(file_uri)
             
         return True
     except Exception as e:
         logger.exception("Critical error in open_clock_app")
         return False
 
-def process_segment(segment, recognizer):
-    global is_muted
-    segment = segment.strip().upper()
-    logger.info(f"Processing command: {segment}")
-    
-    if "CLOSE CLOCK APP" in segment:
-        logger.info("Received CLOSE CLOCK APP command")
-        try:
-            close_clock_app()
-            vocalise("Clock app closed.")
-        except Exception as e:
-            logger.exception("Failed to close clock app")
-            vocalise("Failed to close clock app.")
-        return True
+# Interaction history: one row per wake, written to SQLite off the listening thread
+HISTORY_DB_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_history.db"
+HISTORY_RETENTION_DAYS = int(config.get("history_retention_days", 90))
+HISTORY_FLUSH_INTERVAL = 2.0        # seconds a record may wait to share a batch
+HISTORY_BATCH_SIZE = 50
+HISTORY_MAINTENANCE_INTERVAL = 24 * 3600
 
-    if "TIMER" in segment:
-        logger.debug("Attempting to set timer")
-        try:
-            set_timer(segment, recognizer)
-        except Exception as e:
-            logger.exception("Timer setup failed")
-        return True
-    if "ALARM" in segment:
-        logger.debug("Attempting to set alarm")
-        try:
-            set_alarm(segment, recognizer)
-        except Exception as e:
-            logger.exception("Alarm setup failed")
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY,
+    wake_time REAL NOT NULL,
+    transcript TEXT,
+    confidence REAL,
+    intent TEXT,
+    result TEXT,
+    capture_ms REAL,
+    recognize_ms REAL,
+    route_ms REAL,
+    action_ms REAL,
+    total_ms REAL,
+    stages TEXT,
+    dialog_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_time ON interactions (wake_time);
+CREATE INDEX IF NOT EXISTS idx_interactions_intent ON interactions (intent, wake_time);
+"""
+
+HISTORY_INSERT = """
+INSERT INTO interactions (wake_time, transcript, confidence, intent, result,
+                          capture_ms, recognize_ms, route_ms, action_ms, total_ms, stages, dialog_ms)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Columns added after the first release, created on databases that predate them
+HISTORY_MIGRATIONS = {"dialog_ms": "ALTER TABLE interactions ADD COLUMN dialog_ms REAL"}
+
+class Interaction:
+    """Outcome and per-stage latencies (ms) of one pass through the listen loop.
+
+    total_ms in the history is processing latency: the sum of the stages
+    after capture. Time spent waiting for the user, such as listening for a
+    follow-up answer or speaking a prompt, only counts towards dialog_ms, the
+    wall time from the start of capture to the end of the interaction.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.wake_time = None
+        self.transcript = ""
+        self.confidence = None
+        self.intent = None
+        self.result = None
+        self.room = None
+        self.latencies = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000.0
+            self.latencies[name] = self.latencies.get(name, 0.0) + elapsed
+
+    def processing_ms(self):
+        return sum(ms for name, ms in self.latencies.items() if name != "capture")
+
+    def row(self):
+        result = self.result or ("unrecognized" if self.intent is None else "handled")
+        return (self.wake_time or self.started, self.transcript, self.confidence, self.intent, result,
+                self.latencies.get("capture"), self.latencies.get("recognize"),
+                self.latencies.get("route"), self.latencies.get("action"),
+                self.processing_ms(), json.dumps(self.latencies), (time.time() - self.started) * 1000.0)
+
+_interaction_local = threading.local()
+
+def begin_interaction(interaction=None):
+    interaction = interaction or Interaction()
+    _interaction_local.interaction = interaction
+    return interaction
+
+def end_interaction():
+    _interaction_local.interaction = None
+
+def current_interaction():
+    """The interaction active on this thread, or a detached one that is never recorded."""
+    interaction = getattr(_interaction_local, "interaction", None)
+    return interaction if interaction is not None else Interaction()
+
+class InteractionHistory:
+    """Batches interaction rows onto a writer thread that owns the SQLite connection.
+
+    Rows older than HISTORY_RETENTION_DAYS are deleted daily and the freed
+    pages returned with an incremental vacuum.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, interaction):
+        self._queue.put(interaction.row())
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout=5):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path))
+        # auto_vacuum only takes effect when set before the first table is created
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(HISTORY_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(interactions)")}
+        for column, statement in HISTORY_MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+            # A database created before auto_vacuum was set only switches modes with a full VACUUM
+            conn.commit()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info("Enabled incremental vacuum on the interaction history database")
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            logger.exception("Failed to open interaction history database")
+            return
+        last_maintenance = 0.0
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            deadline = time.time() + HISTORY_FLUSH_INTERVAL
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.time()
+                if len(batch) >= HISTORY_BATCH_SIZE or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    conn.executemany(HISTORY_INSERT, batch)
+                    conn.commit()
+                except Exception as e:
+                    logger.exception("Failed to write interaction history")
+            if time.time() - last_maintenance > HISTORY_MAINTENANCE_INTERVAL:
+                last_maintenance = time.time()
+                self._maintain(conn)
+        conn.close()
+
+    def _maintain(self, conn):
+        try:
+            cutoff = time.time() - HISTORY_RETENTION_DAYS * 86400
+            deleted = conn.execute("DELETE FROM interactions WHERE wake_time < ?", (cutoff,)).rowcount
+            conn.commit()
+            if deleted:
+                conn.execute("PRAGMA incremental_vacuum").fetchall()
+                logger.info("Pruned %d interaction history rows older than %d days", deleted, HISTORY_RETENTION_DAYS)
+        except Exception as e:
+            logger.exception("Interaction history maintenance failed")
+
+interaction_history = InteractionHistory(HISTORY_DB_FILE)
+
+# On-demand sampling profiler covering every thread
+PROFILE_DIR = Path(os.path.dirname(os.path.abspath(__file__))) / "profiles"
+PROFILE_WINDOW = 30           # default capture length in seconds
+PROFILE_MAX_WINDOW = 600
+PROFILE_INTERVAL = 0.005      # seconds between stack samples
+PROFILE_TOP = 25              # functions listed in the text report
+
+class SamplingProfiler:
+    """Samples the stack of every thread for a fixed window.
+
+    cProfile only sees the thread that enabled it, so the listen loop,
+    TTS, timers and actions are captured by walking sys._current_frames()
+    instead. Each window writes a folded-stack file (one "thread;frame;...
+    count" line per unique stack, ready for flamegraph.pl or speedscope)
+    and a text report with the hottest functions and the stage timings of
+    the interactions that finished during the window.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, interval=PROFILE_INTERVAL):
+        self.directory = Path(directory)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = {}
+        self._interactions = []
+        self.samples = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, window=PROFILE_WINDOW):
+        """Begin a capture of `window` seconds; False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._stacks = {}
+            self._interactions = []
+            self.samples = 0
+            window = max(1, min(PROFILE_MAX_WINDOW, window))
+            self._thread = threading.Thread(target=self._run, args=(window,), name="profiler", daemon=True)
+            self._thread.start()
+        logger.info("Profiler started for %d seconds", window)
+        return True
+
+    def stop(self):
+        """End the current capture early; its files are still written."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return False
+        self._stop.set()
+        thread.join(5)
+        return True
+
+    def observe(self, interaction):
+        if self.running:
+            with self._lock:
+                self._interactions.append(dict(interaction.latencies, intent=interaction.intent))
+
+    @staticmethod
+    def _frame_label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            key = tuple(reversed(stack))
+            self._stacks[key] = self._stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def _run(self, window):
+        own_ident = threading.get_ident()
+        started = time.monotonic()
+        deadline = started + window
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                self._sample(own_ident)
+                self._stop.wait(self.interval)
+            paths = self._write(time.monotonic() - started)
+            logger.info("Profile written to %s", ", ".join(str(p) for p in paths))
+            vocalise("Profile saved.")
+        except Exception as e:
+            logger.exception("Profiler failed")
+
+    def _stage_summary(self):
+        stages = {}
+        for latencies in self._interactions:
+            for stage, ms in latencies.items():
+                if stage != "intent":
+                    stages.setdefault(stage, []).append(ms)
+        return {stage: {"count": len(values), "avg_ms": round(sum(values) / len(values), 1),
+                        "max_ms": round(max(values), 1)}
+                for stage, values in sorted(stages.items())}
+
+    def _write(self, elapsed):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        folded_path = self.directory / f"profile-{stamp}.folded"
+        report_path = self.directory / f"profile-{stamp}.txt"
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._stacks.items(), key=lambda item: -item[1]):
+                f.write(";".join(stack) + f" {count}\n")
+
+        own, total = {}, {}
+        for stack, count in self._stacks.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for label in set(stack[1:]):
+                total[label] = total.get(label, 0) + count
+        samples = max(1, self.samples)
+        lines = [f"Profile {stamp}: {elapsed:.1f} s, {self.samples} samples every {self.interval * 1000:.0f} ms",
+                 "(100% = one thread in that function for the whole window)", ""]
+        for title, counts in (("Top functions by own samples", own), ("Top functions by inclusive samples", total)):
+            lines.append(title)
+            for label, count in sorted(counts.items(), key=lambda item: -item[1])[:PROFILE_TOP]:
+                lines.append(f"  {100.0 * count / samples:6.1f}%  {label}")
+            lines.append("")
+        lines.append(f"Stage timings over {len(self._interactions)} interactions")
+        for stage, summary in self._stage_summary().items():
+            lines.append(f"  {stage:<18} n={summary['count']:<4} avg={summary['avg_ms']:>8} ms  max={summary['max_ms']:>8} ms")
+        lines.append("")
+        lines.append(f"Action executor: {json.dumps(action_executor.stats())}")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return folded_path, report_path
+
+profiler = SamplingProfiler()
+
+# Predictive pre-warming: while idle, warm what history says is likely next
+PREWARM_INTERVAL = 300        # seconds between predictions
+PREWARM_IDLE_SECONDS = 30     # quiet time after an interaction before warming
+PREWARM_BUDGET_SECONDS = 3.0  # time allowed for warmers per cycle
+PREWARM_LOOKBACK_DAYS = 14
+PREWARM_MIN_RATE = 0.25       # uses per day in this hour window that justify warming
+PREWARM_TTL = 3600            # seconds a warm resource counts as warm
+
+# Which warmer speeds up which intents
+PREWARM_INTENTS = {
+    "browser": ("timer", "alarm", "close_clock_app", "cancel_timer"),
+    "app_index": ("open_app",),
+}
+
+def reinitialize_tts():
+    """Ask for a fresh TTS engine, built by the next vocalise() on the thread that speaks."""
+    global tts_rebuild_requested
+    tts_rebuild_requested = True
+
+def warm_tts():
+    if tts_engine_broken and not tts_rebuild_requested:
+        reinitialize_tts()
+
+class Prewarmer:
+    """Runs warmers for the intents usually used around this hour of day.
+
+    Usage rates come from the interaction history. Warming only happens
+    while idle and on mains power, within PREWARM_BUDGET_SECONDS per cycle.
+    Each warmer's cost is measured, and the first real use after a warm-up
+    counts as a hit. Volume is not warmed: the Windows endpoint is opened
+    and released per call on the calling thread, so nothing would stay warm.
+    """
+
+    def __init__(self, history_path, warmers):
+        self.history_path = Path(history_path)
+        self.warmers = warmers
+        self.stats = {name: {"runs": 0, "hits": 0, "warm_ms": 0.0} for name in warmers}
+        self._warm = {}   # name -> (time warmed, cost in ms)
+        self._lock = threading.Lock()
+        self._last_activity = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prewarmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for name, stat in self.stats.items():
+            if stat["runs"]:
+                logger.info("Pre-warm %s: %d runs, %d hits, %.0f ms spent",
+                            name, stat["runs"], stat["hits"], stat["warm_ms"])
+
+    def touch(self):
+        self._last_activity = time.time()
+
+    def used(self, name):
+        """Called by the slow path when it finds `name` already warm."""
+        with self._lock:
+            warmed = self._warm.pop(name, None)
+            if warmed is None or name not in self.stats:
+                return
+            self.stats[name]["hits"] += 1
+        logger.info("Pre-warmed %s was used %.0f s after warming", name, time.time() - warmed[0])
+
+    def predict(self, now=None):
+        """Return warmer names ordered by how often their intents are used around this hour."""
+        now = now or datetime.now()
+        if not self.history_path.exists():
+            return []
+        hours = [f"{(now.hour + d) % 24:02d}" for d in (-1, 0, 1)]
+        since = time.time() - PREWARM_LOOKBACK_DAYS * 86400
+        conn = sqlite3.connect(str(self.history_path))
+        try:
+            rows = conn.execute(
+                "SELECT intent, COUNT(*) FROM interactions WHERE wake_time >= ? AND intent IS NOT NULL "
+                "AND strftime('%H', wake_time, 'unixepoch', 'localtime') IN (?, ?, ?) GROUP BY intent",
+                (since, *hours)
+            ).fetchall()
+        finally:
+            conn.close()
+        counts = dict(rows)
+        rates = {name: sum(counts.get(i, 0) for i in intents) / PREWARM_LOOKBACK_DAYS
+                 for name, intents in PREWARM_INTENTS.items() if name in self.warmers}
+        return [name for name, rate in sorted(rates.items(), key=lambda kv: -kv[1]) if rate >= PREWARM_MIN_RATE]
+
+    def run_cycle(self):
+        if on_battery_power():
+            logger.debug("Skipping pre-warm on battery power")
+            return
+        candidates = self.predict()
+        if tts_engine_broken and not tts_rebuild_requested and "tts" in self.warmers:
+            candidates.insert(0, "tts")
+        started = time.perf_counter()
+        for name in candidates:
+            if self._stop.is_set() or time.perf_counter() - started > PREWARM_BUDGET_SECONDS:
+                break
+            with self._lock:
+                warmed = self._warm.get(name)
+            if name in PREWARM_INTENTS and warmed and time.time() - warmed[0] < PREWARM_TTL:
+                continue
+            t0 = time.perf_counter()
+            try:
+                self.warmers[name]()
+            except Exception as e:
+                logger.exception(f"Pre-warm {name} failed")
+                continue
+            cost = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._warm[name] = (time.time(), cost)
+                self.stats[name]["runs"] += 1
+                self.stats[name]["warm_ms"] += cost
+            logger.info("Pre-warmed %s in %.0f ms", name, cost)
+
+    def _run(self):
+        while not self._stop.wait(PREWARM_INTERVAL):
+            if time.time() - self._last_activity < PREWARM_IDLE_SECONDS or dialog_manager.pending():
+                continue
+            try:
+                self.run_cycle()
+            except Exception as e:
+                logger.exception("Pre-warm cycle failed")
+
+def warm_browser():
+    environment.invalidate("browser_path")
+    environment.get("browser_path")
+    environment.get("clock_uri")
+    # Pull the clock page into the OS file cache as well
+    clock_html = environment.get("clock_html")
+    if clock_html:
+        with open(clock_html, "rb") as f:
+            f.read()
+
+def warm_app_index():
+    """Reload the Start-menu app index; lookups keep the old one until the new one is ready."""
+    global app_list_cache
+    if not host_platform.has_apps:
+        return
+    apps = host_platform.start_apps()
+    app_list_cache = apps
+
+prewarmer = Prewarmer(HISTORY_DB_FILE, {
+    "tts": warm_tts,
+    "browser": warm_browser,
+    "app_index": warm_app_index,
+})
+
+# Long-uptime watchdog: resource trends, alerts and self-healing
+WATCHDOG_INTERVAL = 60                  # seconds between samples
+WATCHDOG_HISTORY = 180                  # samples kept for trends (3 hours)
+WATCHDOG_LOG_EVERY = 15                 # samples between trend log lines
+WATCHDOG_MIN_TREND_SAMPLES = 10
+WATCHDOG_RSS_LIMIT_MB = 400
+WATCHDOG_RSS_GROWTH_MB_PER_HOUR = 30
+WATCHDOG_THREAD_LIMIT = 48
+WATCHDOG_CHILD_LIMIT = 16
+WATCHDOG_TRACE_FRAMES = 8
+WATCHDOG_TOP_ALLOCATIONS = 10
+
+class Watchdog:
+    """Samples RSS, live threads and tracked children once a minute.
+
+    Trends are logged periodically. Crossing a limit logs one warning
+    (until the value drops back). Too many live children or threads is only
+    reported, since the assistant can't tell which are still wanted. A
+    broken TTS engine is rebuilt, and sustained memory growth runs a
+    collection, rebuilds the TTS engine and starts tracemalloc so the next
+    sample can log the allocation sites that grew. TTS rebuilds are left
+    to the next vocalise() call rather than done on the watchdog thread.
+    tracemalloc is off the rest of the time, so the steady-state cost is
+    one psutil call a minute.
+    """
+
+    def __init__(self, interval=WATCHDOG_INTERVAL):
+        self.interval = interval
+        self.samples = deque(maxlen=WATCHDOG_HISTORY)
+        self.repairs = {}
+        self._alerts = set()
+        self._baseline = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.samples:
+            logger.info("Watchdog: %s; repairs %s", self.trend_summary(), self.repairs or "none")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.exception("Watchdog check failed")
+
+    def sample(self):
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+        process_manager.reap()
+        sample = {
+            "time": time.time(),
+            "rss_mb": self._process.memory_info().rss / 1048576.0,
+            "threads": threading.active_count(),
+            "children": len(process_manager.list()),
+            "queued_actions": action_executor.stats()["queued"],
+        }
+        self.samples.append(sample)
+        return sample
+
+    def rss_growth(self):
+        """Least-squares RSS slope over the kept samples, in MB per hour."""
+        if len(self.samples) < WATCHDOG_MIN_TREND_SAMPLES:
+            return 0.0
+        times = [s["time"] for s in self.samples]
+        values = [s["rss_mb"] for s in self.samples]
+        mean_t = sum(times) / len(times)
+        mean_v = sum(values) / len(values)
+        spread = sum((t - mean_t) ** 2 for t in times)
+        if not spread:
+            return 0.0
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / spread
+        return slope * 3600
+
+    def trend_summary(self):
+        latest = self.samples[-1]
+        return (f"RSS {latest['rss_mb']:.0f} MB ({self.rss_growth():+.1f} MB/h), "
+                f"{latest['threads']} threads, {latest['children']} children, "
+                f"{latest['queued_actions']} queued actions")
+
+    def _alert(self, name, crossed, message, *args):
+        """Warn once when `crossed` becomes true; True if this is a new crossing."""
+        if not crossed:
+            self._alerts.discard(name)
+            return False
+        if name in self._alerts:
+            return False
+        self._alerts.add(name)
+        logger.warning("Watchdog: " + message, *args)
+        return True
+
+    def _repair(self, name, action):
+        self.repairs[name] = self.repairs.get(name, 0) + 1
+        logger.info("Watchdog repair: %s", name)
+        action()
+
+    def check(self):
+        sample = self.sample()
+        if len(self.samples) % WATCHDOG_LOG_EVERY == 0:
+            logger.info("Watchdog: %s", self.trend_summary())
+        if self._baseline is not None:
+            self.allocation_report()
+
+        if tts_engine_broken and not tts_rebuild_requested:
+            self._repair("tts", reinitialize_tts)
+
+        # sample() has already reaped dead children, so these are all still running
+        self._alert("children", sample["children"] > WATCHDOG_CHILD_LIMIT,
+                    "%d tracked child processes: %s", sample["children"],
+                    sorted(label for _, label, _ in process_manager.list()))
+
+        if self._alert("threads", sample["threads"] > WATCHDOG_THREAD_LIMIT,
+                       "%d live threads", sample["threads"]):
+            names = {}
+            for thread in threading.enumerate():
+                base = re.sub(r"[-_ ]?\d+$", "", thread.name)
+                names[base] = names.get(base, 0) + 1
+            logger.warning("Watchdog: threads by name %s", sorted(names.items(), key=lambda kv: -kv[1]))
+
+        growth = self.rss_growth()
+        over_limit = sample["rss_mb"] > WATCHDOG_RSS_LIMIT_MB
+        growing = growth > WATCHDOG_RSS_GROWTH_MB_PER_HOUR
+        if self._alert("memory", over_limit or growing, "RSS %.0f MB, growing %.1f MB/h",
+                       sample["rss_mb"], growth):
+            self._repair("memory", self._reclaim_memory)
+
+    def _reclaim_memory(self):
+        import gc
+        collected = gc.collect()
+        reinitialize_tts()
+        logger.info("Watchdog collected %d objects and asked for a fresh TTS engine", collected)
+        self.allocation_report()
+
+    def allocation_report(self):
+        """First call starts tracemalloc; the next logs and returns the top growing allocation sites."""
+        import tracemalloc
+        with self._lock:
+            if self._baseline is None:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(WATCHDOG_TRACE_FRAMES)
+                self._baseline = tracemalloc.take_snapshot()
+                logger.info("Watchdog started allocation tracing")
+                return None
+            snapshot = tracemalloc.take_snapshot()
+            baseline, self._baseline = self._baseline, None
+            tracemalloc.stop()
+        top = snapshot.compare_to(baseline, "lineno")[:WATCHDOG_TOP_ALLOCATIONS]
+        lines = [str(stat) for stat in top]
+        logger.info("Watchdog top allocation growth:\n  %s", "\n  ".join(lines) or "(none)")
+        return lines
+
+watchdog = Watchdog()
+
+# Flight recorder: recent utterances kept in a memory-mapped ring file
+FLIGHT_RECORDER_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_flight.ring"
+FLIGHT_DUMP_DIR = Path(os.path.dirname(os.path.abspath(__file__))) / "flight"
+FLIGHT_MAGIC = b"LUCFLT01"
+FLIGHT_HEADER = struct.Struct("<8sQIQQ")      # magic, capacity, slots, bytes written, next seq
+FLIGHT_HEADER_SIZE = 64
+FLIGHT_ENTRY = struct.Struct("<QQIIHdH")      # seq, stream offset, length, rate, width, time, tag length
+FLIGHT_SLOT_SIZE = 256
+FLIGHT_SLOTS = 512
+FLIGHT_DUMP_COUNT = 5
+
+class FlightRecorder:
+    """Keeps the last few minutes of captured utterances in a fixed-size ring file.
+
+    The file is memory-mapped, so recording is a memcpy into the page cache
+    and never blocks on disk. Each utterance gets an index slot holding its
+    position in the audio ring and a JSON tag (decision, transcript,
+    confidence, intent, result) that is filled in as the listen loop and
+    the action decide what to do with it. lucifer_flight.py reads the same
+    file to list segments and dump them to WAV.
+
+    The audio ring holds `minutes` of audio at the rate and width passed to
+    open(), normally the microphone's own format.
+    """
+
+    def __init__(self, path, minutes):
+        self.path = Path(path)
+        self.minutes = minutes
+        self.capacity = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+    @property
+    def enabled(self):
+        return self._map is not None
+
+    def open(self, sample_rate, sample_width):
+        if self.minutes <= 0 or self._map is not None:
+            return
+        bytes_per_minute = sample_rate * sample_width * 60
+        self.capacity = int(self.minutes * bytes_per_minute)
+        data_start = FLIGHT_HEADER_SIZE + FLIGHT_SLOTS * FLIGHT_SLOT_SIZE
+        size = data_start + self.capacity
+        fresh = not self.path.exists() or self.path.stat().st_size != size
+        self._file = open(self.path, "r+b" if not fresh else "w+b")
+        if fresh:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        magic, capacity, slots, _, _ = FLIGHT_HEADER.unpack_from(self._map, 0)
+        if fresh or magic != FLIGHT_MAGIC or capacity != self.capacity or slots != FLIGHT_SLOTS:
+            self._map[:data_start] = bytes(data_start)
+            FLIGHT_HEADER.pack_into(self._map, 0, FLIGHT_MAGIC, self.capacity, FLIGHT_SLOTS, 0, 1)
+        self._data_start = data_start
+        logger.info("Flight recorder keeping %.1f minutes at %d Hz in %s", self.minutes, sample_rate, self.path)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
+
+    def _slot_offset(self, seq):
+        return FLIGHT_HEADER_SIZE + (seq % FLIGHT_SLOTS) * FLIGHT_SLOT_SIZE
+
+    @staticmethod
+    def _encode_tag(tag):
+        """JSON for `tag` that fits its slot: the transcript is shortened first, then whole fields dropped."""
+        tag = dict(tag)
+        limit = FLIGHT_SLOT_SIZE - FLIGHT_ENTRY.size
+        encoded = json.dumps(tag, separators=(",", ":")).encode("utf-8")
+        while len(encoded) > limit and tag.get("transcript"):
+            tag["transcript"] = tag["transcript"][:len(tag["transcript"]) // 2]
+            encoded = json.dumps(tag, separators=(",", ":")).encode("utf-8")
+        while len(encoded) > limit and tag:
+            # The decision is what list and dump filter on, so it goes last
+            largest = max(tag, key=lambda key: (key != "decision", len(json.dumps(tag[key]))))
+            del tag[largest]
+            encoded = json.dumps(tag, separators=(",", ":")).encode("utf-8")
+        return encoded
+
+    def record(self, audio, tag=None):
+        """Append one utterance; returns its sequence number, or None when disabled."""
+        if self._map is None:
+            return None
+        data = audio.frame_data[-self.capacity:]
+        with self._lock:
+            if self._map is None:
+                return None
+            _, _, _, written, seq = FLIGHT_HEADER.unpack_from(self._map, 0)
+            position = written % self.capacity
+            first = min(len(data), self.capacity - position)
+            start = self._data_start + position
+            self._map[start:start + first] = data[:first]
+            if first < len(data):
+                self._map[self._data_start:self._data_start + len(data) - first] = data[first:]
+            encoded = self._encode_tag(tag or {})
+            offset = self._slot_offset(seq)
+            FLIGHT_ENTRY.pack_into(self._map, offset, seq, written, len(data), audio.sample_rate,
+                                   audio.sample_width, time.time(), len(encoded))
+            self._map[offset + FLIGHT_ENTRY.size:offset + FLIGHT_ENTRY.size + len(encoded)] = encoded
+            FLIGHT_HEADER.pack_into(self._map, 0, FLIGHT_MAGIC, self.capacity, FLIGHT_SLOTS,
+                                    written + len(data), seq + 1)
+        return seq
+
+    def _read_entry(self, seq):
+        offset = self._slot_offset(seq)
+        entry = FLIGHT_ENTRY.unpack_from(self._map, offset)
+        if entry[0] != seq:
+            return None, None
+        raw = self._map[offset + FLIGHT_ENTRY.size:offset + FLIGHT_ENTRY.size + entry[6]]
+        try:
+            return entry, json.loads(raw.decode("utf-8") or "{}")
+        except ValueError:
+            # A tag written before tags were kept whole, or a torn write; the audio is still good
+            logger.warning("Flight recorder tag for segment %d is unreadable", seq)
+            return entry, {}
+
+    def tag(self, seq, **fields):
+        """Merge `fields` into the tag of segment `seq` if it is still in the ring."""
+        if seq is None or self._map is None:
+            return
+        with self._lock:
+            if self._map is None:
+                return
+            entry, tag = self._read_entry(seq)
+            if entry is None:
+                return
+            tag.update(fields)
+            encoded = self._encode_tag(tag)
+            offset = self._slot_offset(seq)
+            FLIGHT_ENTRY.pack_into(self._map, offset, *entry[:6], len(encoded))
+            self._map[offset + FLIGHT_ENTRY.size:offset + FLIGHT_ENTRY.size + len(encoded)] = encoded
+
+    def segments(self):
+        """(seq, time, tag) for every segment whose audio is still in the ring, oldest first."""
+        if self._map is None:
+            return []
+        with self._lock:
+            _, _, _, written, next_seq = FLIGHT_HEADER.unpack_from(self._map, 0)
+            found = []
+            for seq in range(max(1, next_seq - FLIGHT_SLOTS), next_seq):
+                entry, tag = self._read_entry(seq)
+                if entry is not None and written - entry[1] <= self.capacity:
+                    found.append((seq, entry[5], tag))
+            return found
+
+    def audio(self, seq):
+        """Return (pcm bytes, sample rate, sample width) for segment `seq`, or None if overwritten."""
+        with self._lock:
+            entry, _ = self._read_entry(seq)
+            _, _, _, written, _ = FLIGHT_HEADER.unpack_from(self._map, 0)
+            if entry is None or written - entry[1] > self.capacity:
+                return None
+            _, stream_offset, length, rate, width, _, _ = entry
+            position = stream_offset % self.capacity
+            first = min(length, self.capacity - position)
+            start = self._data_start + position
+            pcm = self._map[start:start + first] + self._map[self._data_start:self._data_start + length - first]
+        return pcm, rate, width
+
+    def dump(self, count=FLIGHT_DUMP_COUNT, directory=FLIGHT_DUMP_DIR):
+        """Write the last `count` segments to WAV files with a JSON index; returns the paths."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths, index = [], []
+        for seq, recorded, tag in self.segments()[-count:]:
+            clip = self.audio(seq)
+            if clip is None:
+                continue
+            pcm, rate, width = clip
+            stamp = datetime.fromtimestamp(recorded).strftime("%Y%m%d-%H%M%S")
+            path = directory / f"{stamp}-{seq:06d}-{tag.get('decision', 'captured')}.wav"
+            with wave.open(str(path), "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(width)
+                wav.setframerate(rate)
+                wav.writeframes(pcm)
+            paths.append(path)
+            index.append(dict(tag, seq=seq, time=recorded, file=path.name))
+        if index:
+            with open(directory / "index.jsonl", "a", encoding="utf-8") as f:
+                for row in index:
+                    f.write(json.dumps(row) + "\n")
+        return paths
+
+flight_recorder = FlightRecorder(FLIGHT_RECORDER_FILE, config.get("flight_recorder_minutes", 0))
+
+# Routines: one phrase fans out to several actions, defined under "routines" in the config
+ROUTINE_STEP_TIMEOUT = 30
+
+DEFAULT_ROUTINES = {
+    "GOOD NIGHT": [
+        {"id": "mute", "action": "mute"},
+        {"id": "alarm", "action": "alarm", "time": "7 AM"},
+        {"action": "lock", "after": ["mute", "alarm"]},
+    ],
+    "FOCUS MODE": [
+        {"action": "volume", "percent": 20},
+        {"action": "timer", "duration": "50 minutes"},
+        {"action": "open", "app": "notepad"},
+    ],
+}
+
+def routine_clock_entry(mode, spec):
+    args = clock_entry_args(mode, spec)
+    if args is None:
+        vocalise(f"Could not understand {mode.lower()} {spec}.")
+        return
+    timer_thread(*args)
+
+def routine_mute(step):
+    """Make sure output is muted; the device is asked, since is_muted misses changes made outside the assistant."""
+    if not host_platform.has_volume:
+        vocalise("Volume control not supported on this OS.")
+        return
+    global is_muted
+    try:
+        if host_platform.get_mute():
+            vocalise("Volume already muted.")
+        else:
+            host_platform.set_mute(True)
+            vocalise("Volume muted.")
+        is_muted = True
+    except Exception as e:
+        logger.exception("Error muting for routine")
+        vocalise("Failed to mute.")
+
+ROUTINE_ACTIONS = {
+    "mute": routine_mute,
+    "volume": lambda step: set_volume(int(step["percent"])),
+    "alarm": lambda step: routine_clock_entry("ALARM", step["time"]),
+    "timer": lambda step: routine_clock_entry("TIMER", step["duration"]),
+    "lock": lambda step: lock_computer(),
+    "open": lambda step: open_app(step["app"], allow_retry=False),
+    "close": lambda step: close_app_by_name(step["app"]),
+    "say": lambda step: vocalise(step["text"]),
+}
+
+def load_routines():
+    routines = dict(DEFAULT_ROUTINES)
+    routines.update({name.upper(): steps for name, steps in config.get("routines", {}).items()})
+    return routines
+
+routines = load_routines()
+
+def run_routine(name, steps):
+    """Start a routine's steps on the action executor, each after the steps in its "after" list.
+
+    Steps with no pending dependencies run concurrently, so the routine takes
+    about as long as its slowest chain. Speech from each step is collected and
+    spoken once as a summary when the last step finishes.
+    """
+    keys = [step.get("id", index) for index, step in enumerate(steps)]
+    messages = {key: [] for key in keys}
+    ok = {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run_step(key, step):
+        _speech_capture.messages = messages[key]
+        try:
+            ROUTINE_ACTIONS[step["action"]](step)
+            return not action_cancelled()
+        except Exception as e:
+            logger.exception(f"Routine {name} step {key} failed")
+            vocalise(f"The {step.get('action', 'unknown')} step failed.")
+            return False
+        finally:
+            _speech_capture.messages = None
+
+    def schedule():
+        """Submit ready steps and skip blocked ones; returns True once every step is settled."""
+        changed = True
+        while changed:
+            changed = False
+            for key, step in zip(keys, steps):
+                if key in ok or key in submitted:
+                    continue
+                deps = step.get("after", [])
+                failed = [dep for dep in deps if dep not in keys or ok.get(dep) is False]
+                if failed:
+                    messages[key].append(f"Skipped {step['action']} because {failed[0]} did not finish.")
+                    ok[key] = False
+                    changed = True
+                elif all(ok.get(dep) for dep in deps):
+                    submitted.add(key)
+                    task = action_executor.submit(step["action"], run_step, key, step,
+                                                  timeout=ROUTINE_STEP_TIMEOUT, on_done=step_done)
+                    if task is None:
+                        messages[key].append(f"Skipped {step['action']} because I am busy.")
+                        ok[key] = False
+                        changed = True
+        return len(ok) == len(keys) and not finished
+
+    def step_done(task):
+        nonlocal finished
+        with lock:
+            if task is not None:
+                ok[task.args[0]] = task.result is True
+            if not schedule():
+                return
+            finished = True
+        logger.info("Routine %s finished in %.0f ms", name, (time.perf_counter() - started) * 1000)
+        summary = " ".join(m for key in keys for m in messages[key])
+        vocalise(f"{name.title()} routine done. {summary}".strip())
+
+    submitted = set()
+    finished = False
+    logger.info(f"Running routine {name} with {len(steps)} steps")
+    step_done(None)
+
+def find_routine(segment):
+    """Return the name of the routine said in `segment`, matching whole words, or None."""
+    # Longest first, so "GOOD NIGHT SHIFT" wins over "GOOD NIGHT"
+    for name in sorted(routines, key=len, reverse=True):
+        if re.search(r"\b" + re.escape(name) + r"\b", segment):
+            return name
+    return None
+
+def handle_routine(segment, recognizer):
+    name = find_routine(segment)
+    if name is None:
+        return False
+    run_routine(name, routines[name])
+    return True
+
+# Dialog manager: follow-up questions are slots filled by the next utterance
+DIALOG_TIMEOUT = 10  # seconds a follow-up question stays open
+
+class SlotRequest:
+    """Returned by an action that needs one more answer before it can finish.
+
+    `on_fill(answer)` receives the upper-cased transcript of the next
+    utterance and may itself return another SlotRequest. `grammar` is an
+    optional JSGF grammar path used to decode the answer locally.
+    """
+
+    def __init__(self, slot, prompt, on_fill, grammar=None, timeout=DIALOG_TIMEOUT, expired_message=None):
+        self.slot = slot
+        self.prompt = prompt
+        self.on_fill = on_fill
+        self.grammar = grammar
+        self.timeout = timeout
+        self.expired_message = expired_message
+        self.interaction = None
+        self.deadline = None
+
+class DialogManager:
+    """Holds at most one open follow-up question.
+
+    The capture loop routes the next utterance to the open slot instead of
+    the wake-word path; slots left unanswered expire on the deadline
+    scheduler's thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = None
+        self._closed = False
+        self._scheduler = DeadlineScheduler(self._expire)
+
+    def ask(self, request):
+        request.interaction = current_interaction()
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                previous, self._pending = self._pending, request
+        if closed:
+            # The room went away while its action was running; nobody is left to answer
+            finish_interaction(request.interaction, "cancelled")
+            return
+        if previous is not None:
+            self._scheduler.cancel(id(previous))
+            if previous.interaction is not request.interaction:
+                finish_interaction(previous.interaction, "superseded")
+        if request.prompt:
+            vocalise(request.prompt)
+        # The answer window starts once the question has been spoken
+        request.deadline = time.time() + request.timeout
+        self._scheduler.add(id(request), request.deadline)
+        logger.info("Dialog waiting for slot %s (%d s)", request.slot, request.timeout)
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def waiting_on(self, interaction):
+        """True while the open question belongs to `interaction`."""
+        with self._lock:
+            return self._pending is not None and self._pending.interaction is interaction
+
+    def take(self):
+        """Remove and return the open request so the caller can fill it."""
+        with self._lock:
+            request, self._pending = self._pending, None
+        if request is not None:
+            self._scheduler.cancel(id(request))
+        return request
+
+    def cancel(self):
+        request = self.take()
+        if request is not None:
+            logger.info("Dialog for slot %s cancelled", request.slot)
+            finish_interaction(request.interaction, "cancelled")
+
+    def close(self):
+        """Cancel any open question and stop the deadline thread for good."""
+        with self._lock:
+            self._closed = True
+        self.cancel()
+        self._scheduler.stop()
+
+    def fill(self, request, answer):
+        logger.info("Filling slot %s with: %s", request.slot, answer)
+        interaction = request.interaction
+        try:
+            with interaction.stage("action"):
+                outcome = request.on_fill(answer)
+        except Exception as e:
+            logger.exception("Error filling slot %s", request.slot)
+            current_room().cue("error")
+            vocalise("Error processing command. Switching back to wake word mode.")
+            outcome = None
+        if isinstance(outcome, SlotRequest):
+            self.ask(outcome)
+            return
+        # The answer may have routed to an action that asked its own follow-up
+        if not self.waiting_on(interaction):
+            finish_interaction(interaction, "handled" if interaction.intent else "unrecognized")
+
+    def _expire(self, key):
+        with self._lock:
+            request = self._pending
+            if request is None or id(request) != key:
+                return
+            self._pending = None
+        logger.info("Dialog for slot %s expired", request.slot)
+        # Speak in the room that was asked
+        begin_interaction(request.interaction)
+        try:
+            if request.expired_message:
+                vocalise(request.expired_message)
+        finally:
+            end_interaction()
+        finish_interaction(request.interaction, "timeout")
+
+def finish_interaction(interaction, result=None):
+    """Record a completed interaction once and feed its outcome to the tuner."""
+    if interaction is None or interaction.wake_time is None or getattr(interaction, "recorded", False):
+        return
+    interaction.recorded = True
+    prewarmer.touch()
+    if result and interaction.result in (None, "pending"):
+        interaction.result = result
+    interaction_history.record(interaction)
+    profiler.observe(interaction)
+    flight_recorder.tag(getattr(interaction, "flight_seq", None), intent=interaction.intent, result=interaction.result)
+    tuner = (interaction.room or local_room).tuner
+    if interaction.result == "timeout":
+        tuner.observe("timeout")
+    else:
+        tuner.observe("ok" if interaction.intent else "false_wake")
+
+dialog_manager = DialogManager()
+
+class Room(abc.ABC):
+    """Where an utterance was heard and where its responses go.
+
+    Each room has its own follow-up dialog and its own `tuner`, since
+    capture thresholds belong to a microphone. The local microphone is
+    `local_room`; RemoteRoom sends speech and cues back to a capture client.
+    """
+
+    remote = False
+
+    def __init__(self, name, dialog):
+        self.name = name
+        self.dialog = dialog
+
+    @abc.abstractmethod
+    def say(self, message):
+        """Speak `message` to whoever is in the room."""
+
+    def cue(self, name):
+        play_cue(name)
+
+class LocalRoom(Room):
+    """The assistant's own microphone and speakers."""
+
+    @property
+    def tuner(self):
+        return recognizer_tuner
+
+    def say(self, message):
+        vocalise(message)
+
+local_room = LocalRoom("local", dialog_manager)
+
+def current_room():
+    interaction = getattr(_interaction_local, "interaction", None)
+    room = interaction.room if interaction is not None else None
+    return room if room is not None else local_room
+
+def current_dialog():
+    return current_room().dialog
+
+day_only_phrases = ["TELL ONLY THE DAY", "DAY ONLY", "ONLY DAY"]
+date_only_phrases = ["TELL ONLY THE DATE", "DATE ONLY", "ONLY DATE"]
+day_phrases = ["WHAT'S TODAY'S DAY", "WHAT IS TODAY'S DAY", "WHAT'S THE DAY TODAY", "DAY?", "WHAT'S THE DAY", "WHAT DAY IS TODAY", "DAY", "TELL THE DAY"]
+date_phrases = ["WHAT'S TODAY'S DATE", "WHAT IS TODAY'S DATE", "DATE?", "WHAT'S THE DATE", "WHAT DATE IS TODAY", "DATE", "TELL THE DATE"]
+toggle_mute_commands = ["MUTE", "SHUT UP", "SHUTUP", "STOP THAT", "UNMUTE", "TURN ON SOUND", "MUTE SOUND", "MUTE SOUNDS", "MUTE THE MUSIC", "MUTE THE AUDIO", "MUTE THE NOISE", "MUTE THE SOUNDS", "MUTE AUDIO", "MUTE NOISE"]
+
+def start_profiling(window=PROFILE_WINDOW):
+    if profiler.start(window):
+        vocalise(f"Profiling for {window} seconds.")
+    else:
+        vocalise("The profiler is already running.")
+
+def handle_profile(segment, recognizer):
+    if "STOP" in segment or "END" in segment:
+        if not profiler.stop():
+            vocalise("The profiler is not running.")
+        return
+    window = PROFILE_WINDOW
+    found = re.search(r"(\d+)\s*(SECOND|MINUTE)", segment)
+    if found:
+        window = int(found.group(1)) * (60 if found.group(2) == "MINUTE" else 1)
+    start_profiling(min(window, PROFILE_MAX_WINDOW))
+
+def handle_memory_status(segment, recognizer):
+    sample = watchdog.sample()
+    vocalise(f"Using {sample['rss_mb']:.0f} megabytes with {sample['threads']} threads "
+             f"and {sample['children']} child processes.")
+    # Started here, the allocation diff is logged by the next watchdog check
+    watchdog.allocation_report()
+
+def handle_save_recording(segment, recognizer):
+    if not flight_recorder.enabled:
+        vocalise("The flight recorder is off.")
+        return
+    paths = flight_recorder.dump()
+    logger.info("Flight recorder dumped %s", [str(p) for p in paths])
+    vocalise(f"Saved the last {len(paths)} recordings.")
+
+def handle_close_clock_app(segment, recognizer):
+    logger.info("Received CLOSE CLOCK APP command")
+    try:
+        close_clock_app()
+        vocalise("Clock app closed.")
+    except Exception as e:
+        logger.exception("Failed to close clock app")
+        vocalise("Failed to close clock app.")
+
+def handle_close_children(segment, recognizer):
+    logger.info("Received CLOSE ALL command")
+    try:
+        closed = process_manager.close()
+        vocalise(f"Closed {closed} launched {'window' if closed == 1 else 'windows'}.")
+    except Exception as e:
+        logger.exception("Failed to close launched processes")
+        vocalise("Failed to close launched windows.")
+
+def handle_cancel_clock_entries(segment, recognizer):
+    for mode in ("TIMER", "ALARM"):
+        if mode in segment:
+            count = cancel_clock_entries(mode)
+            plural = "" if count == 1 else "s"
+            vocalise(f"Cancelled {count} {mode.lower()}{plural}." if count else f"No {mode.lower()}s to cancel.")
+
+def handle_timer(segment, recognizer):
+    logger.debug("Attempting to set timer")
+    try:
+        return set_timer(segment)
+    except Exception as e:
+        logger.exception("Timer setup failed")
+
+def handle_alarm(segment, recognizer):
+    logger.debug("Attempting to set alarm")
+    try:
+        return set_alarm(segment)
+    except Exception as e:
+        logger.exception("Alarm setup failed")
+
+def handle_open(segment, recognizer):
+    app_to_open = segment[5:].strip()
+    if app_to_open.upper().startswith("CLOCK APP"):
+        try:
+            if not open_clock_app(mode="clock"):
+                raise Exception("Clock app launch failed")
+        except Exception as e:
+            logger.exception("Failed to open clock app")
+            vocalise("Failed to open clock app.")
+    else:
+        if app_to_open.upper().endswith(" AGAIN"):
+            app_to_open = app_to_open[:-6].strip()
+        return open_app(app_to_open)
+
+def handle_max_volume(segment, recognizer):
+    global is_muted
+    set_volume(100)
+    is_muted = False
+
+def handle_set_volume(segment, recognizer):
+    match = re.search(r"(\d+)", segment)
+    if match:
+        set_volume(int(match.group(1)))
+        return True
+
+    def fill(answer):
+        percent = words_to_number(answer)
+        if percent is None:
+            vocalise("No volume percentage provided. Command cancelled.")
+        else:
+            set_volume(percent)
+
+    return SlotRequest(
+        "volume_percent",
+        "Please specify volume percentage",
+        fill,
+        grammar=grammar_file("number", NUMBER_GRAMMAR),
+        expired_message="No volume percentage provided. Command cancelled."
+    )
+
+def handle_exit(segment, recognizer):
+    for key, response in exit_phrases.items():
+        if key in segment:
+            vocalise(response)
+            break
+    time.sleep(1)
+    exit_event.set()
+
+def contains_any(phrases):
+    return lambda segment: any(phrase in segment for phrase in phrases)
+
+# Command plugins. Each plugin owns an ordered list of intents; across plugins
+# the first intent whose matcher accepts the segment wins. Handlers take
+# (segment, recognizer); returning False means "not handled after all" and
+# returning a SlotRequest asks the dialog manager for a follow-up answer.
+PLUGIN_DIR = Path(config.get("plugin_dir") or Path(__file__).resolve().parent / "plugins")
+
+# Plugins `import LUCIFER`; when this file runs as a script that must find the
+# running module rather than execute a second copy of it
+sys.modules.setdefault("LUCIFER", sys.modules[__name__])
+
+class CommandPlugin:
+    """A named group of (intent, matcher, handler) entries."""
+
+    def __init__(self, name, intents, slots=None):
+        self.name = name
+        self.intents = intents
+        self.slots = slots or {}
+
+    def match(self, segment):
+        for intent, matches, handler in self.intents:
+            if matches(segment):
+                return intent, handler
+        return None
+
+class DirectoryPlugin(CommandPlugin):
+    """A plugin module in PLUGIN_DIR, imported the first time one of its intents matches.
+
+    The module declares its phrases as literals, which are read with ast at
+    startup without executing the module:
+
+        INTENTS = {"weather": ["WHAT'S THE WEATHER IN {city}", "WEATHER"]}
+        SLOTS = {"city": "a city name"}
+
+    and handles them with `handle_<intent>(segment, recognizer, **slots)`
+    or a catch-all `handle(intent, segment, recognizer, **slots)`. `{slot}`
+    placeholders capture words from the phrase. Modules reach the running
+    assistant with `import LUCIFER` (e.g. LUCIFER.vocalise).
+    """
+
+    def __init__(self, path):
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        declared = {}
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                if node.targets[0].id in ("INTENTS", "SLOTS"):
+                    declared[node.targets[0].id] = ast.literal_eval(node.value)
+        if not declared.get("INTENTS"):
+            raise ValueError(f"{path.name} declares no INTENTS")
+        self.path = path
+        self.module = None
+        self._lock = threading.Lock()
+        self.phrases = {intent: [phrase.upper() for phrase in phrases]
+                        for intent, phrases in declared["INTENTS"].items()}
+        intents = [(intent, None, self._handler(intent)) for intent in self.phrases]
+        super().__init__(path.stem, intents, declared.get("SLOTS"))
+
+    def patterns(self):
+        """Yield (intent, regex source) for every declared phrase."""
+        for intent, phrases in self.phrases.items():
+            for phrase in phrases:
+                parts = re.split(r"\{(\w+)\}", phrase)
+                regex = "".join(re.escape(part) if i % 2 == 0 else f"(?P<{{prefix}}{part.lower()}>.+?)"
+                                for i, part in enumerate(parts))
+                yield intent, r"\b" + regex + (r"\b" if parts[-1] else "$")
+
+    def load(self):
+        with self._lock:
+            if self.module is None:
+                started = time.perf_counter()
+                spec = importlib.util.spec_from_file_location(f"lucifer_plugin_{self.name}", self.path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self.module = module
+                logger.info("Loaded plugin %s in %.1f ms", self.name, (time.perf_counter() - started) * 1000)
+        return self.module
+
+    def _handler(self, intent):
+        def handle(segment, recognizer, **slots):
+            module = self.load()
+            specific = getattr(module, f"handle_{intent}", None)
+            if specific is not None:
+                return specific(segment, recognizer, **slots)
+            return module.handle(intent, segment, recognizer, **slots)
+        return handle
+
+class PluginRegistry:
+    """Built-in plugins in order, then directory plugins matched through one combined regex."""
+
+    def __init__(self, builtins):
+        self.builtins = list(builtins)
+        self.plugins = []
+        self._regex = None
+        self._groups = {}
+
+    def discover(self, directory):
+        directory = Path(directory)
+        if not directory.is_dir():
+            return
+        for path in sorted(directory.glob("*.py")):
+            if path.name.startswith("_"):
+                continue
+            try:
+                self.plugins.append(DirectoryPlugin(path))
+            except Exception as e:
+                logger.exception(f"Skipping plugin {path.name}")
+        alternatives = []
+        for plugin in self.plugins:
+            for intent, regex in plugin.patterns():
+                group = f"p{len(self._groups)}"
+                self._groups[group] = (plugin, intent)
+                alternatives.append(f"(?P<{group}>{regex.replace('{prefix}', group + '_')})")
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+        if self.plugins:
+            logger.info("Discovered %d plugins with %d phrases in %s", len(self.plugins), len(alternatives), directory)
+
+    def match(self, segment):
+        """Return (intent name, handler) for an upper-cased segment, or (None, None)."""
+        for plugin in self.builtins:
+            found = plugin.match(segment)
+            if found:
+                return found
+        if self._regex is not None:
+            found = self._regex.search(segment)
+            if found:
+                group = found.lastgroup
+                plugin, intent = self._groups[group]
+                prefix = group + "_"
+                slots = {name[len(prefix):]: value.strip() for name, value in found.groupdict().items()
+                         if name.startswith(prefix) and value}
+                handler = dict((i, h) for i, _, h in plugin.intents)[intent]
+                return intent, lambda s, r: handler(s, r, **slots)
+        return None, None
+
+plugin_registry = PluginRegistry([
+    CommandPlugin("processes", [
+        ("close_clock_app", lambda s: "CLOSE CLOCK APP" in s, handle_close_clock_app),
+        ("list_children", contains_any(list_children_phrases), lambda s, r: list_child_processes()),
+        ("close_children", contains_any(close_children_phrases), handle_close_children),
+        ("close_app", lambda s: s.startswith("CLOSE "), lambda s, r: close_app_by_name(s[6:].strip())),
+    ], slots={"app": "name of a running app"}),
+    CommandPlugin("timers", [
+        ("cancel_timer", lambda s: s.startswith(("CANCEL", "STOP")) and ("TIMER" in s or "ALARM" in s), handle_cancel_clock_entries),
+        ("timer", lambda s: "TIMER" in s, handle_timer),
+        ("alarm", lambda s: "ALARM" in s, handle_alarm),
+    ], slots={"clock_spec": "a duration or time of day"}),
+    CommandPlugin("apps", [
+        ("open_app", lambda s: s.startswith("OPEN "), handle_open),
+    ], slots={"app_name": "name of a Start-menu app"}),
+    CommandPlugin("date", [
+        ("day_only", contains_any(day_only_phrases), lambda s, r: tell_only_day()),
+        ("date_only", contains_any(date_only_phrases), lambda s, r: tell_only_date()),
+        ("day_and_date", contains_any(day_phrases), lambda s, r: tell_day_and_date(day_first=True)),
+        ("date_and_day", contains_any(date_phrases), lambda s, r: tell_day_and_date(day_first=False)),
+    ]),
+    CommandPlugin("volume", [
+        ("toggle_mute", contains_any(toggle_mute_commands), lambda s, r: toggle_mute_volume()),
+        ("volume_up", lambda s: "VOLUME UP" in s or "INCREASE VOLUME" in s or ("TURN UP" in s and "VOLUME" in s) or ("VOLUME" in s and "LOWER" in s),
+         lambda s, r: volume_up()),
+        ("volume_down", lambda s: "VOLUME DOWN" in s or "DECREASE VOLUME" in s or ("TURN DOWN" in s and "VOLUME" in s) or ("VOLUME" in s and "RAISE" in s),
+         lambda s, r: volume_down()),
+        ("max_volume", lambda s: ("MAX VOLUME" in s or "FULL VOLUME" in s or "MAXIMUM VOLUME" in s or
+                                  (s.startswith("SET VOLUME") and ("MAX" in s or "FULL" in s or "MAXIMUM" in s))),
+         handle_max_volume),
+        ("set_volume", lambda s: "SET VOLUME" in s or "VOLUME SET" in s or "PUT VOLUME " in s or ("VOLUME" in s and "SET" in s),
+         handle_set_volume),
+    ], slots={"volume_percent": "0 to 100"}),
+    CommandPlugin("power", [
+        ("exit", contains_any(exit_phrases.keys()), handle_exit),
+        ("shutdown", contains_any(shutdown_phrases), lambda s, r: confirm_action(shutdown_computer, "Shutdown")),
+        ("restart", contains_any(restart_phrases), lambda s, r: confirm_action(restart_computer, "Restart")),
+        ("sleep", contains_any(sleep_phrases), lambda s, r: sleep_computer()),
+        ("lock", contains_any(lock_phrases), lambda s, r: lock_computer()),
+    ], slots={"confirmation": "ACTIVATE"}),
+    CommandPlugin("battery", [
+        ("battery", contains_any(["BATTERY"]), lambda s, r: battery_status()),
+    ]),
+    CommandPlugin("diagnostics", [
+        ("profile", lambda s: "PROFIL" in s, handle_profile),
+        ("memory_status", lambda s: "MEMORY" in s, handle_memory_status),
+        ("save_recording", lambda s: "RECORDING" in s and ("SAVE" in s or "DUMP" in s), handle_save_recording),
+    ]),
+    # Routine names are user-chosen words, so every command intent is tried first;
+    # only the catch-all time and chat replies come after them
+    CommandPlugin("routines", [
+        ("routine", lambda s: find_routine(s) is not None, handle_routine),
+    ]),
+    CommandPlugin("time", [
+        ("time", contains_any(["TIME"]), lambda s, r: tell_current_time()),
+    ]),
+    CommandPlugin("chat", [
+        ("custom", contains_any(custom_commands.keys()), lambda s, r: vocalise(custom_commands.get(s, ""))),
+    ]),
+])
+plugin_registry.discover(PLUGIN_DIR)
+
+def match_intent(segment):
+    """Return (intent name, handler) for an upper-cased segment, or (None, None)."""
+    return plugin_registry.match(segment)
+
+def process_segment(segment, recognizer):
+    segment = segment.strip().upper()
+    logger.info(f"Processing command: {segment}")
+    interaction = current_interaction()
+    with interaction.stage("route"):
+        name, handler = match_intent(segment)
+    if handler is None:
+        return False
+    interaction.transcript = segment
+    interaction.intent = name
+    try:
+        with interaction.stage("action"):
+            outcome = handler(segment, recognizer)
+    except Exception:
+        interaction.result = "error"
+        raise
+    if isinstance(outcome, SlotRequest):
+        interaction.result = "pending"
+        current_dialog().ask(outcome)
         return True
+    handled = outcome is not False
+    interaction.result = "handled" if handled else "unhandled"
+    return handled
+
+# Frame-level voice activity detection used to endpoint microphone capture
+VAD_FRAME_MS = 20
+VAD_START_MS = 60          # consecutive voiced audio required to start an utterance
+VAD_HANGOVER_MS = 300      # trailing non-speech that ends an utterance
+VAD_PREROLL_MS = 200       # audio kept from before the detected start
+VAD_TAIL_MS = 100          # audio kept after the last voiced frame
+VAD_ENERGY_MARGIN_DB = 9.0
+VAD_MAX_NOISE_FLOOR_DB = -50.0     # cap on a new detector's first floor guess, in case it starts mid-speech
+VAD_STATIONARY_MS = 600            # energy this steady for this long is background noise, not speech
+VAD_STATIONARY_SPREAD_DB = 3.0
+VAD_FLATNESS_MAX = 0.45
+VAD_ZCR_MAX = 0.35
+
+# Recognizer self-tuning from observed outcomes
+TUNING_BOUNDS = {
+    "energy_threshold": (300.0, 4000.0),   # recognizer.listen fallback path
+    "pause_threshold": (0.5, 1.5),         # recognizer.listen fallback path
+    "energy_margin_db": (6.0, 18.0),       # VAD speech margin above the noise floor
+    "hangover_ms": (200, 800),             # VAD trailing silence that ends a phrase
+    "wake_timeout": (3.0, 8.0),
+    "wake_phrase_limit": (5.0, 10.0),
+    "command_timeout": (4.0, 12.0),
+    "command_phrase_limit": (6.0, 14.0),
+}
+TUNING_DEFAULTS = {
+    "energy_threshold": 4000.0,
+    "pause_threshold": 0.8,
+    "energy_margin_db": VAD_ENERGY_MARGIN_DB,
+    "hangover_ms": VAD_HANGOVER_MS,
+    "wake_timeout": 5.0,
+    "wake_phrase_limit": 7.0,
+    "command_timeout": 6.0,
+    "command_phrase_limit": 8.0,
+}
+TUNING_WINDOW = 20        # outcomes considered per adjustment
+TUNING_EVERY = 5          # adjust after this many new outcomes
+
+class RecognizerTuner:
+    """Adjusts capture thresholds and listen timeouts from recent outcomes.
+
+    Outcomes are "ok" (a command was handled), "empty" (audio captured but
+    nothing recognized), "false_wake" (woke but no command followed),
+    "timeout" (no speech while a command was expected) and "clipped" (a
+    phrase hit its time limit). Noise-driven outcomes make capture less
+    sensitive, missed commands make it more sensitive and more patient, and
+    clean runs tighten endpointing and timeouts. Values are clamped to
+    TUNING_BOUNDS and saved per input device in the config file.
+    """
+
+    def __init__(self):
+        self.device = None
+        self.values = dict(TUNING_DEFAULTS)
+        self.calibrated = False
+        self._outcomes = []
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def load(self, device):
+        self.device = device
+        saved = config.get("tuning", {}).get(device)
+        if saved:
+            self.values.update({key: saved[key] for key in TUNING_DEFAULTS if key in saved})
+            self.calibrated = True
+            logger.info("Loaded recognizer tuning for %s: %s", device, self.values)
+
+    def calibrate(self, recognizer, source):
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        self._set("energy_threshold", recognizer.energy_threshold)
+        self.calibrated = True
+        self.save()
+
+    def apply(self, recognizer):
+        recognizer.energy_threshold = self.values["energy_threshold"]
+        recognizer.pause_threshold = self.values["pause_threshold"]
+        recognizer.dynamic_energy_threshold = True
+
+    def limits(self, stage):
+        """(timeout, phrase_time_limit) for the "wake" or "command" listen."""
+        return self.values[f"{stage}_timeout"], self.values[f"{stage}_phrase_limit"]
+
+    def _set(self, key, value):
+        low, high = TUNING_BOUNDS[key]
+        self.values[key] = type(TUNING_DEFAULTS[key])(round(max(low, min(high, value)), 2))
+
+    def observe(self, outcome):
+        with self._lock:
+            self._outcomes = (self._outcomes + [outcome])[-TUNING_WINDOW:]
+            self._pending += 1
+            if self._pending < TUNING_EVERY:
+                return
+            self._pending = 0
+            counts = {name: self._outcomes.count(name) for name in set(self._outcomes)}
+            self._adjust(counts, len(self._outcomes))
+        self.save()
+
+    def _adjust(self, counts, total):
+        before = dict(self.values)
+        noise = (counts.get("empty", 0) + counts.get("false_wake", 0)) / total
+        missed = counts.get("timeout", 0) / total
+        clipped = counts.get("clipped", 0) / total
+        if noise > 0.3:
+            self._set("energy_margin_db", self.values["energy_margin_db"] + 1.0)
+            self._set("energy_threshold", self.values["energy_threshold"] * 1.15)
+        elif missed > 0.2:
+            self._set("energy_margin_db", self.values["energy_margin_db"] - 1.0)
+            self._set("energy_threshold", self.values["energy_threshold"] * 0.87)
+        if missed > 0.2:
+            self._set("command_timeout", self.values["command_timeout"] + 1.0)
+        elif missed == 0:
+            self._set("command_timeout", self.values["command_timeout"] - 0.5)
+            self._set("wake_timeout", self.values["wake_timeout"] - 0.5)
+        if clipped > 0.1:
+            self._set("hangover_ms", self.values["hangover_ms"] + 50)
+            self._set("pause_threshold", self.values["pause_threshold"] + 0.1)
+            self._set("wake_phrase_limit", self.values["wake_phrase_limit"] + 1.0)
+            self._set("command_phrase_limit", self.values["command_phrase_limit"] + 1.0)
+        elif clipped == 0 and noise < 0.1:
+            self._set("hangover_ms", self.values["hangover_ms"] - 25)
+            self._set("pause_threshold", self.values["pause_threshold"] - 0.05)
+        changed = {key: value for key, value in self.values.items() if before[key] != value}
+        if changed:
+            logger.info("Recognizer tuning adjusted from %s: %s", counts, changed)
+
+    def save(self):
+        if not self.device:
+            return
+        tuning = config.setdefault("tuning", {})
+        tuning[self.device] = dict(self.values)
+        save_config(config)
 
-    if segment.startswith("OPEN "):
-        app_to_open = segment[5:].strip()
-        if app_to_open.upper().startswith("CLOCK APP"):
-            try:
-                if not open_clock_app(mode="clock"):
-                    raise Exception("Clock app launch failed")
-            except Exception as e:
-                logger.exception("Failed to open clock app")
-                vocalise("Failed to open clock app.")
-            return True
+recognizer_tuner = RecognizerTuner()
+
+def default_input_device_name():
+    return host_platform.input_device_name()
+
+def pcm_to_samples(raw, sample_width):
+    """Convert little-endian signed PCM bytes into float32 samples in [-1, 1]."""
+    if sample_width == 1:
+        # 8-bit WAV data is unsigned
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    dtype = {2: '<i2', 4: '<i4'}[sample_width]
+    scale = float(2 ** (8 * sample_width - 1))
+    return np.frombuffer(raw, dtype=dtype).astype(np.float32) / scale
+
+def vad_frame_features(samples, sample_rate, frame_ms=VAD_FRAME_MS):
+    """Return per-frame energy (dBFS), zero-crossing rate and spectral flatness."""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_len)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2 + 1e-12
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, zcr, flatness
+
+def vad_classify_frames(energy_db, zcr, flatness, noise_floor_db, margin_db=VAD_ENERGY_MARGIN_DB):
+    """Raw per-frame speech decision from the three frame features."""
+    loud = energy_db > noise_floor_db + margin_db
+    # Voiced speech is tonal (low flatness, low ZCR); broadband noise is not.
+    # Very loud frames are kept regardless so fricatives are not dropped.
+    tonal = (flatness < VAD_FLATNESS_MAX) & (zcr < VAD_ZCR_MAX)
+    very_loud = energy_db > noise_floor_db + 2 * margin_db
+    return loud & (tonal | very_loud)
+
+class VoiceActivityDetector:
+    """Streaming VAD with onset and hangover smoothing.
+
+    Audio is fed in arbitrary chunks; features are computed for all complete
+    frames of a chunk at once. An utterance starts after VAD_START_MS of
+    voiced frames and ends after `hangover_ms` of non-speech.
+
+    The noise floor drops at once to quieter non-speech frames and rises
+    slowly towards louder ones. Speech is never steady for long, so energy
+    that stays within VAD_STATIONARY_SPREAD_DB for VAD_STATIONARY_MS (a
+    fan, a mains hum) becomes the floor outright, and an onset made only of
+    that noise is withdrawn.
+    """
+
+    def __init__(self, sample_rate, sample_width, noise_floor_db=None,
+                 margin_db=VAD_ENERGY_MARGIN_DB, hangover_ms=VAD_HANGOVER_MS):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_len = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+        self.frame_bytes = self.frame_len * sample_width
+        self.start_frames = max(1, VAD_START_MS // VAD_FRAME_MS)
+        self.hangover_frames = max(1, int(hangover_ms) // VAD_FRAME_MS)
+        self.margin_db = margin_db
+        self.preroll_frames = VAD_PREROLL_MS // VAD_FRAME_MS
+        self.tail_frames = VAD_TAIL_MS // VAD_FRAME_MS
+        self.noise_floor_db = noise_floor_db
+        self.recent_db = deque(maxlen=max(2, VAD_STATIONARY_MS // VAD_FRAME_MS))
+        self.frame_count = 0
+        self.onset_frame = None
+        self.frames = []
+        self.voiced_run = 0
+        self.silent_run = 0
+        self.start_index = None
+        self.end_index = None
+        self.started_at = None    # monotonic time the onset was detected
+        self._remainder = b""
+
+    @property
+    def started(self):
+        return self.start_index is not None
+
+    @property
+    def ended(self):
+        return self.end_index is not None
+
+    def speech_seconds(self):
+        if not self.started:
+            return 0.0
+        return (len(self.frames) - self.start_index) * VAD_FRAME_MS / 1000.0
+
+    def feed(self, chunk):
+        if self.ended:
+            return
+        data = self._remainder + chunk
+        n_frames = len(data) // self.frame_bytes
+        self._remainder = data[n_frames * self.frame_bytes:]
+        if n_frames == 0:
+            return
+        block = data[:n_frames * self.frame_bytes]
+        energy_db, zcr, flatness = vad_frame_features(
+            pcm_to_samples(block, self.sample_width), self.sample_rate)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = min(float(np.min(energy_db)), VAD_MAX_NOISE_FLOOR_DB)
+        voiced = vad_classify_frames(energy_db, zcr, flatness, self.noise_floor_db, self.margin_db)
+        for i in range(n_frames):
+            self.frames.append(block[i * self.frame_bytes:(i + 1) * self.frame_bytes])
+            if voiced[i]:
+                self.voiced_run += 1
+                self.silent_run = 0
+            else:
+                self.voiced_run = 0
+                self.silent_run += 1
+                # Track the background level: follow drops at once, rises slowly
+                level = float(energy_db[i])
+                if level < self.noise_floor_db:
+                    self.noise_floor_db = level
+                else:
+                    self.noise_floor_db = 0.98 * self.noise_floor_db + 0.02 * level
+            self.frame_count += 1
+            self.recent_db.append(float(energy_db[i]))
+            if len(self.recent_db) == self.recent_db.maxlen and max(self.recent_db) - min(self.recent_db) < VAD_STATIONARY_SPREAD_DB:
+                self._stationary(sum(self.recent_db) / len(self.recent_db))
+            if not self.started:
+                if self.voiced_run >= self.start_frames:
+                    self.start_index = max(0, len(self.frames) - self.voiced_run - self.preroll_frames)
+                    self.started_at = time.monotonic()
+                    self.onset_frame = self.frame_count
+                elif len(self.frames) > self.preroll_frames + self.start_frames:
+                    del self.frames[0]
+            elif self.silent_run >= self.hangover_frames:
+                self.end_index = len(self.frames) - self.silent_run + self.tail_frames
+                return
+
+    def _stationary(self, level):
+        """The last VAD_STATIONARY_MS held steady at `level` dBFS: treat it as background."""
+        if level > self.noise_floor_db:
+            self.noise_floor_db = level
+        if self.started and self.frame_count - self.onset_frame < self.recent_db.maxlen:
+            # Everything since the onset was this steady noise
+            logger.debug("VAD onset was stationary noise at %.1f dBFS; listening again", level)
+            self.start_index = self.started_at = self.onset_frame = None
+            self.voiced_run = self.silent_run = 0
+            del self.frames[:-(self.preroll_frames + self.start_frames)]
+
+    def segment_bytes(self):
+        if not self.started:
+            return b""
+        end = self.end_index if self.ended else len(self.frames)
+        return b"".join(self.frames[self.start_index:end])
+
+vad_noise_floor_db = None  # background level carried from one local capture to the next
+
+def listen_with_vad(recognizer, source, timeout=None, phrase_time_limit=None, preroll=b""):
+    """Capture one utterance from `source`, endpointed by the frame-level VAD.
+
+    Behaves like recognizer.listen: raises sr.WaitTimeoutError if no speech
+    starts within `timeout` seconds and stops after `phrase_time_limit`
+    seconds of speech. The returned AudioData is already trimmed to the
+    utterance. `preroll` is audio already read from the source (e.g. by the
+    idle energy gate) and is fed to the VAD first. Falls back to
+    recognizer.listen when numpy is unavailable.
+    """
+    if np is None:
+        audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+        if preroll:
+            audio = sr.AudioData(preroll + audio.frame_data, audio.sample_rate, audio.sample_width)
+        return audio
+    global vad_noise_floor_db
+    vad = VoiceActivityDetector(source.SAMPLE_RATE, source.SAMPLE_WIDTH, noise_floor_db=vad_noise_floor_db,
+                                margin_db=recognizer_tuner.values["energy_margin_db"],
+                                hangover_ms=recognizer_tuner.values["hangover_ms"])
+    seconds_per_chunk = float(source.CHUNK) / source.SAMPLE_RATE
+    elapsed = 0.0
+    try:
+        if preroll:
+            vad.feed(preroll)
+        while True:
+            chunk = source.stream.read(source.CHUNK)
+            if not chunk:
+                break
+            power_manager.wakeups += 1
+            elapsed += seconds_per_chunk
+            if audio_cues.echo_in(seconds_per_chunk):
+                continue  # our own cue, not the user
+            vad.feed(chunk)
+            if not vad.started:
+                if timeout and elapsed > timeout:
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+            elif vad.ended:
+                break
+            elif phrase_time_limit and vad.speech_seconds() > phrase_time_limit:
+                recognizer_tuner.observe("clipped")
+                break
+    finally:
+        # The next capture starts from the background level learned here
+        vad_noise_floor_db = vad.noise_floor_db
+    if not vad.started:
+        raise sr.WaitTimeoutError("audio stream ended before a phrase started")
+    segment = vad.segment_bytes()
+    logger.debug("VAD captured %.2f s of speech after %.2f s", len(segment) / float(source.SAMPLE_RATE * source.SAMPLE_WIDTH), elapsed)
+    audio = sr.AudioData(segment, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+    audio.speech_started = vad.started_at
+    audio.noise_floor_db = vad.noise_floor_db
+    return audio
+
+def vad_speech_bounds(samples, sample_rate, margin_db=VAD_ENERGY_MARGIN_DB, hangover_ms=VAD_HANGOVER_MS,
+                      noise_floor_db=None):
+    """Return (start, end) sample indices of the speech in `samples`, or None.
+
+    Offline counterpart of VoiceActivityDetector: the same frame features and
+    onset/hangover smoothing, computed for the whole clip at once. Pass the
+    same margin and hangover as the detector that captured the clip, and
+    its noise floor when known; otherwise the clip's quietest frames set it.
+    """
+    energy_db, zcr, flatness = vad_frame_features(samples, sample_rate)
+    if not len(energy_db):
+        return None
+    frame_len = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+    start_frames = max(1, VAD_START_MS // VAD_FRAME_MS)
+    hangover_frames = max(1, int(hangover_ms) // VAD_FRAME_MS)
+    if noise_floor_db is None:
+        noise_floor_db = float(np.percentile(energy_db, 10))
+    voiced = vad_classify_frames(energy_db, zcr, flatness, noise_floor_db, margin_db).astype(np.int32)
+    n = len(voiced)
+    # Keep only voiced frames belonging to a run of at least start_frames
+    run_end = np.convolve(voiced, np.ones(start_frames, dtype=np.int32))[:n] >= start_frames
+    onset = np.convolve(run_end.astype(np.int32), np.ones(start_frames, dtype=np.int32))[start_frames - 1:start_frames - 1 + n] > 0
+    confirmed = onset & (voiced > 0)
+    # Hold speech through gaps shorter than the hangover
+    held = np.convolve(confirmed.astype(np.int32), np.ones(hangover_frames, dtype=np.int32))[:n] > 0
+    speech_idx = np.flatnonzero(held)
+    if not speech_idx.size:
+        return None
+    last_voiced = np.flatnonzero(confirmed)[-1]
+    start = max(0, (speech_idx[0] - VAD_PREROLL_MS // VAD_FRAME_MS) * frame_len)
+    end = min(len(samples), (last_voiced + 1 + VAD_TAIL_MS // VAD_FRAME_MS) * frame_len)
+    return start, end
+
+# Power-aware duty cycle for the wake-word listener
+POWER_ACTIVE_SECONDS = 120         # full processing for this long after speech or a command
+POWER_SAVER_IDLE_SECONDS = 1800    # no keyboard/mouse input for this long counts as away
+POWER_REPORT_INTERVAL = 600
+POWER_STATE_CACHE_SECONDS = 30
+
+# Outside active mode only a cheap RMS gate runs; it reads bigger blocks
+# (fewer wakeups) and keeps the microphone open longer between loop passes.
+POWER_MODES = {
+    "active": {"gate_chunk": None, "gate_timeout": None},
+    "idle": {"gate_chunk": 0.1, "gate_timeout": 30},
+    "saver": {"gate_chunk": 0.3, "gate_timeout": 60},
+}
+
+def session_locked():
+    try:
+        return host_platform.session_locked()
+    except Exception as e:
+        logger.debug("Lock state unavailable: %s", e)
+    return False
+
+def user_idle_seconds():
+    try:
+        return host_platform.user_idle_seconds()
+    except Exception as e:
+        logger.debug("Input idle time unavailable: %s", e)
+    return 0.0
+
+class PowerManager:
+    """Chooses the listening mode and accounts CPU time and wakeups to it.
+
+    "active" runs the full VAD on every chunk. "idle" (no speech recently)
+    and "saver" (on battery, session locked or user away) only run an
+    energy gate until the first loud block, then hand over to the full VAD.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.wakeups = 0
+        self.stats = {mode: {"seconds": 0.0, "cpu": 0.0, "wakeups": 0} for mode in POWER_MODES}
+        self._last_activity = time.time()
+        self._state = None
+        self._state_checked = 0.0
+        self._mode = "active"
+        self._mark = (time.monotonic(), time.process_time(), 0)
+        self._last_report = time.monotonic()
+
+    def touch(self):
+        self._last_activity = time.time()
+
+    def mode(self, dialog_open=False):
+        self._account()
+        if not self.enabled or dialog_open or time.time() - self._last_activity < POWER_ACTIVE_SECONDS:
+            mode = "active"
         else:
-            if app_to_open.upper().endswith(" AGAIN"):
-                app_to_open = app_to_open[:-6].strip()
-            open_app(app_to_open, recognizer)
-            return True
+            now = time.monotonic()
+            if self._state is None or now - self._state_checked > POWER_STATE_CACHE_SECONDS:
+                self._state_checked = now
+                self._state = on_battery_power() or session_locked() or user_idle_seconds() > POWER_SAVER_IDLE_SECONDS
+            mode = "saver" if self._state else "idle"
+        if mode != self._mode:
+            logger.info("Listening mode %s -> %s", self._mode, mode)
+            self._mode = mode
+        return mode
 
-    if "TELL ONLY THE DAY" in segment or "DAY ONLY" in segment or "ONLY DAY" in segment:
-        tell_only_day()
-        return True
-    if "TELL ONLY THE DATE" in segment or "DATE ONLY" in segment or "ONLY DATE" in segment:
-        tell_only_date()
-        return True
-    if any(phrase in segment for phrase in ["WHAT'S TODAY'S DAY", "WHAT IS TODAY'S DAY", "WHAT'S THE DAY TODAY", "DAY?", "WHAT'S THE DAY", "WHAT DAY IS TODAY", "DAY", "TELL THE DAY"]):
-        tell_day_and_date(day_first=True)
-        return True
-    if any(phrase in segment for phrase in ["WHAT'S TODAY'S DATE", "WHAT IS TODAY'S DATE", "DATE?", "WHAT'S THE DATE", "WHAT DATE IS TODAY", "DATE", "TELL THE DATE"]):
-        tell_day_and_date(day_first=False)
-        return True
+    def _account(self):
+        wall, cpu, wakeups = time.monotonic(), time.process_time(), self.wakeups
+        stat = self.stats[self._mode]
+        stat["seconds"] += wall - self._mark[0]
+        stat["cpu"] += cpu - self._mark[1]
+        stat["wakeups"] += wakeups - self._mark[2]
+        self._mark = (wall, cpu, wakeups)
+        if wall - self._last_report > POWER_REPORT_INTERVAL:
+            self._last_report = wall
+            self.report()
 
-    toggle_mute_commands = ["MUTE", "SHUT UP", "SHUTUP", "STOP THAT", "UNMUTE", "TURN ON SOUND", "MUTE SOUND", "MUTE SOUNDS", "MUTE THE MUSIC", "MUTE THE AUDIO", "MUTE THE NOISE", "MUTE THE SOUNDS", "MUTE AUDIO", "MUTE NOISE"]
-    for cmd in toggle_mute_commands:
-        if cmd in segment:
-            toggle_mute_volume()
-            return True
+    def report(self):
+        for mode, stat in self.stats.items():
+            if stat["seconds"] >= 1:
+                logger.info("Listening mode %s: %.0f s, %.1f%% CPU, %.0f wakeups/min", mode, stat["seconds"],
+                            100.0 * stat["cpu"] / stat["seconds"], 60.0 * stat["wakeups"] / stat["seconds"])
 
-    if "VOLUME UP" in segment or "INCREASE VOLUME" in segment or ("TURN UP" in segment and "VOLUME" in segment) or ("VOLUME" in segment and "LOWER" in segment):
-        volume_up()
-        return True
+def energy_gate(source, chunk_seconds, timeout):
+    """Block until a loud block arrives; return its bytes, or None after `timeout` seconds.
 
-    if "VOLUME DOWN" in segment or "DECREASE VOLUME" in segment or ("TURN DOWN" in segment and "VOLUME" in segment) or ("VOLUME" in segment and "RAISE" in segment):
-        volume_down()
-        return True
+    Only an RMS level is computed per block, against a slowly tracked noise
+    floor, so this costs far less than the full VAD features. Without numpy
+    there is no gate: the first block is returned as it was read.
+    """
+    frames = max(source.CHUNK, int(source.SAMPLE_RATE * chunk_seconds))
+    if np is None:
+        return source.stream.read(frames) or None
+    margin = recognizer_tuner.values["energy_margin_db"]
+    floor = None
+    elapsed = 0.0
+    while elapsed < timeout and not exit_event.is_set():
+        block = source.stream.read(frames)
+        if not block:
+            return None
+        power_manager.wakeups += 1
+        elapsed += float(frames) / source.SAMPLE_RATE
+        if audio_cues.echo_in(float(frames) / source.SAMPLE_RATE):
+            continue  # our own cue, not the user
+        samples = pcm_to_samples(block, source.SAMPLE_WIDTH)
+        level = 10.0 * np.log10(float(np.mean(samples * samples)) + 1e-10)
+        if floor is None:
+            floor = level
+        elif level > floor + margin:
+            logger.debug("Energy gate opened at %.1f dBFS (floor %.1f)", level, floor)
+            return block
+        floor = level if level < floor else floor + 0.05 * (level - floor)
+    return None
 
-    if ("MAX VOLUME" in segment or "FULL VOLUME" in segment or "MAXIMUM VOLUME" in segment or
-       (segment.startswith("SET VOLUME") and ("MAX" in segment or "FULL" in segment or "MAXIMUM" in segment))):
-        set_volume(100)
-        is_muted = False
-        return True
+power_manager = PowerManager(enabled=config.get("power_saving", True))
 
-    if ("SET VOLUME" in segment or "VOLUME SET" in segment or "PUT VOLUME " in segment or ("VOLUME" in segment and "SET" in segment)):
-        match = re.search(r"(\d+)", segment)
-        if match:
-            percent = int(match.group(1))
-            set_volume(percent)
-            return True
+# Audio pre-processing between capture and recognition
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_HIGHPASS_HZ = 80.0
+PREPROCESS_NOISE_SUPPRESSION = bool(config.get("noise_suppression", False))
+SPECTRAL_SUBTRACTION_FFT = 512
+SPECTRAL_SUBTRACTION_ALPHA = 1.5   # over-subtraction factor
+SPECTRAL_SUBTRACTION_FLOOR = 0.05  # fraction of the original magnitude always kept
+
+def resample_and_highpass(samples, sample_rate, target_rate=PREPROCESS_SAMPLE_RATE, cutoff_hz=PREPROCESS_HIGHPASS_HZ):
+    """Band-limited resample and high-pass filter in a single FFT pass."""
+    n_in = len(samples)
+    n_out = max(1, int(round(n_in * float(target_rate) / sample_rate)))
+    spectrum = np.fft.rfft(samples)
+    n_bins = n_out // 2 + 1
+    if n_bins <= len(spectrum):
+        spectrum = spectrum[:n_bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(n_bins - len(spectrum), dtype=spectrum.dtype)])
+    freqs = np.fft.rfftfreq(n_out, d=1.0 / target_rate)
+    # Raised-cosine ramp from 0 to cutoff avoids ringing from a brick-wall edge
+    ramp = np.clip(freqs / cutoff_hz, 0.0, 1.0)
+    spectrum = spectrum * (0.5 - 0.5 * np.cos(np.pi * ramp))
+    return np.fft.irfft(spectrum, n_out) * (float(n_out) / n_in)
+
+def spectral_subtract(samples, noise, n_fft=SPECTRAL_SUBTRACTION_FFT):
+    """Suppress stationary noise using the magnitude spectrum of `noise`."""
+    hop = n_fft // 2
+    window = np.hanning(n_fft + 1)[:-1]
+    n_frames = max(1, int(np.ceil(max(0, len(samples) - n_fft) / float(hop))) + 1)
+    padded = np.zeros((n_frames - 1) * hop + n_fft, dtype=np.float64)
+    padded[:len(samples)] = samples
+    starts = np.arange(n_frames) * hop
+    index = starts[:, None] + np.arange(n_fft)
+    spectra = np.fft.rfft(padded[index] * window, axis=1)
+    if len(noise) >= n_fft:
+        noise_frames = np.lib.stride_tricks.sliding_window_view(noise, n_fft)[::hop]
+        noise_mag = np.mean(np.abs(np.fft.rfft(noise_frames * window, axis=1)), axis=0)
+    else:
+        # No separate noise reference: use the quietest tenth of the frames
+        mags = np.abs(spectra)
+        quiet = np.argsort(np.sum(mags, axis=1))[:max(1, n_frames // 10)]
+        noise_mag = np.mean(mags[quiet], axis=0)
+    magnitude = np.abs(spectra)
+    cleaned = np.maximum(magnitude - SPECTRAL_SUBTRACTION_ALPHA * noise_mag,
+                         SPECTRAL_SUBTRACTION_FLOOR * magnitude)
+    frames = np.fft.irfft(cleaned * np.exp(1j * np.angle(spectra)), n_fft, axis=1)
+    out = np.zeros_like(padded)
+    np.add.at(out, index, frames)
+    return out[:len(samples)]
+
+def preprocess_audio(audio, noise_suppression=None):
+    """Trim, resample to 16 kHz, high-pass and optionally denoise `audio`.
+
+    Returns a new AudioData, or None if the clip contains no speech. Audio
+    is returned unchanged when numpy is unavailable.
+    """
+    if np is None:
+        return audio
+    if noise_suppression is None:
+        noise_suppression = PREPROCESS_NOISE_SUPPRESSION
+    started = time.perf_counter()
+    raw = audio.get_raw_data(convert_width=2)
+    samples = pcm_to_samples(raw, 2).astype(np.float64)
+    # Trim with the tuned thresholds the capture used, or a clip the live VAD accepted can come back empty
+    tuning = current_room().tuner.values
+    bounds = vad_speech_bounds(samples, audio.sample_rate,
+                               margin_db=tuning["energy_margin_db"],
+                               hangover_ms=tuning["hangover_ms"],
+                               noise_floor_db=getattr(audio, "noise_floor_db", None))
+    if bounds is None:
+        logger.info("Pre-processing found no speech in %d bytes of audio", len(raw))
+        return None
+    start, end = bounds
+    noise = np.concatenate([samples[:start], samples[end:]])
+    samples = resample_and_highpass(samples[start:end], audio.sample_rate)
+    if noise_suppression:
+        if len(noise):
+            noise = resample_and_highpass(noise, audio.sample_rate)
+        samples = spectral_subtract(samples, noise)
+    # The inverse of pcm_to_samples, so samples that pass through unchanged come back bit-exact
+    pcm = np.clip(np.rint(samples * 32768.0), -32768, 32767).astype('<i2').tobytes()
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    logger.info("Pre-processed utterance: %d -> %d bytes (saved %d) in %.1f ms",
+                len(raw), len(pcm), len(raw) - len(pcm), elapsed_ms)
+    return sr.AudioData(pcm, PREPROCESS_SAMPLE_RATE, 2)
+
+# N-best routing: every alternative the recognizer returns is a routing candidate
+N_BEST_MIN_CONFIDENCE = 0.3
+N_BEST_RANK_DECAY = 0.85       # score factor per rank for alternatives without a confidence
+N_BEST_DEFAULT_CONFIDENCE = 0.6
+
+def google_hypotheses(response):
+    """Turn a recognize_google(show_all=True) response into [(TRANSCRIPT, score), ...].
+
+    Google only reports a confidence for its top alternative, so the others
+    are scored by rank below it.
+    """
+    alternatives = response.get("alternative", []) if isinstance(response, dict) else []
+    hypotheses = []
+    top_score = N_BEST_DEFAULT_CONFIDENCE
+    for rank, alternative in enumerate(alternatives):
+        text = alternative.get("transcript", "").upper().strip()
+        if not text:
+            continue
+        if "confidence" in alternative:
+            score = float(alternative["confidence"])
+            if rank == 0:
+                top_score = score
         else:
-            vocalise("Please specify volume percentage")
-            try:
-                with mic_lock:
-                    with sr.Microphone() as source:
-                        response_audio = recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                response_text = recognize_audio(recognizer, response_audio).upper().strip()
-                match = re.search(r"(\d+)", response_text)
-                if match:
-                    percent = int(match.group(1))
-                    set_volume(percent)
-                    return True
-            except Exception as e:
-                logger.exception("Volume percentage input error")
-                vocalise("No volume percentage provided. Command cancelled.")
-                return True
+            score = top_score * N_BEST_RANK_DECAY ** rank
+        hypotheses.append((text, round(score, 3)))
+    return hypotheses
 
-    for key, response in exit_phrases.items():
-        if key in segment:
-            vocalise(response)
-            time.sleep(1)
-            exit_event.set()
-            return True
+# Recognition backends behind a hedging dispatcher with per-backend circuit breakers
+RECOGNITION_TIMEOUT = 10.0      # give up on all backends after this long
+RECOGNITION_WORKERS = 4         # concurrent backend calls; raise with "recognition_workers" for server mode
+HEDGE_MIN_DELAY = 0.8           # never hedge sooner than this
+HEDGE_DEFAULT_DELAY = 2.0       # hedge delay until enough latency samples exist
+HEDGE_MIN_SAMPLES = 5
+BREAKER_FAILURES = 3            # consecutive failures or slow answers that trip a breaker
+BREAKER_SLOW_SECONDS = 5.0
+BREAKER_COOLDOWN = 30.0         # seconds before a tripped backend gets a trial request
+BACKEND_STATS_WINDOW = 50
 
-    command_checks = [
-        (shutdown_phrases, lambda: confirm_action(recognizer, shutdown_computer, "Shutdown")),
-        (restart_phrases, lambda: confirm_action(recognizer, restart_computer, "Restart")),
-        (sleep_phrases, sleep_computer),
-        (lock_phrases, lock_computer),
-        (["BATTERY"], battery_status),
-        (["TIME"], tell_current_time),
-        (custom_commands.keys(), lambda: vocalise(custom_commands.get(segment, "")))
-    ]
-    for phrases, action in command_checks:
-        if any(phrase in segment for phrase in phrases):
-            action()
+class RecognitionBackend(abc.ABC):
+    """Turns AudioData into an n-best list. Raises sr.RequestError when the backend fails."""
+
+    name = "backend"
+
+    @abc.abstractmethod
+    def recognize(self, recognizer, audio):
+        """Return [(TRANSCRIPT, confidence or None), ...], best first."""
+
+class GoogleBackend(RecognitionBackend):
+    name = "google"
+
+    def recognize(self, recognizer, audio):
+        try:
+            return google_hypotheses(recognizer.recognize_google(audio, show_all=True))
+        except sr.UnknownValueError:
+            return []
+
+class SphinxBackend(RecognitionBackend):
+    """Offline PocketSphinx decoding; one hypothesis without a confidence."""
+
+    name = "sphinx"
+
+    def recognize(self, recognizer, audio):
+        try:
+            text = recognizer.recognize_sphinx(audio).upper().strip()
+        except sr.UnknownValueError:
+            return []
+        return [(text, None)] if text else []
+
+class StubBackend(RecognitionBackend):
+    """Local stand-in for tests: fixed hypotheses after `latency` seconds, failing at `error_rate`."""
+
+    def __init__(self, name, hypotheses, latency=0.0, error_rate=0.0, seed=None):
+        self.name = name
+        self.hypotheses = hypotheses
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def recognize(self, recognizer, audio):
+        latency = self.latency() if callable(self.latency) else self.latency
+        time.sleep(latency)
+        if self._random.random() < self.error_rate:
+            raise sr.RequestError(f"{self.name} stub failure")
+        return list(self.hypotheses)
+
+class ScriptedBackend(RecognitionBackend):
+    """Recognizes the fake microphone's utterances by returning their scripted transcripts."""
+
+    name = "scripted"
+
+    def __init__(self, fake_platform):
+        self.platform = fake_platform
+
+    def recognize(self, recognizer, audio):
+        try:
+            return [(self.platform.heard.popleft(), 0.95)]
+        except IndexError:
+            return []
+
+class BackendHealth:
+    """Rolling latency/error stats and a circuit breaker for one backend."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=BACKEND_STATS_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.abandoned = 0   # calls given up on that are still running
+
+    def p95(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def available(self, now):
+        if self.abandoned:
+            # A hung call still holds a worker; don't queue another behind it
+            return False
+        if self.opened_at is None:
             return True
-    return False
+        # Half-open after the cooldown: one trial request tests the backend
+        return now - self.opened_at >= BREAKER_COOLDOWN and not self.trial_in_flight
 
-def recognize_audio(recognizer, audio):
-    try:
-        text = recognizer.recognize_google(audio)
-        text = text.upper().strip()
-        logger.info(f"Heard (Google): {text}")
-        return text
-    except sr.UnknownValueError:
-        logger.warning("Google Speech Recognition could not understand audio")
-        return ""
-    except sr.RequestError as e:
-        logger.exception(f"Could not request results from Google Speech Recognition service; {e}")
-        return ""
-
-def active_listen_session(recognizer):
-    if exit_event.is_set():
-        return
-    try:
-        with mic_lock:
-            with sr.Microphone() as source:
-                recognizer.adjust_for_ambient_noise(source, duration=1)
-                audio = recognizer.listen(source, timeout=6, phrase_time_limit=8)
-        command_text = recognize_audio(recognizer, audio).upper().strip()
-        if command_text and process_segment(command_text, recognizer):
+    def record(self, latency, ok):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.trial_in_flight = False
+        if ok and latency <= BREAKER_SLOW_SECONDS:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return False
+        if not ok:
+            self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= BREAKER_FAILURES or self.opened_at is not None:
+            tripped = self.opened_at is None
+            self.opened_at = time.monotonic()
+            return tripped
+        return False
+
+class RecognitionCall:
+    """One request to one backend. Its outcome is recorded once, when it
+    returns or when the dispatcher gives up on it, whichever is first."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = time.monotonic()
+        self.settled = False
+        self.finished = False
+        self.abandoned = False
+
+class RecognitionDispatcher:
+    """Sends audio to the first healthy backend and hedges to the next one if it is slow.
+
+    The hedge fires once the primary has been outstanding longer than its
+    p95 latency; the first backend to return a non-empty n-best list wins,
+    so one that heard nothing doesn't cut off another still listening.
+    Hedging past a backend and reaching the deadline both count as
+    failures for its breaker, and a backend whose abandoned call is still
+    running gets no new ones. Backends whose breaker is open are skipped
+    until their cooldown ends, so a network outage falls through to the
+    local engine without waiting on timeouts.
+    """
+
+    def __init__(self, backends, workers=RECOGNITION_WORKERS):
+        self.backends = list(backends)
+        self.health = {backend.name: BackendHealth() for backend in self.backends}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognize")
+
+    def _settle(self, call, ok):
+        """Record `call` in its backend's health unless already recorded. Caller holds the lock."""
+        if call.settled:
             return
+        call.settled = True
+        if self.health[call.backend.name].record(time.monotonic() - call.started, ok):
+            logger.warning("Circuit breaker opened for %s recognition", call.backend.name)
+
+    def _call(self, call, recognizer, audio):
+        ok = False
+        try:
+            result = call.backend.recognize(recognizer, audio)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                call.finished = True
+                if call.abandoned:
+                    self.health[call.backend.name].abandoned -= 1
+                self._settle(call, ok)
+
+    def _abandon(self, calls, failed):
+        """Stop waiting for `calls`; with `failed` they count against their backends."""
+        with self._lock:
+            for call in calls:
+                if call.finished:
+                    continue
+                call.abandoned = True
+                self.health[call.backend.name].abandoned += 1
+                if failed:
+                    self._settle(call, False)
+
+    def _hedge_delay(self, backend):
+        with self._lock:
+            p95 = self.health[backend.name].p95()
+        return HEDGE_DEFAULT_DELAY if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+    def recognize(self, recognizer, audio):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if self.health[b.name].available(now)]
+        if not candidates:
+            # Everything is tripped; the last backend is the local fallback of last resort
+            candidates = self.backends[-1:]
+        deadline = time.monotonic() + RECOGNITION_TIMEOUT
+        pending = {}
+        remaining = list(candidates)
+        heard_nothing = False
+
+        def launch():
+            call = RecognitionCall(remaining.pop(0))
+            with self._lock:
+                health = self.health[call.backend.name]
+                if health.opened_at is not None:
+                    health.trial_in_flight = True
+            pending[self._executor.submit(self._call, call, recognizer, audio)] = call
+            return call
+
+        current = launch()
+        while pending:
+            now = time.monotonic()
+            wait = deadline - now
+            if remaining:
+                wait = min(wait, current.started + self._hedge_delay(current.backend) - now)
+            done = set()
+            if wait > 0:
+                done, _ = concurrent.futures.wait(pending, timeout=wait, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                if not remaining or time.monotonic() >= deadline:
+                    break
+                logger.info("Hedging recognition to %s after %s was slow", remaining[0].name, current.backend.name)
+                with self._lock:
+                    self._settle(current, False)
+                current = launch()
+                continue
+            for future in done:
+                call = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning("%s recognition failed: %s", call.backend.name, e)
+                    continue
+                if not result:
+                    heard_nothing = True
+                    continue
+                logger.debug("Recognition answered by %s", call.backend.name)
+                # Losers keep running; their backends get no new calls until they return
+                self._abandon(pending.values(), failed=False)
+                return result
+            if remaining and not pending and not heard_nothing:
+                current = launch()
+        if pending:
+            logger.warning("Gave up on %s recognition after %.0f s",
+                           ", ".join(call.backend.name for call in pending.values()), RECOGNITION_TIMEOUT)
+            self._abandon(pending.values(), failed=True)
+        if not heard_nothing:
+            logger.warning("No recognition backend answered")
+        return []
+
+    def stats(self):
+        with self._lock:
+            return {name: {"requests": h.requests, "errors": h.errors, "p95_ms": None if h.p95() is None else round(h.p95() * 1000),
+                           "open": h.opened_at is not None} for name, h in self.health.items()}
+
+recognition_dispatcher = RecognitionDispatcher(host_platform.recognition_backends(),
+                                               workers=config.get("recognition_workers", RECOGNITION_WORKERS))
+
+def new_recognizer():
+    """A Recognizer whose network requests give up after RECOGNITION_TIMEOUT, so a hung call frees its worker."""
+    recognizer = sr.Recognizer()
+    recognizer.operation_timeout = RECOGNITION_TIMEOUT
+    return recognizer
+
+def recognize_hypotheses(recognizer, audio):
+    """Return the n-best list for `audio` as [(TRANSCRIPT, score), ...], best first."""
+    interaction = current_interaction()
+    try:
+        with interaction.stage("preprocess"):
+            audio = preprocess_audio(audio)
+    except Exception as e:
+        logger.exception("Audio pre-processing failed, recognizing raw audio")
+    if audio is None:
+        return []
+    with interaction.stage("recognize"):
+        hypotheses = recognition_dispatcher.recognize(recognizer, audio)
+    if hypotheses:
+        logger.info("Heard: %s", "; ".join(t if c is None else f"{t} ({c:.2f})" for t, c in hypotheses))
+    else:
+        logger.warning("Speech recognition could not understand audio")
+    return hypotheses
+
+def recognize_audio(recognizer, audio):
+    hypotheses = recognize_hypotheses(recognizer, audio)
+    return hypotheses[0][0] if hypotheses else ""
+
+def route_hypotheses(hypotheses, wake=False, route=True):
+    """Pick the alternative to act on from an n-best list.
+
+    Returns (transcript, command, score). With `route`, the best-scoring
+    alternative whose command matches an intent and clears
+    N_BEST_MIN_CONFIDENCE wins; otherwise the first usable alternative is
+    returned. With `wake`, only alternatives that start with a wake word are
+    usable and the command is the text after it; whether to wake at all is
+    decided by the top hypothesis alone, so a low-ranked alternative can't
+    wake the assistant. Returns ("", "", None) when nothing is usable.
+    """
+    if wake and (not hypotheses or not check_for_wake(hypotheses[0][0])[0]):
+        return "", "", None
+    fallback = best = None
+    for text, score in hypotheses:
+        if wake:
+            woke, command = check_for_wake(text)
+            if not woke:
+                continue
         else:
-            vocalise("Command not recognized. Please try again.")
-            with mic_lock:
-                with sr.Microphone() as source:
-                    audio = recognizer.listen(source, timeout=8, phrase_time_limit=10)
-            command_text = recognize_audio(recognizer, audio).upper().strip()
-            if command_text:
-                process_segment(command_text, recognizer)
+            command = text
+        if fallback is None:
+            fallback = (text, command, score)
+        if not route or not command or (score is not None and score < N_BEST_MIN_CONFIDENCE):
+            continue
+        if match_intent(command)[1] and (best is None or (score or 0) > (best[2] or 0)):
+            best = (text, command, score)
+    if best and best is not fallback:
+        logger.info(f"Routing alternative hypothesis: {best[0]}")
+    return best or fallback or ("", "", None)
+
+# Constrained-vocabulary local decoding for follow-up prompts
+GRAMMAR_DIR = Path(tempfile.gettempdir()) / "lucifer_grammars"
+
+NUMBER_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19
+}
+NUMBER_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+
+GRAMMAR_MIN_CONFIDENCE = 0.5   # posterior below which a local grammar decode is not trusted
+
+# Every follow-up grammar also accepts a wake word and a set of distractor
+# words, so a new command or unrelated speech ("never mind") has somewhere
+# to land besides a valid answer
+GRAMMAR_WAKE_RULE = "<wake> = [hey | hello] ( lucifer | lucy );\n"
+GRAMMAR_GARBAGE_RULE = ("<garbage> = cancel | abort | stop | no | yes | wait | never mind | forget it | do not"
+                        " | nothing | what | okay | please | the | a | it;\n")
+
+def follow_up_grammar(name, answers, rules=""):
+    """JSGF text whose public rule `name` matches `answers`, a wake word, or distractor words."""
+    return (f"#JSGF V1.0;\ngrammar {name};\n{rules}{GRAMMAR_WAKE_RULE}{GRAMMAR_GARBAGE_RULE}"
+            f"public <{name}> = {answers} | <wake> <garbage>* | <garbage>+;\n")
+
+CONFIRM_GRAMMAR = follow_up_grammar("confirm", "activate")
+
+NUMBER_GRAMMAR = follow_up_grammar(
+    "number",
+    "[set] [volume] [to] ( zero | <unit> | <teen> | <tens> [<unit>] | [one] hundred ) [percent]",
+    "<unit> = one | two | three | four | five | six | seven | eight | nine;\n"
+    "<teen> = ten | eleven | twelve | thirteen | fourteen | fifteen | sixteen | seventeen | eighteen | nineteen;\n"
+    "<tens> = twenty | thirty | forty | fifty | sixty | seventy | eighty | ninety;\n"
+)
+
+_grammar_paths = {}
+
+def grammar_file(name, text):
+    """Write a JSGF grammar once and return its path. `name` must match the grammar's public rule."""
+    key = (name, text)
+    if key not in _grammar_paths:
+        GRAMMAR_DIR.mkdir(parents=True, exist_ok=True)
+        path = GRAMMAR_DIR / f"{name}.gram"
+        # recognize_sphinx caches the compiled .fsg next to the grammar, so drop a stale one
+        fsg_path = path.with_suffix(".fsg")
+        if not path.exists() or path.read_text() != text:
+            path.write_text(text)
+            if fsg_path.exists():
+                fsg_path.unlink()
+        _grammar_paths[key] = str(path)
+    return _grammar_paths[key]
+
+def app_name_grammar(app_names):
+    """Grammar over spoken app names; names with characters JSGF can't take are left out."""
+    names = sorted({name for name in app_names if re.fullmatch(r"[a-z]+( [a-z]+)*", name)})
+    if not names:
+        return None
+    digest = hashlib.md5("|".join(names).encode("utf-8")).hexdigest()[:8]
+    rule = f"apps{digest}"
+    return grammar_file(rule, follow_up_grammar(rule, "[open] ( " + " | ".join(names) + " )"))
+
+def words_to_number(text):
+    """Parse "42", "forty two" or "one hundred" into an int, or None."""
+    digits = re.search(r"\d+", text)
+    if digits:
+        return int(digits.group(0))
+    total = None
+    for word in text.lower().replace("-", " ").split():
+        if word in NUMBER_UNITS:
+            total = (total or 0) + NUMBER_UNITS[word]
+        elif word in NUMBER_TENS:
+            total = (total or 0) + NUMBER_TENS[word]
+        elif word == "hundred":
+            total = (total or 1) * 100
+    return total
+
+def recognize_constrained(recognizer, audio, grammar_path):
+    """Decode a follow-up answer locally against a JSGF grammar.
+
+    Uses offline PocketSphinx, so confirmations skip the cloud round trip and
+    work without a network. Falls back to recognize_audio when PocketSphinx
+    is not installed, the grammar can't be built, nothing matched, or the
+    match scored below GRAMMAR_MIN_CONFIDENCE. A decode that starts with a
+    wake word is a new command, so the whole utterance is recognized again
+    without the grammar.
+    """
+    if grammar_path:
+        local_audio = audio
+        try:
+            local_audio = preprocess_audio(audio)
+        except Exception as e:
+            logger.exception("Audio pre-processing failed before local decoding")
+        if local_audio is None:
+            return ""
+        try:
+            with current_interaction().stage("recognize_local"):
+                decoder = recognizer.recognize_sphinx(local_audio, grammar=grammar_path, show_all=True)
+            hyp = decoder.hyp()
+            text = hyp.hypstr.upper().strip() if hyp is not None else ""
+            confidence = decoder.get_logmath().exp(hyp.prob) if text else 0.0
+            if not text:
+                logger.info("Local grammar decode found no match, trying cloud recognition")
+            elif confidence < GRAMMAR_MIN_CONFIDENCE:
+                logger.info(f"Local grammar decode {text!r} too uncertain ({confidence:.2f}), trying cloud recognition")
+            elif check_for_wake(text)[0]:
+                logger.info(f"Heard a wake word during a follow-up ({text}), recognizing the full command")
+                return recognize_audio(recognizer, audio) or text
             else:
-                vocalise("No command received. Switching back to wake word mode.")
+                logger.info(f"Heard (local grammar {os.path.basename(grammar_path)}, {confidence:.2f}): {text}")
+                return text
+        except Exception as e:
+            logger.warning("Local grammar decode unavailable (%s), using cloud recognition", e)
+    return recognize_audio(recognizer, audio)
+
+def dispatch_segment(segment, recognizer):
+    """Queue the action for `segment` on the executor; returns False when no intent matches.
+
+    The capture loop goes straight back to listening. The queued task owns
+    the interaction from here and records it when the action (and any
+    follow-up it asks) is finished.
+    """
+    segment = segment.strip().upper()
+    name, handler = match_intent(segment)
+    if handler is None:
+        return False
+    interaction = current_interaction()
+    interaction.result = "dispatched"
+    if action_executor.submit(name, run_segment, segment, recognizer, interaction=interaction) is None:
+        interaction.result = "busy"
+        vocalise("I am still busy with earlier commands.")
+    return True
+
+def run_segment(segment, recognizer):
+    interaction = current_interaction()
+    dialog = current_dialog()
+    if not process_segment(segment, recognizer) and dialog.pending() is None:
+        interaction.result = "pending"
+        dialog.ask(command_slot(recognizer, "Command not recognized. Please try again.", retry=False))
+    if not dialog.waiting_on(interaction):
+        finish_interaction(interaction)
+
+def command_slot(recognizer, prompt=None, retry=True):
+    """Follow-up slot for a wake word heard without a usable command."""
+    def fill(command_text):
+        if process_segment(command_text, recognizer) or not retry:
+            return None
+        current_interaction().transcript = command_text
+        return command_slot(recognizer, "Command not recognized. Please try again.", retry=False)
+
+    return SlotRequest(
+        "command",
+        prompt,
+        fill,
+        timeout=current_room().tuner.limits("command")[0] + DIALOG_TIMEOUT,
+        expired_message="No command received. Switching back to wake word mode."
+    )
+
+# Audio cues: decoded once at startup, played from memory on a stream that stays open
+CUE_DIR = os.path.join(APP_DIR, "cues")
+CUE_RATE = 22050
+CUE_BUFFER_FRAMES = 128        # ~6 ms per output callback
+CUE_ECHO_TAIL = 0.15           # seconds after a cue during which captured audio is ignored
+CUE_VOLUME = 0.4
+CUE_TONES = {                  # (frequency Hz or 0 for a pause, seconds) used when no cue file exists
+    "wake": [(880, 0.07), (1320, 0.09)],
+    "confirm": [(660, 0.06), (990, 0.1)],
+    "error": [(440, 0.12), (311, 0.2)],
+    "alarm": [(1000, 0.15), (0, 0.08)] * 3,
+}
+# Only the fake output stream runs without pyaudio, and it ignores the flag
+CUE_CONTINUE = pyaudio.paContinue if pyaudio is not None else 0
+
+def synthesize_cue(tones):
+    parts = []
+    for frequency, seconds in tones:
+        t = np.arange(int(seconds * CUE_RATE)) / float(CUE_RATE)
+        if not frequency:
+            parts.append(np.zeros(len(t), dtype=np.float32))
+            continue
+        fade = np.minimum(1.0, np.minimum(t, seconds - t) / 0.01)  # 10 ms ramps avoid clicks
+        parts.append((np.sin(2 * np.pi * frequency * t) * fade).astype(np.float32))
+    return (np.concatenate(parts) * CUE_VOLUME * 32767).astype('<i2').tobytes()
+
+def read_cue_file(path):
+    """Decode a cue file to mono 16-bit PCM at CUE_RATE; WAV natively, anything else through ffmpeg."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+        samples = pcm_to_samples(raw, width).reshape(-1, channels).mean(axis=1)
+        if rate != CUE_RATE:
+            positions = np.arange(int(len(samples) * CUE_RATE / rate)) * (rate / float(CUE_RATE))
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+        return (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    return subprocess.run(
+        [ffmpeg, "-v", "quiet", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(CUE_RATE), "-"],
+        stdout=subprocess.PIPE, check=True, timeout=10
+    ).stdout or None
+
+class AudioCuePlayer:
+    """Short sounds (wake, confirm, error, alarm) played from memory.
+
+    Every cue is decoded to PCM once in load(): cues/<name>.wav if present,
+    WAKEBEEP.m4a for the wake cue when ffmpeg can decode it, otherwise a
+    synthesized tone. open() starts one callback-driven output stream that
+    plays silence between cues, so play() only swaps a buffer and the sound
+    starts on the next ~6 ms callback. While a cue (plus CUE_ECHO_TAIL) is
+    audible, echo_in() tells the capture stage to skip what the microphone
+    picked up.
+    """
+
+    def __init__(self):
+        self.cues = {}
+        self.plays = {}
+        self.echo_until = 0.0
+        self._lock = threading.Lock()
+        self._stream = None
+        self._playing = None
+        self._position = 0
+
+    def load(self):
+        sources = {name: os.path.join(CUE_DIR, f"{name}.wav") for name in CUE_TONES}
+        beep_path = environment.get("beep_path")
+        for name, tones in CUE_TONES.items():
+            pcm = None
+            for path in (sources[name], beep_path if name == "wake" else None):
+                if path and os.path.exists(path):
+                    try:
+                        pcm = read_cue_file(path)
+                    except Exception as e:
+                        logger.warning("Could not decode cue %s from %s: %s", name, path, e)
+                if pcm:
+                    break
+            if not pcm and np is not None:
+                pcm = synthesize_cue(tones)
+            if pcm:
+                self.cues[name] = pcm
+        logger.info("Loaded audio cues: %s", {name: f"{len(pcm) / (2.0 * CUE_RATE):.2f} s" for name, pcm in self.cues.items()})
+
+    def open(self):
+        if self._stream is None and self.cues:
+            self._stream = host_platform.open_output_stream(CUE_RATE, CUE_BUFFER_FRAMES, self._callback)
+
+    def close(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop_stream()
+            stream.close()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        wanted = frame_count * 2
+        with self._lock:
+            data = b""
+            if self._playing is not None:
+                data = self._playing[self._position:self._position + wanted]
+                self._position += len(data)
+                if self._position >= len(self._playing):
+                    self._playing = None
+        return data + bytes(wanted - len(data)), CUE_CONTINUE
+
+    def play(self, name):
+        """Start cue `name`, replacing any cue still playing. False if it can't be played."""
+        pcm = self.cues.get(name)
+        if pcm is None or self._stream is None:
+            return False
+        with self._lock:
+            self._playing = pcm
+            self._position = 0
+        self.echo_until = time.monotonic() + len(pcm) / (2.0 * CUE_RATE) + CUE_ECHO_TAIL
+        self.plays[name] = self.plays.get(name, 0) + 1
+        logger.debug("Playing %s cue", name)
+        return True
+
+    def echo_in(self, seconds):
+        """True if audio captured over the last `seconds` may contain a cue."""
+        if not host_platform.hears_own_output:
+            return False
+        return time.monotonic() - seconds < self.echo_until
+
+audio_cues = AudioCuePlayer()
+
+def play_cue(name):
+    try:
+        if not audio_cues.play(name) and name == "wake":
+            host_platform.play_beep(environment.get("beep_path"))
     except Exception as e:
-        logger.exception("Active listen session error")
-        vocalise("Error processing command. Switching back to wake word mode.")
+        logger.exception("Error playing %s cue", name)
+
+def handle_utterance(recognizer, audio, room, interaction, request, flight_seq=None):
+    """Recognize one captured utterance and act on it for `room`.
 
-def play_beep():
+    `request` is the follow-up that was open when capture began. Shared by
+    the local microphone loop and the multi-room server. Returns False when
+    handling failed so the caller can back off.
+    """
+    dialog = room.dialog
+    wake = False
+    dispatched = False
+    interaction.room = room
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        beep_file = os.path.join(current_dir, "WAKEBEEP.m4a")
-        if os.name == 'nt':
-            command_open = f'open "{beep_file}" alias wakebeep'
-            command_play = "play wakebeep from 0"
-            command_close = "close wakebeep"
-            ctypes.windll.winmm.mciSendStringW(command_open, None, 0, None)
-            ctypes.windll.winmm.mciSendStringW(command_play, None, 0, None)
-            threading.Timer(2, lambda: ctypes.windll.winmm.mciSendStringW(command_close, None, 0, None)).start()
+        if request is None and dialog.pending() is not None:
+            # A queued action asked its question while this utterance was being captured
+            request = dialog.pending()
+            interaction = begin_interaction(request.interaction)
+        if request and request.grammar:
+            hypotheses = [(recognize_constrained(recognizer, audio, request.grammar), None)]
+            hypotheses = [h for h in hypotheses if h[0]]
         else:
-            print('\a')
+            hypotheses = recognize_hypotheses(recognizer, audio)
+        if not hypotheses:
+            room.tuner.observe("empty")
+            flight_recorder.tag(flight_seq, decision="empty")
+            return True
+        if not room.remote:
+            power_manager.touch()
+        if request:
+            # Only a clear wake word interrupts a question; alternatives are answers
+            text, score = hypotheses[0]
+            wake, command_candidate = check_for_wake(text)
+        else:
+            text, command_candidate, score = route_hypotheses(hypotheses, wake=True)
+            wake = bool(text)
+        if not wake:
+            flight_recorder.tag(flight_seq, decision="no_wake", transcript=hypotheses[0][0], confidence=hypotheses[0][1])
+        if wake:
+            if request:
+                # A fresh wake word abandons the question and starts over
+                dialog.cancel()
+                interaction = begin_interaction()
+                interaction.room = room
+            interaction.wake_time = time.time()
+            interaction.transcript = text
+            interaction.confidence = score
+            interaction.flight_seq = flight_seq
+            flight_recorder.tag(flight_seq, decision="wake", transcript=text, confidence=score)
+            logger.info(f"Wake word detected - command candidate: {command_candidate}")
+            room.cue("wake")
+            if command_candidate and dispatch_segment(command_candidate, recognizer):
+                dispatched = interaction.result == "dispatched"
+            else:
+                interaction.result = "pending"
+                dialog.ask(command_slot(recognizer))
+        elif request and dialog.take() is request:
+            text, _, score = route_hypotheses(hypotheses, route=request.slot == "command")
+            interaction.confidence = score
+            interaction.flight_seq = flight_seq
+            flight_recorder.tag(flight_seq, decision="answer", slot=request.slot, transcript=text, confidence=score)
+            if action_executor.submit("dialog", dialog.fill, request, text, interaction=interaction) is None:
+                vocalise("I am still busy with earlier commands.")
+                finish_interaction(interaction, "busy")
+    except sr.UnknownValueError:
+        pass
     except Exception as e:
-        logger.exception("Error playing beep")
+        interaction.result = "error"
+        logger.exception("Critical listening error")
+        if request or wake:
+            dialog.cancel()
+            room.cue("error")
+            vocalise("Error processing command. Switching back to wake word mode.")
+        return False
+    finally:
+        end_interaction()
+        # Only utterances that woke the assistant are worth keeping; ones
+        # handed to the executor or waiting on a follow-up are recorded
+        # when that work ends
+        if wake and not dispatched and not dialog.waiting_on(interaction):
+            finish_interaction(interaction)
+    return True
 
 def listen_for_commands():
-    recognizer = sr.Recognizer()
-    recognizer.energy_threshold = 4000  # Increased sensitivity
-    recognizer.dynamic_energy_threshold = True
+    recognizer = new_recognizer()
+    recognizer_tuner.load(default_input_device_name())
+    if not recognizer_tuner.calibrated:
+        # First run on this device: one ambient calibration, then tuned from outcomes
+        with mic_lock:
+            with host_platform.microphone() as source:
+                recognizer_tuner.calibrate(recognizer, source)
     logger.info("----- Starting listening session -----")
     
     while not exit_event.is_set():
+        # An open follow-up question owns the next utterance and its interaction
+        request = dialog_manager.pending()
+        interaction = begin_interaction(request.interaction if request else None)
+        recognizer_tuner.apply(recognizer)
+        timeout, phrase_time_limit = recognizer_tuner.limits("command" if request else "wake")
+        policy = POWER_MODES[power_manager.mode(dialog_open=request is not None)]
+        audio = None
         try:
-            with mic_lock:
-                with sr.Microphone() as source:
-                    recognizer.adjust_for_ambient_noise(source, duration=1)
-                    audio = recognizer.listen(source, timeout=5, phrase_time_limit=7)
-            text = recognize_audio(recognizer, audio).upper().strip()
-            wake, command_candidate = check_for_wake(text)
-            if wake:
-                logger.info(f"Wake word detected - command candidate: {command_candidate}")
-                play_beep()
-                if command_candidate:
-                    if not process_segment(command_candidate, recognizer):
-                        active_listen_session(recognizer)
-                else:
-                    active_listen_session(recognizer)
-        except (sr.WaitTimeoutError, sr.UnknownValueError):
+            with interaction.stage("capture"):
+                with mic_lock:
+                    with host_platform.microphone() as source:
+                        preroll = b""
+                        if policy["gate_chunk"]:
+                            preroll = energy_gate(source, policy["gate_chunk"], policy["gate_timeout"])
+                            if preroll is None:
+                                continue
+                        audio = listen_with_vad(recognizer, source, timeout=timeout, phrase_time_limit=phrase_time_limit,
+                                                preroll=preroll)
+        except sr.WaitTimeoutError:
             continue
         except Exception as e:
             logger.exception("Critical listening error")
+            if request:
+                dialog_manager.cancel()
+                vocalise("Error processing command. Switching back to wake word mode.")
+            time.sleep(1)
+            continue
+        finally:
+            if audio is None:
+                end_interaction()
+        flight_seq = flight_recorder.record(audio, {"decision": "captured"})
+        # Onset time from the VAD, on the same clock as last_speech_end; the
+        # recognizer.listen fallback only has the clip length to go on
+        started = getattr(audio, "speech_started", None)
+        if started is None:
+            started = time.monotonic() - len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+        if overlaps_own_speech(started):
+            logger.info("Ignoring audio that overlapped a spoken response")
+            flight_recorder.tag(flight_seq, decision="own_speech")
+            end_interaction()
+            continue
+        if not handle_utterance(recognizer, audio, local_room, interaction, request, flight_seq):
             time.sleep(1)
     logger.info("Exiting listening loop.")
 
+# Multi-room server: capture clients stream audio to one assistant over a socket
+# Loopback by default; set "server_host" to "0.0.0.0" (or a LAN address) in
+# the config to take rooms on other machines. The protocol has no
+# authentication or encryption, so only do that on a trusted network.
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 47800
+SERVER_WORKERS = 8             # utterances recognized and routed at once, across rooms
+SERVER_MAX_CLIENTS = 64
+SERVER_ROOM_BACKLOG = 3        # utterances queued per room before the oldest is dropped
+SERVER_MAX_MESSAGE = 1 << 20
+SERVER_MESSAGE = struct.Struct("<cI")   # message type, payload length
+MSG_HELLO = b"H"               # client -> server: {"room", "rate", "width"}
+MSG_AUDIO = b"A"               # client -> server: raw little-endian PCM
+MSG_SAY = b"S"                 # server -> client: {"text"}
+MSG_CUE = b"C"                 # server -> client: {"cue"}
+
+class RemoteRoom(Room):
+    """A capture client: its own VAD, recognizer, tuning, backlog and follow-up dialog.
+
+    Tuning is saved in the config under "room:<name>", next to the local
+    input devices, so a client that reconnects under its name keeps it.
+    """
+
+    remote = True
+
+    def __init__(self, name, server, writer, sample_rate, sample_width):
+        super().__init__(name, DialogManager())
+        self.server = server
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.recognizer = new_recognizer()
+        self.tuner = RecognizerTuner()
+        self.tuner.load(f"room:{name}")
+        self.backlog = deque()
+        self.scheduled = False
+        self.utterances = 0
+        self.dropped = 0
+        self.vad = self._new_vad()
+
+    def _new_vad(self, noise_floor_db=None):
+        return VoiceActivityDetector(self.sample_rate, self.sample_width, noise_floor_db=noise_floor_db,
+                                     margin_db=self.tuner.values["energy_margin_db"],
+                                     hangover_ms=self.tuner.values["hangover_ms"])
+
+    def feed(self, chunk):
+        """Feed streamed PCM; returns AudioData once an utterance has ended. Runs off the event loop."""
+        self.vad.feed(chunk)
+        phrase_time_limit = self.tuner.limits("wake")[1]
+        if not self.vad.ended:
+            if not (phrase_time_limit and self.vad.speech_seconds() > phrase_time_limit):
+                return None
+            self.tuner.observe("clipped")
+        audio = sr.AudioData(self.vad.segment_bytes(), self.sample_rate, self.sample_width)
+        audio.noise_floor_db = self.vad.noise_floor_db
+        self.vad = self._new_vad(self.vad.noise_floor_db)
+        self.utterances += 1
+        return audio
+
+    def send(self, kind, message):
+        payload = json.dumps(message).encode("utf-8")
+        self.server.loop.call_soon_threadsafe(self._write, kind, payload)
+
+    def _write(self, kind, payload):
+        if not self.writer.is_closing():
+            self.writer.write(SERVER_MESSAGE.pack(kind, len(payload)) + payload)
+
+    def say(self, message):
+        self.send(MSG_SAY, {"text": message})
+
+    def cue(self, name):
+        self.send(MSG_CUE, {"cue": name})
+
+class AssistantServer:
+    """asyncio front end that gives every connected capture client its own room.
+
+    The event loop only parses messages; each room's VAD runs on a thread
+    pool, one chunk at a time in arrival order, so a busy client can't
+    delay reads for the others. Finished utterances queue per room, and workers take rooms round-robin, one
+    utterance per turn, so a busy room can't starve a quiet one and a room's
+    own utterances are handled in order. Recognition and routing run on a
+    thread pool through handle_utterance, the same path as the local
+    microphone; actions, timers and the executor stay shared.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.rooms = {}
+        self.loop = None
+        self.stats = {"connections": 0, "utterances": 0, "dropped": 0}
+        self._ready = None
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="room")
+        self._vad_pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="room-vad")
+
+    def run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            logger.exception("Room server failed")
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._ready = asyncio.Queue()
+        server = await asyncio.start_server(self._client, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]  # the port actually bound when 0 was asked for
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("Room server listening on %s:%d", self.host, self.port)
+        async with server:
+            while not exit_event.is_set():
+                await asyncio.sleep(0.5)
+        for worker in workers:
+            worker.cancel()
+        self._pool.shutdown(wait=False)
+        self._vad_pool.shutdown(wait=False)
+        logger.info("Room server stats: %s", self.stats)
+
+    async def _read(self, reader):
+        kind, length = SERVER_MESSAGE.unpack(await reader.readexactly(SERVER_MESSAGE.size))
+        if length > SERVER_MAX_MESSAGE:
+            raise ValueError(f"message of {length} bytes is too large")
+        return kind, await reader.readexactly(length)
+
+    async def _client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        room = None
+        try:
+            kind, payload = await self._read(reader)
+            if kind != MSG_HELLO or len(self.rooms) >= SERVER_MAX_CLIENTS:
+                logger.warning("Refusing room connection from %s", peer)
+                return
+            hello = json.loads(payload)
+            name = str(hello.get("room") or f"room-{self.stats['connections']}")
+            if name in self.rooms:
+                name = f"{name}-{self.stats['connections']}"
+            room = RemoteRoom(name, self, writer, int(hello.get("rate", 16000)), int(hello.get("width", 2)))
+            self.rooms[name] = room
+            self.stats["connections"] += 1
+            logger.info("Room %s connected from %s", name, peer)
+            while True:
+                kind, payload = await self._read(reader)
+                if kind != MSG_AUDIO:
+                    continue
+                audio = await self.loop.run_in_executor(self._vad_pool, room.feed, payload)
+                if audio is not None:
+                    self._enqueue(room, audio)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.exception("Room connection from %s failed", peer)
+        finally:
+            if room is not None:
+                self.rooms.pop(room.name, None)
+                room.dialog.close()
+                logger.info("Room %s disconnected after %d utterances (%d dropped)",
+                            room.name, room.utterances, room.dropped)
+            writer.close()
+
+    def _enqueue(self, room, audio):
+        room.backlog.append(audio)
+        self.stats["utterances"] += 1
+        if len(room.backlog) > SERVER_ROOM_BACKLOG:
+            room.backlog.popleft()
+            room.dropped += 1
+            self.stats["dropped"] += 1
+            logger.warning("Room %s is falling behind; dropped its oldest utterance", room.name)
+        if not room.scheduled:
+            room.scheduled = True
+            self._ready.put_nowait(room)
+
+    async def _worker(self):
+        while True:
+            room = await self._ready.get()
+            audio = room.backlog.popleft()
+            try:
+                await self.loop.run_in_executor(self._pool, self.handle, room, audio)
+            except Exception as e:
+                logger.exception("Room %s utterance failed", room.name)
+            # Back of the line, so every waiting room gets a turn first
+            if room.backlog and room.name in self.rooms:
+                self._ready.put_nowait(room)
+            else:
+                room.scheduled = False
+
+    def handle(self, room, audio):
+        request = room.dialog.pending()
+        interaction = begin_interaction(request.interaction if request else None)
+        flight_seq = flight_recorder.record(audio, {"decision": "captured", "room": room.name})
+        handle_utterance(room.recognizer, audio, room, interaction, request, flight_seq)
+
+assistant_server = AssistantServer(host=config.get("server_host", SERVER_HOST),
+                                   port=config.get("server_port", SERVER_PORT))
+
 def hotkey_exit():
     vocalise("Exiting program via hotkey. Goodbye!")
-    keyboard.clear_all_hotkeys()
+    host_platform.clear_hotkeys()
     logger.info("Hotkey exit invoked. Terminating current process (PID: {}).".format(os.getpid()))
     exit_event.set()
 
+def hotkey_profile():
+    if not profiler.stop():
+        start_profiling()
+
 def main():
     logger.info("===== Application Started =====")
+    try:
+        audio_cues.load()
+        audio_cues.open()
+    except Exception as e:
+        logger.exception("Audio cues unavailable; falling back to the beep file")
     vocalise("Welcome sir")
     try:
-        listen_for_commands()
+        restore_clock_entries()
+    except Exception as e:
+        logger.exception("Failed to restore timers from journal")
+    if host_platform.name == "windows":
+        threading.Thread(target=watch_browser_choice, name="registry-watch", daemon=True).start()
+    if config.get("prewarm", True):
+        prewarmer.start()
+    if config.get("watchdog", True):
+        watchdog.start()
+    try:
+        flight_recorder.open(*host_platform.input_format())
+    except Exception as e:
+        logger.exception("Failed to open the flight recorder")
+    if "--server" in sys.argv or "--server-only" in sys.argv or config.get("server", False):
+        threading.Thread(target=assistant_server.run, name="room-server", daemon=True).start()
+    try:
+        if "--server-only" in sys.argv:
+            exit_event.wait()
+        else:
+            listen_for_commands()
     except Exception as e:
         logger.exception("Fatal error in main loop")
+        prewarmer.stop()
+        watchdog.stop()
+        interaction_history.close()
         sys.exit(1)
+    prewarmer.stop()
+    watchdog.stop()
+    flight_recorder.close()
+    audio_cues.close()
+    power_manager.report()
+    logger.info("Action executor stats: %s", action_executor.stats())
+    logger.info("Recognition backend stats: %s", recognition_dispatcher.stats())
+    interaction_history.close()
     sys.exit(0)
 
 def is_admin():
     try:
-        return ctypes.windll.shell32.IsUserAnAdmin()
+        return host_platform.is_admin()
     except Exception as e:
         logger.exception("Admin check failed")
         return False
 
 def add_to_startup():
-    if os.name != 'nt':
-        return
     try:
-        import winreg
-        startup_key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Run"
         script_path = os.path.abspath(sys.argv[0])
-        command = f'"{sys.executable}" "{script_path}"'
-        try:
-            registry_key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, startup_key_path, 0, winreg.KEY_WRITE)
-        except Exception:
-            registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, startup_key_path, 0, winreg.KEY_WRITE)
-        winreg.SetValueEx(registry_key, "LUCIFER", 0, winreg.REG_SZ, command)
-        winreg.CloseKey(registry_key)
+        host_platform.add_to_startup(f'"{sys.executable}" "{script_path}"')
         logger.info("Added program to startup registry key.")
     except Exception as e:
         logger.exception("Failed to add program to startup")
 
 if __name__ == "__main__":
-    if os.name == 'nt':
+    if host_platform.name == "windows":
         if not is_admin():
             try:
-                ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, " ".join(sys.argv), None, 1)
+                host_platform.run_as_admin()
             except Exception as e:
                 logger.exception("Failed to elevate privileges")
             os._exit(0)
@@ -1282,12 +5311,14 @@ if __name__ == "__main__":
             except Exception as e:
                 logger.exception("Error terminating previous instance")
         try:
-            whnd = ctypes.windll.kernel32.GetConsoleWindow()
-            if whnd:
-                ctypes.windll.user32.ShowWindow(whnd, 0)
+            host_platform.hide_console()
         except Exception as e:
             logger.exception("Error hiding console window")
             print("Error hiding console window:", e)
         add_to_startup()
-    keyboard.add_hotkey('ctrl+alt+q', hotkey_exit, suppress=True)
+    try:
+        host_platform.add_hotkey('ctrl+alt+q', hotkey_exit)
+        host_platform.add_hotkey('ctrl+alt+p', hotkey_profile)
+    except Exception as e:
+        logger.warning("Exit hotkey unavailable: %s", e)
     main()
@@ -0,0 +1,205 @@
+"""Capture client and load generator for LUCIFER.py's multi-room server.
+
+Start the assistant with `python LUCIFER.py --server` (or --server-only), then:
+    python lucifer_client.py mic --room kitchen
+    python lucifer_client.py replay time.wav volume.wav --clients 24 --repeat 5
+
+`mic` streams this machine's microphone and speaks the replies. `replay`
+opens many rooms at once, streams mono 16-bit WAV files into each at real
+time (or --speed times faster) and reports reply latency and fairness.
+"""
+import sys
+import json
+import time
+import wave
+import random
+import struct
+import asyncio
+import argparse
+import collections
+
+# Must match the SERVER_* and MSG_* constants in LUCIFER.py (use --host for a
+# server that listens beyond loopback)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 47800
+SERVER_MESSAGE = struct.Struct("<cI")
+MSG_HELLO = b"H"
+MSG_AUDIO = b"A"
+MSG_SAY = b"S"
+MSG_CUE = b"C"
+
+CHUNK_FRAMES = 1024
+GAP_SECONDS = 1.5          # low-level noise streamed between utterances so the VAD can end them
+REPLY_TIMEOUT = 15.0       # seconds to wait for the last replies after streaming ends
+
+def message(kind, payload):
+    return SERVER_MESSAGE.pack(kind, len(payload)) + payload
+
+async def read_message(reader):
+    kind, length = SERVER_MESSAGE.unpack(await reader.readexactly(SERVER_MESSAGE.size))
+    return kind, json.loads(await reader.readexactly(length))
+
+async def connect(host, port, room, rate, width):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(message(MSG_HELLO, json.dumps({"room": room, "rate": rate, "width": width}).encode("utf-8")))
+    await writer.drain()
+    return reader, writer
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1:
+            raise SystemExit(f"{path}: only mono WAV files are supported")
+        return wav.getframerate(), wav.getsampwidth(), wav.readframes(wav.getnframes())
+
+def noise(frames, width, rng):
+    """Quiet random PCM; digital silence would give the VAD no noise floor to track."""
+    if width != 2:
+        return bytes(frames * width)
+    return struct.pack(f"<{frames}h", *(rng.randint(-12, 12) for _ in range(frames)))
+
+class ReplayClient:
+    """One simulated room: streams utterances and times the replies to each."""
+
+    def __init__(self, name, clips, repeat, speed, rng):
+        self.name = name
+        self.clips = clips
+        self.repeat = repeat
+        self.speed = speed
+        self.rng = rng
+        self.sent = 0
+        self.cue_latencies = []
+        self.say_latencies = []
+        # A room's utterances are answered in order, so replies match the oldest unanswered one
+        self._unanswered = {MSG_CUE: collections.deque(), MSG_SAY: collections.deque()}
+
+    async def _stream(self, writer, pcm, rate, width):
+        chunk_bytes = CHUNK_FRAMES * width
+        for start in range(0, len(pcm), chunk_bytes):
+            writer.write(message(MSG_AUDIO, pcm[start:start + chunk_bytes]))
+            await writer.drain()
+            if self.speed:
+                await asyncio.sleep(CHUNK_FRAMES / float(rate) / self.speed)
+
+    async def _receive(self, reader):
+        try:
+            while True:
+                kind, _ = await read_message(reader)
+                # Only the first cue and first reply to each utterance count
+                unanswered = self._unanswered.get(kind)
+                if not unanswered:
+                    continue
+                latency = time.perf_counter() - unanswered.popleft()
+                (self.cue_latencies if kind == MSG_CUE else self.say_latencies).append(latency)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def run(self, host, port):
+        rate, width = self.clips[0][0], self.clips[0][1]
+        reader, writer = await connect(host, port, self.name, rate, width)
+        receiver = asyncio.create_task(self._receive(reader))
+        gap = noise(int(GAP_SECONDS * rate), width, self.rng)
+        # Stagger starts so rooms don't all speak in lockstep
+        await asyncio.sleep(self.rng.random() * GAP_SECONDS / max(self.speed, 1))
+        for _ in range(self.repeat):
+            for clip_rate, clip_width, pcm in self.clips:
+                await self._stream(writer, gap[:len(gap) // 2], rate, width)
+                await self._stream(writer, pcm, rate, width)
+                self.sent += 1
+                ended = time.perf_counter()
+                for unanswered in self._unanswered.values():
+                    unanswered.append(ended)
+                await self._stream(writer, gap, rate, width)
+        deadline = time.perf_counter() + REPLY_TIMEOUT
+        while len(self.say_latencies) < self.sent and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        receiver.cancel()
+        writer.close()
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def report(clients, elapsed):
+    sent = sum(c.sent for c in clients)
+    for label, attr in (("wake cue", "cue_latencies"), ("first reply", "say_latencies")):
+        values = [v * 1000 for c in clients for v in getattr(c, attr)]
+        print(f"{label:>12}: {len(values)}/{sent} answered, p50 {percentile(values, 0.5):.0f} ms, "
+              f"p95 {percentile(values, 0.95):.0f} ms, max {max(values, default=float('nan')):.0f} ms")
+    replies = [len(c.say_latencies) for c in clients]
+    print(f"{len(clients)} rooms, {sent} utterances in {elapsed:.1f} s; replies per room min {min(replies)}, max {max(replies)}")
+
+async def replay(args):
+    clips = [load_wav(path) for path in args.wav]
+    if len({(rate, width) for rate, width, _ in clips}) != 1:
+        raise SystemExit("all WAV files must share one sample rate and width")
+    clients = [ReplayClient(f"{args.room}-{i}", clips, args.repeat, args.speed, random.Random(i))
+               for i in range(args.clients)]
+    started = time.perf_counter()
+    await asyncio.gather(*(c.run(args.host, args.port) for c in clients))
+    report(clients, time.perf_counter() - started)
+
+async def microphone(args):
+    import speech_recognition as sr
+    try:
+        import pyttsx3
+        engine = pyttsx3.init()
+    except Exception:
+        engine = None
+    loop = asyncio.get_running_loop()
+    with sr.Microphone() as source:
+        reader, writer = await connect(args.host, args.port, args.room, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        speaking = asyncio.Event()
+
+        async def receive():
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == MSG_CUE:
+                    print("\a", end="", flush=True)
+                elif kind == MSG_SAY:
+                    print("[Voice]:", payload["text"])
+                    if engine is not None:
+                        # Stop streaming while speaking so the reply isn't heard as a command
+                        speaking.set()
+                        engine.say(payload["text"])
+                        await loop.run_in_executor(None, engine.runAndWait)
+                        speaking.clear()
+
+        receiver = asyncio.create_task(receive())
+        silence = bytes(source.CHUNK * source.SAMPLE_WIDTH)
+        try:
+            while not receiver.done():
+                chunk = await loop.run_in_executor(None, source.stream.read, source.CHUNK)
+                writer.write(message(MSG_AUDIO, silence if speaking.is_set() else chunk))
+                await writer.drain()
+        finally:
+            receiver.cancel()
+            writer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture client and load generator for Lucifer's room server.")
+    parser.add_argument("mode", choices=["mic", "replay"])
+    parser.add_argument("wav", nargs="*", help="mono WAV files to replay")
+    parser.add_argument("--room", default=None, help="room name (replay: prefix, default 'load')")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent rooms to simulate (replay)")
+    parser.add_argument("--repeat", type=int, default=3, help="times each room replays the files (replay)")
+    parser.add_argument("--speed", type=float, default=1.0, help="stream pacing; 1 is real time, 0 is unpaced (replay)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args(argv)
+    if args.mode == "replay":
+        if not args.wav:
+            parser.error("replay needs at least one WAV file")
+        args.room = args.room or "load"
+        asyncio.run(replay(args))
+    else:
+        args.room = args.room or "remote"
+        try:
+            asyncio.run(microphone(args))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""List and dump the audio kept by LUCIFER.py's flight recorder.
+
+Enable recording with "flight_recorder_minutes" in the config. Examples:
+    python lucifer_flight.py list
+    python lucifer_flight.py dump --last 5
+    python lucifer_flight.py dump --decision no_wake --out misfires
+    python lucifer_flight.py dump --seq 120 121
+"""
+import os
+import sys
+import json
+import wave
+import mmap
+import struct
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Must match the FLIGHT_* constants in LUCIFER.py
+FLIGHT_RECORDER_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_flight.ring"
+FLIGHT_MAGIC = b"LUCFLT01"
+FLIGHT_HEADER = struct.Struct("<8sQIQQ")
+FLIGHT_HEADER_SIZE = 64
+FLIGHT_ENTRY = struct.Struct("<QQIIHdH")
+FLIGHT_SLOT_SIZE = 256
+
+def read_segments(data):
+    """Return (header, segments) where each segment is a dict with its tag and PCM audio."""
+    magic, capacity, slots, written, next_seq = FLIGHT_HEADER.unpack_from(data, 0)
+    if magic != FLIGHT_MAGIC:
+        raise ValueError("not a flight recorder file")
+    data_start = FLIGHT_HEADER_SIZE + slots * FLIGHT_SLOT_SIZE
+    segments = []
+    for seq in range(max(1, next_seq - slots), next_seq):
+        offset = FLIGHT_HEADER_SIZE + (seq % slots) * FLIGHT_SLOT_SIZE
+        entry_seq, stream_offset, length, rate, width, recorded, tag_length = FLIGHT_ENTRY.unpack_from(data, offset)
+        if entry_seq != seq or written - stream_offset > capacity:
+            continue
+        tag_start = offset + FLIGHT_ENTRY.size
+        position = stream_offset % capacity
+        first = min(length, capacity - position)
+        pcm = data[data_start + position:data_start + position + first] + data[data_start:data_start + length - first]
+        try:
+            tag = json.loads(data[tag_start:tag_start + tag_length].decode("utf-8") or "{}")
+        except ValueError:
+            tag = {"decision": "unreadable"}
+        segments.append(dict(tag, seq=seq, time=recorded, rate=rate, width=width, pcm=pcm))
+    return {"capacity": capacity, "written": written}, segments
+
+def select(segments, args):
+    if args.seq:
+        segments = [s for s in segments if s["seq"] in args.seq]
+    if args.decision:
+        segments = [s for s in segments if s.get("decision") == args.decision]
+    return segments[-args.last:] if args.last else segments
+
+def write_wav(path, segment):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(segment["width"])
+        wav.setframerate(segment["rate"])
+        wav.writeframes(segment["pcm"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or dump Lucifer's flight recorder.")
+    parser.add_argument("command", choices=["list", "dump"])
+    parser.add_argument("--last", type=int, default=0, help="only the newest N segments")
+    parser.add_argument("--seq", type=int, nargs="+", help="only these sequence numbers")
+    parser.add_argument("--decision", help="only segments with this decision (wake, no_wake, answer, empty, own_speech)")
+    parser.add_argument("--out", default="flight", help="directory for dumped WAV files (default ./flight)")
+    parser.add_argument("--file", default=str(FLIGHT_RECORDER_FILE))
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.file):
+        print("No flight recorder file at", args.file)
+        return 1
+    with open(args.file, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header, segments = read_segments(data)
+        finally:
+            data.close()
+    segments = select(segments, args)
+    if args.command == "list":
+        print(f"{len(segments)} segments, ring of {header['capacity'] / 1048576:.1f} MB")
+        for s in segments:
+            seconds = len(s["pcm"]) / float(s["rate"] * s["width"])
+            print(f"  {s['seq']:>6}  {datetime.fromtimestamp(s['time']):%Y-%m-%d %H:%M:%S}  {seconds:5.1f} s  "
+                  f"{s.get('decision', ''):<10} {s.get('intent') or '':<14} {s.get('transcript', '')}")
+        return 0
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    with open(out / "index.jsonl", "a", encoding="utf-8") as index:
+        for s in segments:
+            name = f"{datetime.fromtimestamp(s['time']):%Y%m%d-%H%M%S}-{s['seq']:06d}-{s.get('decision', 'captured')}.wav"
+            write_wav(out / name, s)
+            index.write(json.dumps(dict({k: v for k, v in s.items() if k != "pcm"}, file=name)) + "\n")
+            print("Wrote", out / name)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Query the interaction history recorded by LUCIFER.py.
+
+Examples:
+    python lucifer_history.py slowest --days 7
+    python lucifer_history.py unrecognized --days 30
+    python lucifer_history.py false-wakes --days 1
+    python lucifer_history.py recent --limit 20
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Must match HISTORY_DB_FILE in LUCIFER.py
+HISTORY_DB_FILE = Path(os.path.expanduser("~")) / ".voice_assistant_history.db"
+
+QUERIES = {
+    "slowest": (
+        "Slowest intents",
+        """SELECT intent, COUNT(*) AS n, ROUND(AVG(total_ms)) AS avg_ms, ROUND(MAX(total_ms)) AS max_ms,
+                  ROUND(AVG(dialog_ms)) AS avg_dialog_ms,
+                  ROUND(AVG(recognize_ms)) AS avg_recognize_ms, ROUND(AVG(action_ms)) AS avg_action_ms
+           FROM interactions WHERE wake_time >= ? AND intent IS NOT NULL
+           GROUP BY intent ORDER BY avg_ms DESC LIMIT ?""",
+    ),
+    "unrecognized": (
+        "Most common unrecognized phrases",
+        """SELECT transcript, COUNT(*) AS n, datetime(MAX(wake_time), 'unixepoch', 'localtime') AS last_heard
+           FROM interactions WHERE wake_time >= ? AND intent IS NULL AND transcript != ''
+           GROUP BY transcript ORDER BY n DESC LIMIT ?""",
+    ),
+    # A false wake woke the assistant but never got a command: nothing usable
+    # followed the wake word, or the follow-up prompt went unanswered. Busy,
+    # cancelled and superseded interactions are not the wake word's fault.
+    "false-wakes": (
+        "False wakes per hour",
+        """SELECT strftime('%Y-%m-%d %H:00', wake_time, 'unixepoch', 'localtime') AS hour, COUNT(*) AS n
+           FROM interactions WHERE wake_time >= ? AND intent IS NULL AND result IN ('unrecognized', 'timeout')
+           GROUP BY hour ORDER BY hour DESC LIMIT ?""",
+    ),
+    "recent": (
+        "Recent interactions",
+        """SELECT datetime(wake_time, 'unixepoch', 'localtime') AS at, transcript, intent, result,
+                  ROUND(total_ms) AS total_ms
+           FROM interactions WHERE wake_time >= ? ORDER BY wake_time DESC LIMIT ?""",
+    ),
+}
+
+def print_table(title, cursor):
+    columns = [d[0] for d in cursor.description]
+    rows = [["" if v is None else str(v) for v in row] for row in cursor.fetchall()]
+    print(title)
+    if not rows:
+        print("  (no data)")
+        return
+    widths = [max(len(c), *(len(r[i]) for r in rows)) for i, c in enumerate(columns)]
+    print("  " + "  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  " + "  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query Lucifer's interaction history.")
+    parser.add_argument("query", choices=sorted(QUERIES))
+    parser.add_argument("--days", type=float, default=7, help="look back this many days (default 7)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--db", default=str(HISTORY_DB_FILE))
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print("No history database at", args.db)
+        return 1
+    title, sql = QUERIES[args.query]
+    since = time.time() - args.days * 86400
+    conn = sqlite3.connect(args.db)
+    try:
+        print_table(f"{title} since {datetime.fromtimestamp(since):%Y-%m-%d %H:%M}", conn.execute(sql, (since, args.limit)))
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
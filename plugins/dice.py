@@ -0,0 +1,24 @@
+"""Example command plugin: coin flips and dice rolls.
+
+LUCIFER.py reads INTENTS and SLOTS from this file at startup without
+importing it; the module is only imported the first time one of these
+phrases is heard.
+"""
+import random
+
+import LUCIFER as lucifer
+
+INTENTS = {
+    "flip_coin": ["FLIP A COIN", "TOSS A COIN", "HEADS OR TAILS"],
+    "roll_dice": ["ROLL A {sides} SIDED DIE", "ROLL A DIE", "ROLL THE DICE", "ROLL A DICE"],
+}
+SLOTS = {"sides": "number of sides, as digits or words"}
+
+def handle_flip_coin(segment, recognizer):
+    lucifer.vocalise(f"It's {random.choice(['heads', 'tails'])}.")
+
+def handle_roll_dice(segment, recognizer, sides=None):
+    count = 6
+    if sides:
+        count = int(sides) if sides.isdigit() else lucifer.words_to_number(sides) or 6
+    lucifer.vocalise(f"You rolled a {random.randint(1, max(2, count))}.")
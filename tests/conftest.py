@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# LUCIFER.py picks its platform and reads ~/.voice_assistant_* at import, so
+# tests run on fake devices against a scratch home directory
+TEST_HOME = tempfile.mkdtemp(prefix="lucifer-test-home-")
+os.environ["HOME"] = TEST_HOME
+os.environ["USERPROFILE"] = TEST_HOME
+os.environ["LUCIFER_PLATFORM"] = "fake"
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+@pytest.fixture
+def spoken(monkeypatch):
+    """Collect what the assistant says instead of speaking it."""
+    import LUCIFER
+    messages = []
+    monkeypatch.setattr(LUCIFER, "vocalise", messages.append)
+    return messages
@@ -0,0 +1,48 @@
+import pytest
+
+import LUCIFER as lucifer
+
+psutil = lucifer.psutil
+
+@pytest.fixture
+def launcher(monkeypatch):
+    fake = lucifer.FakeAppLauncher(running={"notepad": 2})
+    monkeypatch.setattr(lucifer, "app_launcher", fake)
+    monkeypatch.setattr(lucifer, "app_list_cache", None)
+    return fake
+
+def test_open_and_close_go_through_the_launcher(launcher, spoken):
+    lucifer.open_app("notepad")
+    lucifer.close_app_by_name("notepad")
+    lucifer.close_app_by_name("notepad")
+    assert launcher.launched == ["Microsoft.WindowsNotepad"]
+    assert "notepad" in launcher.closed
+    assert spoken == ["Opening notepad.", "Closed notepad.", "notepad is not running."]
+
+class FakeProcess:
+    def __init__(self, pid, terminate_error=None, exits=True, kill_error=None):
+        self.pid = pid
+        self.terminate_error = terminate_error
+        self.exits = exits
+        self.kill_error = kill_error
+
+    def terminate(self):
+        if self.terminate_error:
+            raise self.terminate_error
+
+    def kill(self):
+        if self.kill_error:
+            raise self.kill_error
+
+def test_shell_close_counts_only_processes_it_ended(monkeypatch):
+    procs = [
+        FakeProcess(1),
+        FakeProcess(2, terminate_error=psutil.AccessDenied(2)),
+        FakeProcess(3, terminate_error=psutil.NoSuchProcess(3)),
+        FakeProcess(4, exits=False),
+        FakeProcess(5, exits=False, kill_error=psutil.AccessDenied(5)),
+    ]
+    monkeypatch.setattr(lucifer.ShellAppLauncher, "process_index", staticmethod(lambda: {"notepad": procs}))
+    monkeypatch.setattr(psutil, "wait_procs",
+                        lambda ps, timeout: ([p for p in ps if p.exits], [p for p in ps if not p.exits]))
+    assert lucifer.ShellAppLauncher().close(["notepad"]) == 2
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+import time
+
+import LUCIFER as lucifer
+
+def child(seconds):
+    return subprocess.Popen([sys.executable, "-c", f"import time; time.sleep({seconds})"])
+
+def test_close_counts_only_children_that_went(monkeypatch):
+    polite, stubborn, windowless = child(30), child(30), child(0.2)
+    manager = lucifer.ChildProcessManager()
+    for proc in (polite, stubborn, windowless):
+        manager.track(proc, "test")
+
+    def close_windows(targets):
+        # The stubborn child ignores WM_CLOSE; the windowless one has nothing to close
+        polite.terminate()
+        return {polite.pid, stubborn.pid}
+
+    monkeypatch.setattr(lucifer, "gracefully_close_windows", close_windows)
+    try:
+        started = time.monotonic()
+        assert manager.close(label="test", timeout=1.0) == 2
+        assert time.monotonic() - started >= 1.0
+        assert [pid for pid, _, _ in manager.list()] == [stubborn.pid]
+    finally:
+        for proc in (polite, stubborn, windowless):
+            proc.kill()
+            proc.wait()
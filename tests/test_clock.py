@@ -0,0 +1,70 @@
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import LUCIFER as lucifer
+
+@pytest.fixture
+def fake(monkeypatch):
+    """Launch clock pages on the fake platform, which records each launch."""
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    monkeypatch.setattr(lucifer, "resolve_browser_path", lambda: "/usr/bin/browser")
+    monkeypatch.setattr(lucifer.environment, "get", lambda name: "file:///clock.html")
+    return fake
+
+def test_clock_page_gets_the_absolute_deadline(fake):
+    ring_time = datetime.fromtimestamp(2000000000)
+    assert lucifer.open_clock_app(mode="TIMER", deadline=ring_time, keep_open=True) is True
+    [(action, uri)] = fake.actions
+    query = parse_qs(urlsplit(uri).query)
+    assert query["mode"] == ["timer"] and query["deadline"] == ["2000000000000"]
+
+def test_one_page_carries_every_entry(fake):
+    first, second = datetime.fromtimestamp(2000000000), datetime.fromtimestamp(2000000060)
+    assert lucifer.open_clock_page([(4, "TIMER", first), (7, "ALARM", second)]) is True
+    [(action, uri)] = fake.actions
+    query = parse_qs(urlsplit(uri).query)
+    assert query["entries"] == ["4:timer:2000000000000,7:alarm:2000000060000"]
+
+def test_dead_launcher_is_not_a_closed_page(monkeypatch):
+    # The launcher handed the page to a running browser and exited
+    entry = {"id": 3, "pid": 2 ** 22 + 1, "pid_started": 1.0}
+    monkeypatch.setattr(lucifer, "resolve_browser_path", lambda: "/usr/bin/browser")
+    monkeypatch.setattr(lucifer, "browser_running", lambda path: True)
+    assert lucifer.clock_page_alive(entry)
+    monkeypatch.setattr(lucifer, "browser_running", lambda path: False)
+    assert not lucifer.clock_page_alive(entry)
+    assert not lucifer.clock_page_alive({"id": 4})
+
+def test_reopen_skips_entries_that_fired_meanwhile(monkeypatch, tmp_path):
+    journal = lucifer.TimerJournal(tmp_path / "timers.jsonl")
+    journal.replay()
+    monkeypatch.setattr(lucifer, "timer_journal", journal)
+    opened = []
+    monkeypatch.setattr(lucifer, "open_clock_page", lambda entries: opened.append(entries) or True)
+    now = lucifer.time.time()
+    fired = journal.create("TIMER", now + 60)
+    pending = journal.create("ALARM", now + 120)
+    journal.fire(fired)
+    lucifer.reopen_clock_entries({fired, pending})
+    assert [[entry_id for entry_id, _, _ in entries] for entries in opened] == [[pending]]
+    journal.fire(pending)
+    assert lucifer.reopen_clock_entries({pending}) is None
+    assert len(opened) == 1
+
+def test_cancelling_timers_leaves_alarms_on_the_page(monkeypatch, tmp_path, fake):
+    journal = lucifer.TimerJournal(tmp_path / "timers.jsonl")
+    journal.replay()
+    monkeypatch.setattr(lucifer, "timer_journal", journal)
+    monkeypatch.setattr(lucifer.action_executor, "submit", lambda name, fn, *args, **kw: fn(*args))
+    monkeypatch.setattr(lucifer.process_manager, "close", lambda *a, **kw: pytest.fail("clock page closed by PID"))
+    now = lucifer.time.time()
+    timer = journal.create("TIMER", now + 60)
+    alarm = journal.create("ALARM", now + 120)
+    assert lucifer.cancel_clock_entries("TIMER") == 1
+    assert [entry["id"] for entry in journal.live_entries()] == [alarm]
+    [(action, uri)] = fake.actions
+    query = parse_qs(urlsplit(uri).query)
+    assert query["cancel"] == [str(timer)] and "entries" not in query
@@ -0,0 +1,29 @@
+import os
+import re
+
+import pytest
+
+from conftest import REPO_DIR
+
+@pytest.fixture(scope="module")
+def script():
+    with open(os.path.join(REPO_DIR, "CLOCK APP.html"), encoding="utf-8") as page:
+        html = page.read()
+    return html[html.index("<script>"):]
+
+def test_page_does_not_poll_every_second(script):
+    assert not re.search(r"setInterval\(\s*getTime", script)
+    assert "requestAnimationFrame(" in script
+
+def test_hidden_page_stops_rendering(script):
+    assert "addEventListener('visibilitychange'" in script
+    assert "cancelAnimationFrame(" in script
+
+def test_render_writes_only_changed_values(script):
+    body = script[script.index("function getTime()"):]
+    body = body[:body.index("\n  }\n")]
+    assert "$(" not in body
+    assert "setIfChanged(" in body
+
+def test_dials_are_inserted_in_one_write(script):
+    assert "insertAdjacentHTML('beforeend', html.join(''))" in script
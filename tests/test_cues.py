@@ -0,0 +1,35 @@
+import pytest
+
+import LUCIFER as lucifer
+
+@pytest.fixture
+def player(monkeypatch):
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    monkeypatch.setattr(lucifer, "CUE_DIR", "/nonexistent")
+    monkeypatch.setattr(lucifer.environment, "get", lambda name: None)
+    player = lucifer.AudioCuePlayer()
+    player.load()
+    player.open()
+    return player
+
+def test_missing_cue_files_fall_back_to_tones(player):
+    assert set(player.cues) == set(lucifer.CUE_TONES)
+    assert player.cues["alarm"] == lucifer.synthesize_cue(lucifer.CUE_TONES["alarm"])
+
+def test_callback_pads_the_last_buffer_and_then_plays_silence(player):
+    player.cues["confirm"] = b"\x01\x02" * 100
+    assert player.play("confirm")
+    chunks = [player._callback(None, 64, None, 0) for _ in range(3)]
+    assert all(flag == lucifer.CUE_CONTINUE for _, flag in chunks)
+    assert all(len(data) == 128 for data, _ in chunks)
+    assert b"".join(data for data, _ in chunks) == b"\x01\x02" * 100 + bytes(184)
+    assert player._callback(None, 64, None, 0)[0] == bytes(128)
+
+def test_echo_gating_applies_only_where_the_microphone_hears_the_speakers(player, monkeypatch):
+    player.play("wake")
+    assert not player.echo_in(0.05)
+    monkeypatch.setattr(lucifer.host_platform, "hears_own_output", True)
+    assert player.echo_in(0.05)
+    player.echo_until = lucifer.time.monotonic() - 1.0
+    assert not player.echo_in(0.05)
@@ -0,0 +1,154 @@
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import LUCIFER as lucifer
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Interactions the dialog finished, instead of writing them to the history."""
+    rows = []
+    monkeypatch.setattr(lucifer.interaction_history, "record", rows.append)
+    monkeypatch.setattr(lucifer.recognizer_tuner, "observe", lambda outcome: None)
+    return rows
+
+def ask(dialog, request, intent=None):
+    """Ask `request` from a woken interaction, as an action on the listen loop would."""
+    interaction = lucifer.begin_interaction()
+    interaction.wake_time = time.time()
+    interaction.intent = intent
+    try:
+        dialog.ask(request)
+    finally:
+        lucifer.end_interaction()
+    return interaction
+
+def test_answer_fills_the_open_slot(spoken, recorded):
+    dialog = lucifer.DialogManager()
+    answers = []
+    interaction = ask(dialog, lucifer.SlotRequest("volume_percent", "What volume?", answers.append), "set_volume")
+    request = dialog.take()
+    assert dialog.pending() is None
+    dialog.fill(request, "FORTY")
+    assert answers == ["FORTY"] and spoken == ["What volume?"]
+    assert recorded == [interaction] and interaction.result == "handled"
+
+def test_answer_that_matches_no_command_is_unrecognized(spoken, recorded):
+    # A wake word with nothing after it asks for the command
+    dialog = lucifer.DialogManager()
+    interaction = ask(dialog, lucifer.SlotRequest("command", "Yes?", lambda answer: None))
+    dialog.fill(dialog.take(), "BANANA")
+    assert interaction.result == "unrecognized"
+
+def test_unanswered_slot_expires(spoken, recorded):
+    dialog = lucifer.DialogManager()
+    interaction = ask(dialog, lucifer.SlotRequest("volume_percent", "What volume?", lambda answer: None,
+                                                  timeout=0.1, expired_message="Cancelled."), "set_volume")
+    deadline = time.monotonic() + 5
+    while not recorded:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert spoken == ["What volume?", "Cancelled."]
+    assert interaction.result == "timeout" and dialog.pending() is None
+
+def test_new_question_supersedes_the_open_one(spoken, recorded):
+    dialog = lucifer.DialogManager()
+    first = ask(dialog, lucifer.SlotRequest("volume_percent", "What volume?", lambda answer: None), "set_volume")
+    second = ask(dialog, lucifer.SlotRequest("app_name", "Which app?", lambda answer: None), "open_app")
+    assert recorded == [first] and first.result == "superseded"
+    assert dialog.pending().interaction is second
+
+def test_closing_a_dialog_stops_its_deadline_thread(spoken):
+    dialog = lucifer.DialogManager()
+    dialog.ask(lucifer.SlotRequest("number", "What volume?", lambda answer: None, timeout=60))
+    thread = dialog._scheduler._thread
+    assert thread.is_alive()
+    dialog.close()
+    assert not thread.is_alive()
+    assert dialog.pending() is None
+
+def test_questions_after_close_are_dropped(spoken):
+    dialog = lucifer.DialogManager()
+    dialog.close()
+    dialog.ask(lucifer.SlotRequest("number", "What volume?", lambda answer: None))
+    assert dialog.pending() is None
+    assert dialog._scheduler._thread is None
+    assert spoken == []
+
+def utterance(rate=16000):
+    """Room noise, speech-like syllables, then enough quiet to end the utterance; 16-bit PCM."""
+    noise = np.random.default_rng(0).normal(0, 30, int(rate * 2.2))
+    t = np.arange(int(rate * 0.15)) / rate
+    syllable = np.concatenate([12000 * np.sin(2 * np.pi * 180 * t), np.zeros(int(rate * 0.1))])
+    speech = np.tile(syllable, 4)
+    start = int(rate * 0.5)
+    noise[start:start + len(speech)] += speech
+    return noise.astype("<i2").tobytes()
+
+def send(sock, kind, payload):
+    sock.sendall(lucifer.SERVER_MESSAGE.pack(kind, len(payload)) + payload)
+
+def replies(sock, count, timeout=20):
+    """The first `count` spoken replies on `sock`, skipping cues."""
+    sock.settimeout(timeout)
+    stream = sock.makefile("rb")
+    said = []
+    while len(said) < count:
+        kind, length = lucifer.SERVER_MESSAGE.unpack(stream.read(lucifer.SERVER_MESSAGE.size))
+        message = json.loads(stream.read(length))
+        if kind == lucifer.MSG_SAY:
+            said.append(message["text"])
+    return said
+
+def test_interleaved_clients_are_both_served(monkeypatch):
+    heard = {"kitchen": 0, "office": 0}
+
+    def recognize(recognizer, audio):
+        # Each room's recognizer runs with that room's interaction current
+        room = lucifer.current_room().name
+        heard[room] += 1
+        return [(f"HEY LUCIFER SAY {room.upper()} {heard[room]}", 0.9)]
+
+    monkeypatch.setattr(lucifer, "recognize_hypotheses", recognize)
+    monkeypatch.setitem(lucifer.custom_commands, "SAY KITCHEN 1", "kitchen one")
+    monkeypatch.setitem(lucifer.custom_commands, "SAY KITCHEN 2", "kitchen two")
+    monkeypatch.setitem(lucifer.custom_commands, "SAY OFFICE 1", "office one")
+    monkeypatch.setitem(lucifer.custom_commands, "SAY OFFICE 2", "office two")
+    server = lucifer.AssistantServer(host="127.0.0.1", port=0, workers=2)
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while server.port == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    clients = {}
+    for name in heard:
+        clients[name] = socket.create_connection(("127.0.0.1", server.port))
+        send(clients[name], lucifer.MSG_HELLO, json.dumps({"room": name, "rate": 16000, "width": 2}).encode())
+    audio = utterance() * 2
+    chunk = 640  # 20 ms
+    for offset in range(0, len(audio), chunk):
+        for sock in clients.values():
+            send(sock, lucifer.MSG_AUDIO, audio[offset:offset + chunk])
+    try:
+        assert replies(clients["kitchen"], 2) == ["kitchen one", "kitchen two"]
+        assert replies(clients["office"], 2) == ["office one", "office two"]
+    finally:
+        for sock in clients.values():
+            sock.close()
+
+def test_remote_rooms_tune_separately_from_the_local_microphone(monkeypatch):
+    monkeypatch.setattr(lucifer, "save_config", lambda config: None)
+    monkeypatch.setitem(lucifer.config, "tuning", {"room:den": {"energy_margin_db": 15.0}})
+    local = dict(lucifer.recognizer_tuner.values)
+    room = lucifer.RemoteRoom("den", None, None, 16000, 2)
+    assert room.tuner.values["energy_margin_db"] == 15.0
+    assert room.vad.margin_db == 15.0
+    for _ in range(lucifer.TUNING_EVERY):
+        room.tuner.observe("false_wake")
+    assert room.tuner.values["energy_margin_db"] == 16.0
+    assert lucifer.recognizer_tuner.values == local
+    room.dialog.close()
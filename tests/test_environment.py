@@ -0,0 +1,25 @@
+import LUCIFER as lucifer
+
+def test_missing_values_are_looked_up_again_after_a_while(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(lucifer.time, "monotonic", lambda: clock[0])
+    found = []
+    resolver = lucifer.EnvironmentResolver()
+    resolver.register("brave_path", lambda: found[-1] if found else None, lambda value: value and True)
+    assert resolver.get("brave_path") is None
+    found.append("/opt/brave")
+    clock[0] += lucifer.ENV_NEGATIVE_TTL - 1
+    assert resolver.get("brave_path") is None
+    clock[0] += 2
+    assert resolver.get("brave_path") == "/opt/brave"
+
+def test_found_values_stay_cached_while_their_stamp_holds(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(lucifer.time, "monotonic", lambda: clock[0])
+    calls = []
+    resolver = lucifer.EnvironmentResolver()
+    resolver.register("clock_html", lambda: calls.append(1) or "/clock.html", lambda value: "same")
+    for _ in range(3):
+        assert resolver.get("clock_html") == "/clock.html"
+        clock[0] += lucifer.ENV_NEGATIVE_TTL * 2
+    assert len(calls) == 1
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import LUCIFER as lucifer
+
+def blocking(release, running, peak, lock):
+    def run():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(2)
+        with lock:
+            running[0] -= 1
+    return run
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_group_limit_holds_while_other_groups_run():
+    executor = lucifer.ActionExecutor(workers=3)
+    release, lock = threading.Event(), threading.Lock()
+    running, peak = [0], [0]
+    volume = [executor.submit("set_volume", blocking(release, running, peak, lock)) for _ in range(3)]
+    other = executor.submit("open_app", lambda: "opened")
+    assert other.done.wait(2) and other.result == "opened"
+    time.sleep(0.1)
+    assert peak[0] == 1
+    release.set()
+    assert all(task.done.wait(2) for task in volume)
+    assert executor.stats()["actions"]["set_volume"]["runs"] == 3
+
+def test_timeout_sets_the_cancellation_token():
+    executor = lucifer.ActionExecutor(workers=1)
+
+    def slow():
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if lucifer.action_cancelled():
+                return "cancelled"
+            time.sleep(0.01)
+        return "finished"
+
+    task = executor.submit("slow", slow, timeout=0.1)
+    assert task.done.wait(3)
+    assert task.result == "cancelled"
+    assert executor.stats()["actions"]["slow"]["timeouts"] == 1
+
+def test_full_queue_rejects_and_counts():
+    executor = lucifer.ActionExecutor(workers=1, max_queue=2)
+    release = threading.Event()
+    first = executor.submit("block", release.wait, 2)
+    wait_for(lambda: first.started is not None)
+    queued = [executor.submit("block", lambda: None) for _ in range(2)]
+    assert all(queued)
+    assert executor.submit("block", lambda: None) is None
+    stats = executor.stats()
+    assert stats["queued"] == 2 and stats["actions"]["block"]["rejected"] == 1
+    release.set()
+    assert all(task.done.wait(2) for task in queued)
+    stats = executor.stats()["actions"]["block"]
+    assert stats["runs"] == 3 and stats["errors"] == 0 and stats["avg_wait_ms"] is not None
+
+def test_call_later_submits_after_the_delay():
+    executor = lucifer.ActionExecutor(workers=1)
+    ran = threading.Event()
+    started = time.monotonic()
+    executor.call_later(0.1, "later", ran.set)
+    assert ran.wait(2) and time.monotonic() - started >= 0.1
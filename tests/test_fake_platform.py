@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+
+from conftest import REPO_DIR
+
+def run_fake(tmp_path, script, speed=1.0, timeout=90):
+    """Boot `python LUCIFER.py` on the fake platform with a fresh home and return its stdout."""
+    script_path = tmp_path / "script.txt"
+    script_path.write_text("\n".join(script) + "\n")
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path), LUCIFER_PLATFORM="fake",
+               LUCIFER_FAKE_SCRIPT=str(script_path), LUCIFER_FAKE_SPEED=str(speed))
+    env.pop("LUCIFER_FAKE_LOOP", None)
+    proc = subprocess.run([sys.executable, os.path.join(REPO_DIR, "LUCIFER.py")], cwd=str(tmp_path), env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout, text=True)
+    return proc.returncode, proc.stdout
+
+def test_first_start_calibrates_and_handles_commands(tmp_path):
+    # No saved tuning in the fresh home, so startup runs ambient calibration on the fake microphone
+    code, out = run_fake(tmp_path, ["HEY LUCIFER WHAT TIME IS IT", "HEY LUCIFER EXIT PROGRAM"])
+    assert code == 0, out
+    assert "[Voice]: The current time is" in out
+    assert "[Voice]: Exiting program" in out
+
+def test_unpaced_capture_keeps_every_utterance(tmp_path):
+    # Speed 0 reads audio far faster than real time; no utterance may be mistaken for an echo
+    code, out = run_fake(tmp_path, ["HEY LUCIFER WHAT TIME IS IT", "HEY LUCIFER SET VOLUME TO 40",
+                                    "HEY LUCIFER WHAT DAY IS IT", "HEY LUCIFER EXIT PROGRAM"], speed=0)
+    assert code == 0, out
+    assert "[Voice]: The current time is" in out
+    assert "[Voice]: Volume set to 40 percent." in out
+    assert "[Voice]: Today is" in out
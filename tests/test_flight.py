@@ -0,0 +1,42 @@
+import json
+
+import speech_recognition as sr
+
+import LUCIFER as lucifer
+import lucifer_flight
+
+def recorder(tmp_path, rate=48000, width=2):
+    flight = lucifer.FlightRecorder(tmp_path / "flight.ring", 0.05)
+    flight.open(rate, width)
+    return flight
+
+def test_capacity_follows_the_capture_rate(tmp_path):
+    flight = recorder(tmp_path, rate=48000)
+    assert flight.capacity == int(0.05 * 48000 * 2 * 60)
+    flight.close()
+
+def test_oversized_tags_drop_fields_instead_of_breaking_json(tmp_path):
+    flight = recorder(tmp_path)
+    audio = sr.AudioData(b"\0\0" * 4800, 48000, 2)
+    seq = flight.record(audio, {"decision": "wake", "room": "r" * 150, "transcript": "x" * 500})
+    flight.tag(seq, intent="i" * 300, result="handled")
+    [(found, _, tag)] = flight.segments()
+    assert found == seq
+    assert tag["decision"] == "wake" and tag["result"] == "handled"
+    assert "intent" not in tag
+    assert len(json.dumps(tag, separators=(",", ":"))) <= lucifer.FLIGHT_SLOT_SIZE - lucifer.FLIGHT_ENTRY.size
+    flight.close()
+
+def test_unreadable_tags_keep_the_audio(tmp_path):
+    flight = recorder(tmp_path)
+    seq = flight.record(sr.AudioData(b"\1\0" * 480, 48000, 2), {"decision": "wake"})
+    # A tag truncated mid-string, as older versions could write
+    offset = flight._slot_offset(seq) + lucifer.FLIGHT_ENTRY.size
+    flight._map[offset:offset + 7] = b'{"decis'
+    entry = lucifer.FLIGHT_ENTRY.unpack_from(flight._map, flight._slot_offset(seq))
+    lucifer.FLIGHT_ENTRY.pack_into(flight._map, flight._slot_offset(seq), *entry[:6], 7)
+    assert flight.segments() == [(seq, entry[5], {})]
+    assert flight.audio(seq)[0] == b"\1\0" * 480
+    _, segments = lucifer_flight.read_segments(bytes(flight._map))
+    assert segments[0]["decision"] == "unreadable"
+    flight.close()
@@ -0,0 +1,69 @@
+import sqlite3
+import time
+
+import LUCIFER as lucifer
+import lucifer_history
+
+OLD_SCHEMA = """
+CREATE TABLE interactions (
+    id INTEGER PRIMARY KEY, wake_time REAL NOT NULL, transcript TEXT, confidence REAL, intent TEXT,
+    result TEXT, capture_ms REAL, recognize_ms REAL, route_ms REAL, action_ms REAL, total_ms REAL, stages TEXT
+);
+"""
+
+def interaction(transcript, intent, result, **latencies):
+    item = lucifer.Interaction()
+    item.wake_time = time.time()
+    item.transcript, item.intent, item.result = transcript, intent, result
+    item.latencies.update(latencies)
+    return item
+
+def test_processing_latency_excludes_time_waiting_for_the_user():
+    item = interaction("SET VOLUME", "set_volume", "handled", capture=900.0, recognize=200.0, action=50.0)
+    item.started -= 10  # ten seconds spent on a follow-up question
+    row = item.row()
+    assert row[9] == 250.0
+    assert row[11] >= 10000.0
+
+def test_false_wakes_count_only_wakes_without_a_command(tmp_path):
+    db = tmp_path / "history.db"
+    conn = sqlite3.connect(str(db))
+    conn.executescript(OLD_SCHEMA)
+    conn.close()
+    history = lucifer.InteractionHistory(db)
+    for item in [interaction("LUCIFER", None, "timeout"),
+                 interaction("LUCIFER BANANA", None, "unrecognized"),
+                 interaction("LUCIFER", None, "busy"),
+                 interaction("LUCIFER", None, "superseded"),
+                 interaction("LUCIFER", None, "cancelled"),
+                 interaction("WHAT TIME IS IT", "time", "handled")]:
+        history.record(item)
+    history.close()
+    conn = sqlite3.connect(str(db))
+    try:
+        title, sql = lucifer_history.QUERIES["false-wakes"]
+        assert sum(n for _, n in conn.execute(sql, (0, 10))) == 2
+        assert conn.execute("SELECT COUNT(*) FROM interactions WHERE dialog_ms IS NOT NULL").fetchone()[0] == 6
+    finally:
+        conn.close()
+
+def test_existing_database_is_switched_to_incremental_vacuum(tmp_path):
+    db = tmp_path / "history.db"
+    conn = sqlite3.connect(str(db))
+    conn.executescript(OLD_SCHEMA)
+    conn.executemany("INSERT INTO interactions (wake_time, transcript) VALUES (?, ?)",
+                     [(0.0, "x" * 1000)] * 200)
+    conn.commit()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    conn.close()
+    history = lucifer.InteractionHistory(db)
+    conn = history._connect()
+    try:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        conn.execute("DELETE FROM interactions")
+        conn.commit()
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        assert conn.execute("PRAGMA page_count").fetchone()[0] < pages
+    finally:
+        conn.close()
@@ -0,0 +1,76 @@
+import pytest
+
+import LUCIFER as lucifer
+
+def test_tts_falls_back_to_null_engine_without_pyttsx3(monkeypatch):
+    monkeypatch.setattr(lucifer, "pyttsx3", None)
+    engine = lucifer.Platform().create_tts_engine()
+    assert isinstance(engine, lucifer.NullTTSEngine)
+    engine.say("hello")
+    engine.runAndWait()
+
+def test_tts_falls_back_to_null_engine_when_driver_fails(monkeypatch):
+    class BrokenPyttsx3:
+        @staticmethod
+        def init(*driver):
+            raise RuntimeError("no speech driver")
+
+    monkeypatch.setattr(lucifer, "pyttsx3", BrokenPyttsx3)
+    assert isinstance(lucifer.Platform().create_tts_engine(), lucifer.NullTTSEngine)
+    assert isinstance(lucifer.WindowsPlatform().create_tts_engine(), lucifer.NullTTSEngine)
+
+def test_close_app_is_unsupported_without_app_support(monkeypatch, spoken):
+    monkeypatch.setattr(lucifer, "host_platform", lucifer.Platform())
+    lucifer.close_app_by_name("notepad")
+    assert spoken == ["Close app functionality is not supported on this OS."]
+
+def test_clock_page_launches_through_the_platform(monkeypatch):
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    monkeypatch.setattr(lucifer, "resolve_browser_path", lambda: "/usr/bin/browser")
+    monkeypatch.setattr(lucifer.environment, "get", lambda name: "file:///clock.html")
+    assert lucifer.open_clock_app(mode="timer") is True
+    assert fake.actions == [("launch_browser", "file:///clock.html?mode=timer")]
+
+def test_routine_mute_asks_the_device(monkeypatch, spoken):
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    # Muted from the keyboard, so the assistant's own flag is stale
+    fake.muted = True
+    monkeypatch.setattr(lucifer, "is_muted", False)
+    lucifer.routine_mute({})
+    assert fake.muted
+    # Unmuted outside the assistant while the flag still says muted
+    fake.muted = False
+    lucifer.routine_mute({})
+    assert fake.muted
+    assert spoken == ["Volume already muted.", "Volume muted."]
+
+def test_posix_defaults_are_neutral_and_lock_the_session(monkeypatch):
+    platform = lucifer.Platform()
+    assert not platform.has_volume and platform.get_volume() == 0 and platform.get_mute() is False
+    platform.set_volume(40)
+    platform.set_mute(True)
+    assert platform.app_launcher() is None
+    commands = []
+    monkeypatch.setattr(lucifer.subprocess, "run", lambda args, **kw: commands.append(args))
+    monkeypatch.setattr(lucifer.sys, "platform", "linux")
+    platform.lock()
+    monkeypatch.setattr(lucifer.sys, "platform", "darwin")
+    platform.lock()
+    assert commands == [["loginctl", "lock-session"], ["pmset", "displaysleepnow"]]
+
+def test_missing_overrides_fail_when_the_class_is_instantiated():
+    class HalfLauncher(lucifer.AppLauncher):
+        def launch(self, appid):
+            return None
+
+    class SilentRoom(lucifer.Room):
+        pass
+
+    class DeafBackend(lucifer.RecognitionBackend):
+        pass
+
+    for cls, args in ((HalfLauncher, ()), (SilentRoom, ("den", None)), (DeafBackend, ())):
+        with pytest.raises(TypeError):
+            cls(*args)
@@ -0,0 +1,43 @@
+import LUCIFER as lucifer
+
+PLUGIN = '''
+import LUCIFER as lucifer
+
+INTENTS = {"greet": ["SAY HELLO TO {name} FROM {place}", "SAY HELLO"]}
+SLOTS = {"name": "who to greet", "place": "where from"}
+
+lucifer.test_plugin_imports += 1
+
+def handle_greet(segment, recognizer, name=None, place=None):
+    lucifer.vocalise(f"Hello {name} from {place}.")
+'''
+
+def registry(tmp_path, monkeypatch):
+    (tmp_path / "greeter.py").write_text(PLUGIN)
+    monkeypatch.setattr(lucifer, "test_plugin_imports", 0, raising=False)
+    plugins = lucifer.PluginRegistry([])
+    plugins.discover(tmp_path)
+    return plugins
+
+def test_plugin_is_imported_only_when_its_intent_matches(tmp_path, monkeypatch, spoken):
+    plugins = registry(tmp_path, monkeypatch)
+    assert plugins.match("WHAT TIME IS IT") == (None, None)
+    assert lucifer.test_plugin_imports == 0
+    intent, handler = plugins.match("SAY HELLO")
+    assert intent == "greet" and lucifer.test_plugin_imports == 0
+    handler("SAY HELLO", None)
+    handler("SAY HELLO", None)
+    assert lucifer.test_plugin_imports == 1
+
+def test_slots_are_extracted_from_the_phrase(tmp_path, monkeypatch, spoken):
+    plugins = registry(tmp_path, monkeypatch)
+    intent, handler = plugins.match("PLEASE SAY HELLO TO NEW YORK FROM THE MOON")
+    handler("PLEASE SAY HELLO TO NEW YORK FROM THE MOON", None)
+    assert spoken == ["Hello NEW YORK from THE MOON."]
+
+def test_bundled_dice_plugin_imports_the_running_assistant(monkeypatch, spoken):
+    plugins = lucifer.PluginRegistry([])
+    plugins.discover(lucifer.PLUGIN_DIR)
+    intent, handler = plugins.match("ROLL A 1 SIDED DIE")
+    handler("ROLL A 1 SIDED DIE", None)
+    assert intent == "roll_dice" and spoken[0].startswith("You rolled a ")
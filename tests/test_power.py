@@ -0,0 +1,55 @@
+import numpy as np
+
+import LUCIFER as lucifer
+
+RATE = 16000
+
+class Stream:
+    def __init__(self, blocks):
+        self.blocks = list(blocks)
+
+    def read(self, frames):
+        return self.blocks.pop(0) if self.blocks else b""
+
+class Source:
+    CHUNK = 1024
+    SAMPLE_RATE = RATE
+    SAMPLE_WIDTH = 2
+
+    def __init__(self, blocks):
+        self.stream = Stream(blocks)
+
+def block(amplitude, seed=0):
+    return np.random.default_rng(seed).normal(0, amplitude, int(RATE * 0.1)).astype("<i2").tobytes()
+
+def test_gate_opens_on_the_first_block_above_floor_plus_margin(monkeypatch):
+    monkeypatch.setitem(lucifer.recognizer_tuner.values, "energy_margin_db", 9.0)
+    # ~6 dB louder stays shut, ~14 dB louder opens
+    blocks = [block(50, seed) for seed in range(5)] + [block(100), block(250), block(50)]
+    assert lucifer.energy_gate(Source(blocks), 0.1, 5) == blocks[6]
+
+def test_gate_times_out_on_steady_noise():
+    blocks = [block(50, seed) for seed in range(20)]
+    assert lucifer.energy_gate(Source(blocks), 0.1, 1.0) is None
+
+def test_gate_passes_audio_through_without_numpy(monkeypatch):
+    monkeypatch.setattr(lucifer, "np", None)
+    blocks = [block(50), block(50, 1)]
+    assert lucifer.energy_gate(Source(blocks), 0.1, 5) == blocks[0]
+
+def test_modes_follow_activity_and_power_state(monkeypatch):
+    state = {"battery": False}
+    monkeypatch.setattr(lucifer, "on_battery_power", lambda: state["battery"])
+    monkeypatch.setattr(lucifer, "session_locked", lambda: False)
+    monkeypatch.setattr(lucifer, "user_idle_seconds", lambda: 0.0)
+    manager = lucifer.PowerManager()
+    assert manager.mode() == "active"
+    manager._last_activity -= lucifer.POWER_ACTIVE_SECONDS + 1
+    assert manager.mode() == "idle"
+    assert manager.mode(dialog_open=True) == "active"
+    state["battery"] = True
+    manager._state = None  # drop the cached power state
+    assert manager.mode() == "saver"
+    manager.touch()
+    assert manager.mode() == "active"
+    assert lucifer.PowerManager(enabled=False).mode() == "active"
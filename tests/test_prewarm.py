@@ -0,0 +1,37 @@
+import pytest
+
+import LUCIFER as lucifer
+
+def test_browser_warmer_skips_a_missing_clock_page(monkeypatch):
+    values = {"clock_html": None}
+    monkeypatch.setattr(lucifer.environment, "get", lambda name: values.get(name))
+    monkeypatch.setattr(lucifer.environment, "invalidate", lambda name: None)
+    lucifer.warm_browser()
+
+def test_hits_are_counted_without_inventing_savings(tmp_path):
+    prewarmer = lucifer.Prewarmer(tmp_path / "history.db", {"browser": lambda: None})
+    prewarmer._warm["browser"] = (0.0, 120.0)
+    prewarmer.used("browser")
+    prewarmer.used("browser")
+    assert prewarmer.stats["browser"] == {"runs": 0, "hits": 1, "warm_ms": 0.0}
+    assert "volume" not in lucifer.prewarmer.warmers
+
+def test_app_index_refresh_keeps_the_old_index_until_it_succeeds(monkeypatch):
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    monkeypatch.setattr(lucifer, "app_list_cache", {"notepad": "notepad.exe"})
+    seen = []
+
+    def failing_start_apps():
+        # Another thread looking up an app mid-refresh must still find the old index
+        seen.append(lucifer.app_list_cache)
+        raise RuntimeError("Get-StartApps failed")
+
+    monkeypatch.setattr(fake, "start_apps", failing_start_apps)
+    with pytest.raises(RuntimeError):
+        lucifer.warm_app_index()
+    assert seen == [{"notepad": "notepad.exe"}]
+    assert lucifer.app_list_cache == {"notepad": "notepad.exe"}
+    monkeypatch.setattr(fake, "start_apps", lambda: {"paint": "mspaint.exe"})
+    lucifer.warm_app_index()
+    assert lucifer.app_list_cache == {"paint": "mspaint.exe"}
@@ -0,0 +1,31 @@
+import threading
+
+import LUCIFER as lucifer
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_start_stop_writes_a_folded_stack_file(tmp_path, spoken):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,), name="busy-worker")
+    worker.start()
+    profiler = lucifer.SamplingProfiler(directory=tmp_path, interval=0.001)
+    try:
+        assert profiler.start(window=30)
+        assert not profiler.start()
+        interaction = lucifer.Interaction()
+        interaction.latencies["recognize"] = 120.0
+        profiler.observe(interaction)
+        stop.wait(0.2)
+        assert profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+    assert spoken == ["Profile saved."]
+    [folded] = tmp_path.glob("*.folded")
+    lines = folded.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("busy-worker;") and "busy (test_profiler.py" in line for line in lines)
+    [report] = tmp_path.glob("*.txt")
+    assert "recognize" in report.read_text()
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+import LUCIFER as lucifer
+
+HELLO = [("HELLO LUCIFER", 0.9)]
+
+@pytest.fixture(autouse=True)
+def fast_timings(monkeypatch):
+    monkeypatch.setattr(lucifer, "HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(lucifer, "HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(lucifer, "RECOGNITION_TIMEOUT", 2.0)
+
+def dispatcher(*backends):
+    return lucifer.RecognitionDispatcher(backends)
+
+def test_slow_primary_is_hedged_and_counted_against_its_breaker():
+    slow = lucifer.StubBackend("cloud", HELLO, latency=0.5)
+    fast = lucifer.StubBackend("local", [("HELLO LOCAL", None)])
+    d = dispatcher(slow, fast)
+    assert d.recognize(None, None) == [("HELLO LOCAL", None)]
+    assert d.health["cloud"].errors == 1
+    # The abandoned call is still running, so the cloud backend is skipped until it returns
+    assert not d.health["cloud"].available(time.monotonic())
+    time.sleep(0.6)
+    assert d.health["cloud"].available(time.monotonic())
+
+def test_empty_answer_does_not_beat_a_backend_still_listening():
+    cloud = lucifer.StubBackend("cloud", HELLO, latency=0.3)
+    local = lucifer.StubBackend("local", [])
+    assert dispatcher(cloud, local).recognize(None, None) == HELLO
+
+def test_everyone_hearing_nothing_returns_empty():
+    assert dispatcher(lucifer.StubBackend("cloud", []), lucifer.StubBackend("local", [])).recognize(None, None) == []
+
+def test_deadline_counts_as_failure(monkeypatch):
+    monkeypatch.setattr(lucifer, "RECOGNITION_TIMEOUT", 0.2)
+    hung = lucifer.StubBackend("cloud", HELLO, latency=1.0)
+    d = dispatcher(hung)
+    assert d.recognize(None, None) == []
+    assert d.health["cloud"].errors == 1
+    assert d.health["cloud"].abandoned == 1
+
+def test_breaker_opens_then_half_opens_after_cooldown(monkeypatch):
+    cloud = lucifer.StubBackend("cloud", HELLO, error_rate=1.0)
+    local = lucifer.StubBackend("local", [("HELLO LOCAL", None)])
+    d = dispatcher(cloud, local)
+    for _ in range(lucifer.BREAKER_FAILURES):
+        assert d.recognize(None, None) == [("HELLO LOCAL", None)]
+    assert d.stats()["cloud"]["open"]
+    # Open: the cloud backend is not even tried
+    d.recognize(None, None)
+    assert d.health["cloud"].requests == lucifer.BREAKER_FAILURES
+    # After the cooldown one trial request goes through, and success closes the breaker
+    monkeypatch.setattr(lucifer, "BREAKER_COOLDOWN", 0.0)
+    cloud.error_rate = 0.0
+    assert d.recognize(None, None) == HELLO
+    assert not d.stats()["cloud"]["open"]
+    assert d.health["cloud"].requests == lucifer.BREAKER_FAILURES + 1
+
+class FakeDecoder:
+    class LogMath:
+        def exp(self, prob):
+            return prob
+
+    def __init__(self, text, confidence):
+        self.text, self.confidence = text, confidence
+
+    def hyp(self):
+        if self.text is None:
+            return None
+        return type("Hyp", (), {"hypstr": self.text, "prob": self.confidence})()
+
+    def get_logmath(self):
+        return self.LogMath()
+
+class GrammarRecognizer:
+    def __init__(self, text, confidence=0.9):
+        self.decoder = FakeDecoder(text, confidence)
+
+    def recognize_sphinx(self, audio, grammar=None, show_all=False):
+        assert show_all
+        return self.decoder
+
+@pytest.fixture
+def cloud(monkeypatch):
+    heard = []
+    monkeypatch.setattr(lucifer, "preprocess_audio", lambda audio: audio)
+    monkeypatch.setattr(lucifer, "recognize_audio", lambda recognizer, audio: heard.append(audio) or "CLOUD TEXT")
+    return heard
+
+def test_grammars_accept_a_wake_word_and_distractors():
+    for grammar in (lucifer.CONFIRM_GRAMMAR, lucifer.NUMBER_GRAMMAR):
+        assert "<wake> <garbage>*" in grammar and "<garbage>+" in grammar
+    # "never mind" must land on the distractor path, never on an answer
+    assert "never mind" in lucifer.GRAMMAR_GARBAGE_RULE
+    assert not any(word in lucifer.GRAMMAR_GARBAGE_RULE.split() for word in ("one", "activate", "open"))
+
+def test_confident_grammar_match_is_used(cloud):
+    assert lucifer.recognize_constrained(GrammarRecognizer("forty two"), "audio", "number.gram") == "FORTY TWO"
+    assert cloud == []
+
+def test_uncertain_grammar_match_falls_back_to_cloud(cloud):
+    assert lucifer.recognize_constrained(GrammarRecognizer("forty two", 0.1), "audio", "number.gram") == "CLOUD TEXT"
+    assert lucifer.recognize_constrained(GrammarRecognizer(None), "audio", "number.gram") == "CLOUD TEXT"
+
+def test_wake_word_during_follow_up_is_recognized_in_full(cloud):
+    assert lucifer.recognize_constrained(GrammarRecognizer("hey lucifer what"), "audio", "confirm.gram") == "CLOUD TEXT"
+    assert cloud == ["audio"]
+
+def test_low_ranked_wake_alternative_does_not_wake():
+    hypotheses = [("LOOSE A FIRE", 0.9), ("LUCIFER WHAT TIME IS IT", None)]
+    assert lucifer.route_hypotheses(hypotheses, wake=True) == ("", "", None)
+
+def test_top_wake_hypothesis_wakes():
+    hypotheses = [("LUCIFER WHAT TIME IS IT", 0.8), ("LOOSE A FIRE WHAT TIME IS IT", None)]
+    assert lucifer.route_hypotheses(hypotheses, wake=True) == ("LUCIFER WHAT TIME IS IT", "WHAT TIME IS IT", 0.8)
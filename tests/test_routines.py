@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+import LUCIFER as lucifer
+
+class RecordingEngine:
+    def __init__(self):
+        self.said = []
+
+    def say(self, message):
+        self.said.append(message)
+
+    def runAndWait(self):
+        pass
+
+@pytest.fixture
+def speech(monkeypatch):
+    """Speak through a recording engine, so step speech is still collected into the summary."""
+    engine = RecordingEngine()
+    monkeypatch.setattr(lucifer, "tts_engine", engine)
+    monkeypatch.setattr(lucifer, "tts_rebuild_requested", False)
+    monkeypatch.setattr(lucifer, "release_audio_device", lambda: None)
+    return engine.said
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = lucifer.FakePlatform(script=[])
+    monkeypatch.setattr(lucifer, "host_platform", fake)
+    return fake
+
+def run(name, steps, said):
+    lucifer.run_routine(name, steps)
+    deadline = time.monotonic() + 5
+    while not said:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return said
+
+def test_steps_wait_for_their_dependencies_and_speak_one_summary(fake, speech):
+    fake.lock = lambda: fake.actions.append(("lock", fake.muted))
+    steps = [
+        {"id": "mute", "action": "mute"},
+        {"id": "say", "action": "say", "text": "Sleep well."},
+        {"action": "lock", "after": ["mute", "say"]},
+    ]
+    assert run("GOOD NIGHT", steps, speech) == ["Good Night routine done. Volume muted. Sleep well. Locking computer"]
+    assert fake.actions == [("lock", True)]
+
+def test_independent_steps_run_in_parallel_and_failures_skip_dependents(fake, speech, monkeypatch):
+    both_started = threading.Barrier(2, timeout=2)
+    monkeypatch.setitem(lucifer.ROUTINE_ACTIONS, "meet", lambda step: both_started.wait())
+    monkeypatch.setitem(lucifer.ROUTINE_ACTIONS, "boom", lambda step: 1 / 0)
+    steps = [
+        {"action": "meet"},
+        {"action": "meet"},
+        {"id": "boom", "action": "boom"},
+        {"action": "say", "text": "Never said.", "after": ["boom"]},
+    ]
+    [summary] = run("TEST", steps, speech)
+    assert summary == "Test routine done. The boom step failed. Skipped say because boom did not finish."
+
+def test_routine_names_match_whole_words_after_commands(monkeypatch):
+    monkeypatch.setattr(lucifer, "routines", dict(lucifer.routines, WORK=[{"action": "say", "text": "Working."}]))
+    assert lucifer.find_routine("START WORK") == "WORK"
+    assert lucifer.find_routine("HOMEWORK HELP") is None
+    name, _ = lucifer.match_intent("OPEN WORK TRACKER")
+    assert name == "open_app"
+    name, _ = lucifer.match_intent("WORK")
+    assert name == "routine"
@@ -0,0 +1,31 @@
+import LUCIFER as lucifer
+
+def test_tuning_is_saved_and_restored_per_input_device(monkeypatch):
+    saved = []
+    monkeypatch.setattr(lucifer, "config", {})
+    monkeypatch.setattr(lucifer, "save_config", lambda config: saved.append(config))
+    desk = lucifer.RecognizerTuner()
+    desk.load("desk mic")
+    assert not desk.calibrated
+    for _ in range(lucifer.TUNING_EVERY):
+        desk.observe("false_wake")
+    margin = lucifer.TUNING_DEFAULTS["energy_margin_db"] + 1.0
+    assert desk.values["energy_margin_db"] == margin
+    assert saved and lucifer.config["tuning"]["desk mic"]["energy_margin_db"] == margin
+
+    headset = lucifer.RecognizerTuner()
+    headset.load("headset")
+    assert headset.values == lucifer.TUNING_DEFAULTS
+
+    again = lucifer.RecognizerTuner()
+    again.load("desk mic")
+    assert again.calibrated and again.values["energy_margin_db"] == margin
+
+def test_values_stay_within_bounds(monkeypatch):
+    monkeypatch.setattr(lucifer, "save_config", lambda config: None)
+    tuner = lucifer.RecognizerTuner()
+    for _ in range(lucifer.TUNING_EVERY * 50):
+        tuner.observe("timeout")
+    for key, (low, high) in lucifer.TUNING_BOUNDS.items():
+        assert low <= tuner.values[key] <= high
+    assert tuner.values["command_timeout"] == lucifer.TUNING_BOUNDS["command_timeout"][1]
@@ -0,0 +1,78 @@
+import numpy as np
+import speech_recognition as sr
+
+import LUCIFER as lucifer
+
+RATE = 16000
+
+def tone(seconds, amplitude, freq=220.0):
+    """A steady tone; `amplitude` is in 16-bit sample units, the result is scaled to [-1, 1]."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    return amplitude * np.sin(2 * np.pi * freq * t) / 32768.0
+
+def silence(seconds, amplitude=30.0, seed=0):
+    return np.random.default_rng(seed).normal(0, amplitude, int(RATE * seconds)) / 32768.0
+
+def to_audio(samples):
+    return sr.AudioData(np.clip(samples * 32768.0, -32768, 32767).astype("<i2").tobytes(), RATE, 2)
+
+def test_preprocess_trims_with_the_tuned_thresholds(monkeypatch):
+    seen = {}
+    def bounds(samples, sample_rate, **kwargs):
+        seen.update(kwargs)
+        return 0, len(samples)
+    monkeypatch.setattr(lucifer, "vad_speech_bounds", bounds)
+    monkeypatch.setitem(lucifer.recognizer_tuner.values, "energy_margin_db", 14.0)
+    monkeypatch.setitem(lucifer.recognizer_tuner.values, "hangover_ms", 600)
+    audio = to_audio(np.concatenate([silence(0.3), tone(0.5, 3000), silence(0.3)]))
+    audio.noise_floor_db = -62.0  # as listen_with_vad leaves it
+    lucifer.preprocess_audio(audio)
+    assert seen == {"margin_db": 14.0, "hangover_ms": 600, "noise_floor_db": -62.0}
+
+def test_tuned_margin_decides_what_counts_as_speech():
+    # A quiet voice about 11 dB above the room noise
+    clip = np.concatenate([silence(0.5), tone(0.5, 150), silence(0.5, seed=1)])
+    assert lucifer.vad_speech_bounds(clip, RATE, margin_db=6.0) is not None
+    assert lucifer.vad_speech_bounds(clip, RATE, margin_db=20.0) is None
+
+def syllables(seconds, amplitude, seed=3):
+    """Speech-like bursts: 150 ms voiced, 100 ms gaps."""
+    out = []
+    while sum(len(part) for part in out) < RATE * seconds:
+        out += [tone(0.15, amplitude, freq=180.0), silence(0.1, seed=seed)]
+    return np.concatenate(out)[:int(RATE * seconds)]
+
+def feed(vad, samples):
+    for start in range(0, len(samples), 1024):
+        vad.feed(to_audio(samples[start:start + 1024]).get_raw_data())
+
+def test_steady_hum_above_the_old_floor_cap_is_not_speech():
+    # A mains hum at about -35 dBFS, well above the -50 dBFS first guess
+    hum = tone(3.0, 800, freq=100.0) + silence(3.0)
+    vad = lucifer.VoiceActivityDetector(RATE, 2)
+    feed(vad, hum)
+    assert not vad.started
+    assert vad.noise_floor_db > lucifer.VAD_MAX_NOISE_FLOOR_DB
+
+def test_speech_over_a_hum_still_starts_an_utterance():
+    hum = tone(4.0, 800, freq=100.0) + silence(4.0)
+    speech = np.concatenate([np.zeros(RATE * 2), syllables(1.5, 12000), np.zeros(RATE // 2)])
+    vad = lucifer.VoiceActivityDetector(RATE, 2)
+    feed(vad, hum + speech)
+    assert vad.started
+
+def test_offline_trim_finds_no_speech_in_a_hum():
+    hum = tone(1.5, 800, freq=100.0) + silence(1.5)
+    assert lucifer.vad_speech_bounds(hum, RATE) is None
+
+def test_preprocess_output_is_shorter_and_bit_exact(monkeypatch):
+    audio = to_audio(np.concatenate([silence(0.5), tone(0.5, 3000), silence(0.5, seed=1)]))
+    raw = audio.get_raw_data()
+    out = lucifer.preprocess_audio(audio, noise_suppression=False)
+    assert (out.sample_rate, out.sample_width) == (RATE, 2)
+    assert len(out.get_raw_data()) < len(raw)
+    # With filtering out of the way the kept samples are the captured ones, unchanged
+    monkeypatch.setattr(lucifer, "resample_and_highpass", lambda samples, sample_rate: samples)
+    out = lucifer.preprocess_audio(audio, noise_suppression=False)
+    kept = out.get_raw_data()
+    assert len(kept) < len(raw) and kept in raw
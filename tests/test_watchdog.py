@@ -0,0 +1,30 @@
+import threading
+
+import LUCIFER as lucifer
+
+def test_tts_repair_is_built_by_the_thread_that_speaks(monkeypatch):
+    built_on = []
+    platform = lucifer.host_platform
+    monkeypatch.setattr(platform, "create_tts_engine",
+                        lambda: built_on.append(threading.current_thread()) or lucifer.FakeTTSEngine())
+    monkeypatch.setattr(lucifer, "tts_engine_broken", True)
+    monkeypatch.setattr(lucifer, "tts_rebuild_requested", False)
+    watchdog = lucifer.Watchdog()
+    repair = threading.Thread(target=watchdog.check)
+    repair.start()
+    repair.join()
+    assert watchdog.repairs == {"tts": 1}
+    assert built_on == []
+    watchdog.check()
+    assert watchdog.repairs == {"tts": 1}  # already requested, not counted again
+    lucifer.vocalise("hello")
+    assert built_on == [threading.current_thread()]
+    assert not lucifer.tts_engine_broken and not lucifer.tts_rebuild_requested
+
+def test_too_many_children_is_reported_not_counted_as_repaired(monkeypatch):
+    monkeypatch.setattr(lucifer, "WATCHDOG_CHILD_LIMIT", -1)
+    monkeypatch.setattr(lucifer, "tts_engine_broken", False)
+    watchdog = lucifer.Watchdog()
+    watchdog.check()
+    assert "children" in watchdog._alerts
+    assert watchdog.repairs == {}